@@ -0,0 +1,201 @@
+'''
+Cálculo de varios agregados de la sección 4 de avistamientos en un único
+recorrido de los datos.
+
+Cada agregado es un objeto con dos métodos:
+    añade(av): actualiza el agregado con un avistamiento
+    resultado(): devuelve lo mismo que la función equivalente de avistamientos
+
+Ejemplo de uso:
+    res = calcula_agregados(avistamientos, ["numero_avistamientos_por_año",
+                                            ("estados_mas_avistamientos", 3)])
+    res["numero_avistamientos_por_año"]
+    res[("estados_mas_avistamientos", 3)]
+'''
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Iterable
+
+from avistamientos import MESES, Avistamiento
+from coordenadas import Coordenadas, redondear
+from mayores import MayoresPorGrupo, n_mayores
+
+## Agregados
+class NumeroAvistamientosPorAño:
+    '''Equivale a avistamientos.numero_avistamientos_por_año'''
+    def __init__(self):
+        self.conteos: dict[int, int] = {}
+
+    def añade(self, av:Avistamiento)->None:
+        año = av.fechahora.year
+        self.conteos[año] = self.conteos.get(año, 0) + 1
+
+    def resultado(self)->dict[int, int]:
+        return self.conteos
+
+class NumAvistamientosPorMes:
+    '''Equivale a avistamientos.num_avistamientos_por_mes'''
+    def __init__(self):
+        self.conteos: dict[str, int] = {}
+
+    def añade(self, av:Avistamiento)->None:
+        mes = MESES[av.fechahora.month - 1]
+        self.conteos[mes] = self.conteos.get(mes, 0) + 1
+
+    def resultado(self)->dict[str, int]:
+        return self.conteos
+
+class FormasPorMes:
+    '''Equivale a avistamientos.formas_por_mes'''
+    def __init__(self):
+        self.formas: dict[str, set[str]] = {}
+
+    def añade(self, av:Avistamiento)->None:
+        mes = MESES[av.fechahora.month - 1]
+        if mes not in self.formas:
+            self.formas[mes] = set()
+        self.formas[mes].add(av.forma)
+
+    def resultado(self)->dict[str, set[str]]:
+        return self.formas
+
+class FormasDistintasPorAño:
+    '''Equivale a avistamientos.formas_distintas_por_año'''
+    def __init__(self):
+        self.formas: dict[int, set[str]] = {}
+
+    def añade(self, av:Avistamiento)->None:
+        año = av.fechahora.year
+        if año not in self.formas:
+            self.formas[año] = set()
+        self.formas[año].add(av.forma)
+
+    def resultado(self)->dict[int, set[str]]:
+        return self.formas
+
+class LongitudMediaComentariosPorEstado:
+    '''Equivale a avistamientos.longitud_media_comentarios_por_estado'''
+    def __init__(self):
+        # Para cada estado, [suma de longitudes, número de comentarios]
+        self.sumas: dict[str, list[int]] = {}
+
+    def añade(self, av:Avistamiento)->None:
+        if av.estado not in self.sumas:
+            self.sumas[av.estado] = [0, 0]
+        suma = self.sumas[av.estado]
+        suma[0] += len(av.comentarios)
+        suma[1] += 1
+
+    def resultado(self)->dict[str, float]:
+        return {estado: total / num for estado, (total, num) in self.sumas.items()}
+
+class PorcAvistamientosPorForma:
+    '''Equivale a avistamientos.porc_avistamientos_por_forma'''
+    def __init__(self):
+        self.conteos = Counter()
+
+    def añade(self, av:Avistamiento)->None:
+        self.conteos[av.forma] += 1
+
+    def resultado(self)->dict[str, float]:
+        total = sum(self.conteos.values())
+        return {forma: recuento*100/total for forma, recuento in self.conteos.items()}
+
+class EstadosMasAvistamientos:
+    '''Equivale a avistamientos.estados_mas_avistamientos'''
+    def __init__(self, n:int=5):
+        self.n = n
+        self.conteos = Counter()
+
+    def añade(self, av:Avistamiento)->None:
+        self.conteos[av.estado] += 1
+
+    def resultado(self)->list[tuple[str, int]]:
+        return n_mayores(self.conteos.items(), self.n, key=lambda item:item[1])
+
+class AvistamientosMayorDuracionPorEstado(MayoresPorGrupo):
+    '''Equivale a avistamientos.avistamientos_mayor_duracion_por_estado'''
+    def __init__(self, n:int=3):
+        super().__init__(n, grupo=lambda av:av.estado, key=lambda av:av.duracion)
+
+class AvistamientoMasRecientePorEstado:
+    '''Equivale a avistamientos.avistamiento_mas_reciente_por_estado'''
+    def __init__(self):
+        self.fechas: dict[str, datetime] = {}
+
+    def añade(self, av:Avistamiento)->None:
+        fecha = self.fechas.get(av.estado)
+        if fecha == None or av.fechahora > fecha:
+            self.fechas[av.estado] = av.fechahora
+
+    def resultado(self)->dict[str, datetime]:
+        return self.fechas
+
+class HoraMasAvistamientos:
+    '''Equivale a avistamientos.hora_mas_avistamientos'''
+    def __init__(self):
+        self.conteos: dict[int, int] = {}
+
+    def añade(self, av:Avistamiento)->None:
+        hora = av.fechahora.hour
+        self.conteos[hora] = self.conteos.get(hora, 0) + 1
+
+    def resultado(self)->int:
+        return max(self.conteos.items(), key = lambda item:item[1])[0]
+
+class CoordenadasMasAvistamientos:
+    '''Equivale a avistamientos.coordenadas_mas_avistamientos'''
+    def __init__(self):
+        self.conteos: dict[Coordenadas, int] = {}
+
+    def añade(self, av:Avistamiento)->None:
+        coordenadas = redondear(av.ubicacion)
+        self.conteos[coordenadas] = self.conteos.get(coordenadas, 0) + 1
+
+    def resultado(self)->Coordenadas:
+        return max(self.conteos.items(), key = lambda item:item[1])[0]
+
+# Agregados disponibles, con el nombre de la función equivalente de avistamientos
+AGREGADOS: dict[str, Callable[..., Any]] = {
+    "numero_avistamientos_por_año": NumeroAvistamientosPorAño,
+    "num_avistamientos_por_mes": NumAvistamientosPorMes,
+    "formas_por_mes": FormasPorMes,
+    "formas_distintas_por_año": FormasDistintasPorAño,
+    "longitud_media_comentarios_por_estado": LongitudMediaComentariosPorEstado,
+    "porc_avistamientos_por_forma": PorcAvistamientosPorForma,
+    "estados_mas_avistamientos": EstadosMasAvistamientos,
+    "avistamientos_mayor_duracion_por_estado": AvistamientosMayorDuracionPorEstado,
+    "avistamiento_mas_reciente_por_estado": AvistamientoMasRecientePorEstado,
+    "hora_mas_avistamientos": HoraMasAvistamientos,
+    "coordenadas_mas_avistamientos": CoordenadasMasAvistamientos,
+}
+
+## Motor de agregación
+def calcula_agregados(avistamientos:Iterable[Avistamiento],
+                      peticiones:Iterable[str|tuple])->dict[str|tuple, Any]:
+    '''
+    Calcula todos los agregados pedidos recorriendo una sola vez los avistamientos,
+    de modo que se puede usar también con un generador como itera_avistamientos.
+
+    :param avistamientos: iterable de tuplas con la información de los avistamientos
+    :param peticiones: nombres de los agregados (ver AGREGADOS). Si el agregado
+         tiene parámetros, se pasa una tupla con el nombre y los parámetros,
+         por ejemplo ("estados_mas_avistamientos", 3)
+    :return: diccionario en el que las claves son las peticiones y los valores
+         son los resultados de cada agregado
+    '''
+    agregados = {}
+    for peticion in peticiones:
+        if isinstance(peticion, str):
+            nombre, parametros = peticion, ()
+        else:
+            nombre, *parametros = peticion
+        if nombre not in AGREGADOS:
+            raise ValueError(f"Agregado desconocido: {nombre}")
+        agregados[peticion] = AGREGADOS[nombre](*parametros)
+
+    funciones_añade = [agregado.añade for agregado in agregados.values()]
+    for av in avistamientos:
+        for añade in funciones_añade:
+            añade(av)
+    return {peticion: agregado.resultado() for peticion, agregado in agregados.items()}
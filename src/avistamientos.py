@@ -1,15 +1,38 @@
 from collections import Counter, defaultdict
 import csv
+import hashlib
+import mmap
+import os
+import pickle
+import sys
 from datetime import datetime, date
-from typing import NamedTuple
+from functools import total_ordering
+from time import perf_counter
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, NamedTuple
 from coordenadas import Coordenadas, distancia, redondear
+from instrumentacion import LecturaMedida, actual as instrumentacion_actual, instrumentada
+from mayores import n_mayores, n_mayores_por_grupo
+
+if TYPE_CHECKING:
+    from indices import IndiceEspacial, IndiceTemporal, IndiceTextual
 
 ## Definición de constantes
 MESES = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio", 
              "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"]
+# Se incrementa cada vez que cambia el formato de los ficheros de caché
+VERSION_CACHE = 5
+# Campos de un avistamiento que se leen del fichero
+CAMPOS_AVISTAMIENTO = ('fechahora', 'ciudad', 'estado', 'forma', 'duracion',
+                       'comentarios', 'ubicacion')
+# Campos de texto que se pueden dejar sin materializar al leer (ver
+# lee_avistamientos), con su posición en las filas del csv
+CAMPOS_DIFERIBLES = {'ciudad': 1, 'estado': 2, 'forma': 3, 'comentarios': 5}
+# Número máximo de fechas ya convertidas que se guardan al leer un fichero. Al
+# llegar a él se vacían, para que la memoria no crezca con el tamaño del fichero
+MAX_FECHAS_CONVERTIDAS = 100_000
 
 ## Definición de tipos
-Avistamiento = NamedTuple('Avistamiento', [
+_CamposAvistamiento = NamedTuple('_CamposAvistamiento', [
     ('fechahora', datetime),
     ('ciudad', str),
     ('estado', str),
@@ -19,39 +42,902 @@ Avistamiento = NamedTuple('Avistamiento', [
     ('ubicacion', Coordenadas)
 ])
 
+# Enteros de los campos dia y año ya creados, para que todos los avistamientos
+# compactos del mismo día o año compartan el mismo objeto int
+_enteros_compartidos: dict[int, int] = {}
+
+def campos_tiempo(fechahora:datetime)->tuple[int, int, int, int]:
+    '''
+    Devuelve los campos de tiempo derivados de una fecha y hora: el ordinal
+    del día (date.toordinal), el año, el índice del mes (0 es enero, como en
+    MESES) y la hora.
+    '''
+    dia = fechahora.toordinal()
+    año = fechahora.year
+    return (_enteros_compartidos.setdefault(dia, dia), _enteros_compartidos.setdefault(año, año),
+            fechahora.month - 1, fechahora.hour)
+
+class Avistamiento(_CamposAvistamiento):
+    '''
+    Tupla con nombre con la información de un avistamiento (los siete campos
+    de CAMPOS_AVISTAMIENTO). Además tiene como propiedades los campos de
+    tiempo que usan las consultas, que se calculan a partir de fechahora:
+        dia: ordinal del día (date.toordinal de la fecha)
+        año: año
+        mes: índice del mes, de 0 (enero) a 11 (diciembre)
+        hora: hora, de 0 a 23
+    Las propiedades no son campos de la tupla, así que no cambian su tamaño,
+    la igualdad ni el orden, pero se calculan en cada consulta: las funciones
+    de este módulo leen directamente la fecha, el año, el mes o la hora de
+    fechahora en sus bucles.
+    '''
+    __slots__ = ()
+
+    @property
+    def dia(self)->int:
+        return self.fechahora.toordinal()
+
+    @property
+    def año(self)->int:
+        return self.fechahora.year
+
+    @property
+    def mes(self)->int:
+        return self.fechahora.month - 1
+
+    @property
+    def hora(self)->int:
+        return self.fechahora.hour
+
+# Fila del csv que no se ha podido convertir en avistamiento
+Rechazo = NamedTuple('Rechazo', [
+    ('linea', int|None),
+    ('motivo', str),
+    ('fila', list[str])
+])
+
+@total_ordering
+class AvistamientoCompacto:
+    '''
+    Representación de un avistamiento que ocupa menos memoria que Avistamiento:
+    usa __slots__ en lugar de una tupla y guarda la latitud y la longitud
+    directamente, sin una tupla Coordenadas aparte. Tiene los mismos atributos
+    que Avistamiento (ubicacion se construye al consultarla), y se compara,
+    ordena y se usa en conjuntos igual que el Avistamiento equivalente.
+    '''
+    __slots__ = ('fechahora', 'ciudad', 'estado', 'forma', 'duracion',
+                 'comentarios', 'latitud', 'longitud', 'dia', 'año', 'mes', 'hora', '_hash')
+
+    def __init__(self, fechahora:datetime, ciudad:str, estado:str, forma:str,
+                 duracion:int, comentarios:str, latitud:float, longitud:float):
+        self.fechahora = fechahora
+        self.ciudad = ciudad
+        self.estado = estado
+        self.forma = forma
+        self.duracion = duracion
+        self.comentarios = comentarios
+        self.latitud = latitud
+        self.longitud = longitud
+        self.dia, self.año, self.mes, self.hora = campos_tiempo(fechahora)
+
+    @property
+    def ubicacion(self)->Coordenadas:
+        return Coordenadas(self.latitud, self.longitud)
+
+    def a_avistamiento(self)->Avistamiento:
+        '''
+        Devuelve el Avistamiento (tupla con nombre) equivalente.
+        '''
+        return Avistamiento(self.fechahora, self.ciudad, self.estado, self.forma,
+                            self.duracion, self.comentarios, self.ubicacion)
+
+    def _tupla(self)->tuple:
+        return (self.fechahora, self.ciudad, self.estado, self.forma,
+                self.duracion, self.comentarios, (self.latitud, self.longitud))
+
+    # Las comparaciones empiezan por fechahora, que casi siempre las decide, y
+    # sólo construyen las tuplas completas si las fechas son iguales
+    def __eq__(self, otro)->bool:
+        if isinstance(otro, AvistamientoCompacto):
+            return self.fechahora == otro.fechahora and self._tupla() == otro._tupla()
+        if isinstance(otro, tuple):
+            return len(otro) > 0 and self.fechahora == otro[0] and self._tupla() == otro
+        return NotImplemented
+
+    def __lt__(self, otro)->bool:
+        if isinstance(otro, AvistamientoCompacto):
+            if self.fechahora != otro.fechahora:
+                return self.fechahora < otro.fechahora
+            return self._tupla() < otro._tupla()
+        if isinstance(otro, tuple):
+            if len(otro) > 0 and self.fechahora != otro[0]:
+                return self.fechahora < otro[0]
+            return self._tupla() < otro
+        return NotImplemented
+
+    def __hash__(self)->int:
+        # Se calcula la primera vez y se guarda, como el de las cadenas
+        try:
+            return self._hash
+        except AttributeError:
+            self._hash = hash(self._tupla())
+            return self._hash
+
+    def __repr__(self)->str:
+        return repr(self.a_avistamiento()).replace("Avistamiento(", f"{type(self).__name__}(", 1)
+
+def separa_campos(registro:bytes)->list[bytes]:
+    '''
+    Separa en campos un registro de un fichero csv sin decodificarlo. Hace lo
+    mismo que csv.reader con un fichero abierto en modo texto: quita las
+    comillas de los campos entre comillas, convierte las comillas escapadas
+    ("") en comillas y los saltos de línea de Windows (CRLF) de dentro de los
+    campos en saltos de línea simples.
+
+    :param registro: bytes del registro, con o sin el salto de línea final
+    :return: lista con los bytes de cada campo (vacía si el registro está en blanco)
+    '''
+    registro = registro.rstrip(b"\r\n")
+    if not registro:
+        return []
+    partes = registro.split(b",")
+    if b'"' not in registro:
+        return partes
+    # Una coma dentro de un campo entre comillas no separa campos: se unen las
+    # partes hasta que el número de comillas es par
+    res = []
+    actual = None
+    for parte in partes:
+        actual = parte if actual == None else actual + b"," + parte
+        if actual.count(b'"') % 2 == 0:
+            res.append(actual)
+            actual = None
+    if actual != None:
+        res.append(actual)
+    for i, campo in enumerate(res):
+        if campo.startswith(b'"'):
+            campo = campo[1:-1] if campo.endswith(b'"') and len(campo) > 1 else campo[1:]
+            campo = campo.replace(b'""', b'"')
+            if b"\r" in campo:
+                campo = campo.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+            res[i] = campo
+    return res
+
+def _separa_fila(registro:bytes)->list[bytes]:
+    '''
+    Hace lo mismo que separa_campos con un registro de avistamiento que tiene
+    comillas. Normalmente sólo los comentarios (el sexto de los ocho campos)
+    están entre comillas: en ese caso se separan los cinco primeros campos
+    por la izquierda y los dos últimos por la derecha, sin recorrer las partes.
+    '''
+    campos = registro.rstrip(b"\r\n").split(b",", 5)
+    if len(campos) == 6:
+        resto = campos[5].rsplit(b",", 2)
+        if len(resto) == 3 and b'"' not in resto[1] and b'"' not in resto[2] \
+                and not any(b'"' in campo for campo in campos[:5]):
+            comentario = resto[0]
+            if comentario.startswith(b'"') and comentario.endswith(b'"') and len(comentario) > 1 \
+                    and b"\r" not in comentario:
+                comentario = comentario[1:-1]
+                # Dentro del campo, todas las comillas deben estar escapadas ("")
+                if b'"' not in comentario.replace(b'""', b""):
+                    campos[5:] = [comentario.replace(b'""', b'"'), resto[1], resto[2]]
+                    return campos
+    return separa_campos(registro)
+
+class FicheroMapeado:
+    '''
+    Fichero csv proyectado en memoria (mmap) del que los avistamientos
+    diferidos leen sus campos de texto al consultarlos. El sistema operativo
+    sólo carga las páginas del fichero que se leen.
+    '''
+    def __init__(self, fichero:str):
+        self.fichero = fichero
+        with open(fichero, "rb") as f:
+            self.datos = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __reduce__(self)->tuple:
+        # Un mmap no se puede serializar: al deserializar se vuelve a proyectar el fichero
+        return (FicheroMapeado, (self.fichero,))
+
+    def campos(self, inicio:int)->list[str]:
+        '''
+        Devuelve los campos del registro que empieza en la posición inicio (en bytes).
+        '''
+        datos = self.datos
+        fin = datos.find(b"\n", inicio)
+        # Un salto de línea dentro de un campo entre comillas no acaba el registro
+        while fin != -1 and datos[inicio:fin].count(b'"') % 2 == 1:
+            fin = datos.find(b"\n", fin + 1)
+        fin = len(datos) if fin == -1 else fin + 1
+        return [campo.decode("utf-8") for campo in separa_campos(datos[inicio:fin])]
+
+class AvistamientoDiferido(AvistamientoCompacto):
+    '''
+    AvistamientoCompacto que no guarda algunos de sus campos de texto (ciudad,
+    estado, forma o comentarios, ver lee_avistamientos). En su lugar guarda
+    la posición en bytes de su registro en el fichero, y la primera vez que
+    se consulta uno de esos campos lee del fichero proyectado en memoria
+    todos los que faltan y los guarda. El fichero no se debe modificar
+    mientras se usen sus avistamientos.
+
+    Los avistamientos son de una subclase por cada conjunto de campos no
+    guardados (ver _clase_diferida), en la que esos campos son propiedades.
+    Así, los campos guardados se consultan igual de rápido que en
+    AvistamientoCompacto.
+
+    Dos avistamientos diferidos son iguales si son el mismo registro del
+    mismo fichero, y se ordenan por fechahora sin leer los campos no
+    guardados salvo si las fechas son iguales. Con los demás avistamientos
+    se comparan por sus campos, como AvistamientoCompacto, pero su hash no
+    coincide: no se deben mezclar en un mismo conjunto o diccionario.
+    '''
+    __slots__ = ('_origen', '_inicio')
+    # Campos que no se guardan
+    diferidos: frozenset[str] = frozenset()
+
+    def __init__(self, origen:FicheroMapeado, inicio:int, fechahora:datetime,
+                 ciudad:str|None, estado:str|None, forma:str|None, duracion:int,
+                 comentarios:str|None, latitud:float, longitud:float):
+        '''
+        Los campos de texto que son None no se guardan y se leen del fichero.
+        '''
+        self._origen = origen
+        self._inicio = inicio
+        self.fechahora = fechahora
+        if ciudad != None:
+            self.ciudad = ciudad
+        if estado != None:
+            self.estado = estado
+        if forma != None:
+            self.forma = forma
+        self.duracion = duracion
+        if comentarios != None:
+            self.comentarios = comentarios
+        self.latitud = latitud
+        self.longitud = longitud
+        self.dia, self.año, self.mes, self.hora = campos_tiempo(fechahora)
+
+    def __reduce__(self)->tuple:
+        guardados = tuple(None if campo in self.diferidos else getattr(self, campo)
+                          for campo in CAMPOS_DIFERIBLES)
+        return (_crea_diferido, (self.diferidos, self._origen, self._inicio, self.fechahora,
+                                 self.duracion, self.latitud, self.longitud) + guardados)
+
+    def _lee_diferidos(self)->None:
+        '''
+        Lee del fichero los campos no guardados y los guarda en los slots de
+        AvistamientoCompacto, que las propiedades de la subclase ocultan.
+        '''
+        campos = self._origen.campos(self._inicio)
+        for campo in self.diferidos:
+            _SLOTS_COMPACTO[campo].__set__(self, campos[CAMPOS_DIFERIBLES[campo]])
+
+    def __eq__(self, otro)->bool:
+        if isinstance(otro, AvistamientoDiferido):
+            return self._inicio == otro._inicio and self._origen.fichero == otro._origen.fichero
+        return AvistamientoCompacto.__eq__(self, otro)
+
+    def __lt__(self, otro)->bool:
+        if isinstance(otro, AvistamientoDiferido):
+            if self.fechahora != otro.fechahora:
+                return self.fechahora < otro.fechahora
+            # Con la misma fecha se ordenan como las tuplas, y los registros
+            # iguales por su posición
+            tupla, otra_tupla = self._tupla(), otro._tupla()
+            if tupla != otra_tupla:
+                return tupla < otra_tupla
+            return (self._origen.fichero, self._inicio) < (otro._origen.fichero, otro._inicio)
+        return AvistamientoCompacto.__lt__(self, otro)
+
+    def __hash__(self)->int:
+        return hash((self.fechahora, self._inicio))
+
+# Slots de AvistamientoCompacto de los campos que se pueden diferir
+_SLOTS_COMPACTO = {campo: AvistamientoCompacto.__dict__[campo] for campo in CAMPOS_DIFERIBLES}
+
+def _campo_diferido(campo:str)->property:
+    '''
+    Propiedad que devuelve un campo no guardado, leyéndolo del fichero la
+    primera vez que se consulta.
+    '''
+    slot = _SLOTS_COMPACTO[campo]
+    def lee(av:AvistamientoDiferido)->str:
+        try:
+            return slot.__get__(av)
+        except AttributeError:
+            av._lee_diferidos()
+            return slot.__get__(av)
+    return property(lee)
+
+# Subclases de AvistamientoDiferido ya creadas, por conjunto de campos no guardados
+_clases_diferidas: dict[frozenset[str], type] = {}
+
+def _clase_diferida(diferidos:frozenset[str])->type:
+    '''
+    Devuelve la subclase de AvistamientoDiferido que no guarda los campos
+    dados (que deben estar en CAMPOS_DIFERIBLES), creándola si no existe.
+    '''
+    clase = _clases_diferidas.get(diferidos)
+    if clase == None:
+        atributos = {campo: _campo_diferido(campo) for campo in diferidos}
+        atributos.update({"__slots__": (), "diferidos": diferidos})
+        clase = type(AvistamientoDiferido.__name__, (AvistamientoDiferido,), atributos)
+        _clases_diferidas[diferidos] = clase
+    return clase
+
+def _crea_diferido(diferidos:frozenset[str], origen:FicheroMapeado, inicio:int,
+                   fechahora:datetime, duracion:int, latitud:float, longitud:float,
+                   ciudad:str|None, estado:str|None, forma:str|None,
+                   comentarios:str|None)->AvistamientoDiferido:
+    '''
+    Reconstruye un AvistamientoDiferido serializado con pickle.
+    '''
+    return _clase_diferida(diferidos)(origen, inicio, fechahora, ciudad, estado, forma,
+                                     duracion, comentarios, latitud, longitud)
+
 ## 1. Operaciones de carga de datos
 ### 1.1 Función de lectura de datos
 # Función de lectura que crea una lista de avistamientos
-def lee_avistamientos(fichero:str)->list[Avistamiento]:
+@instrumentada(recorre=False)
+def lee_avistamientos(fichero:str, rapido:bool=False, usar_cache:bool=False,
+                      compacto:bool=False, rechazos:list[Rechazo]|None=None,
+                      columnas:Iterable[str]|None=None)->list[Avistamiento]:
     '''
     Lee un fichero de entrada y devuelve una lista de tuplas. 
     Para convertir la cadena con la fecha y la hora al tipo datetime, usar
         datetime.strptime(fecha_hora,'%m/%d/%Y %H:%M')    
     
     :param fichero: ruta del fichero csv que contiene los datos en codificación utf-8 
+    :param rapido: si es True, las fechas se convierten con parsea_fechahora
+         en lugar de con datetime.strptime
+    :param usar_cache: si es True, se usa la caché binaria que hay junto al
+         fichero (ver lee_avistamientos_cache)
+    :param compacto: si es True, se devuelven objetos AvistamientoCompacto
+         (ver parsea_filas)
+    :param rechazos: si no es None, las filas erróneas no detienen la lectura:
+         se añaden a esta lista y se continúa (ver parsea_filas). Para
+         guardarlas en un fichero, usar escribe_rechazos.
+    :param columnas: si no es None, campos (ver CAMPOS_AVISTAMIENTO) que se
+         materializan. Si falta alguno de los de texto (ciudad, estado, forma
+         o comentarios), se devuelven objetos AvistamientoDiferido, que leen
+         esos campos del fichero al consultarlos. Es útil para las consultas
+         que no usan los comentarios, que son la mayor parte de cada fila.
+         La fecha, la duración y la ubicación siempre se materializan. No se
+         puede usar junto con usar_cache.
     :return: lista de tuplas con la información de los avistamientos 
     '''
+    if usar_cache:
+        if columnas != None:
+            raise ValueError("No se puede usar la caché con una selección de columnas")
+        return lee_avistamientos_cache(fichero, rapido, compacto, rechazos)
+    return list(itera_avistamientos(fichero, rapido, compacto, rechazos, columnas))
+
+### 1.2 Lectura perezosa de datos
+def itera_avistamientos(fichero:str, rapido:bool=False, compacto:bool=False,
+                        rechazos:list[Rechazo]|None=None,
+                        columnas:Iterable[str]|None=None)->Iterator[Avistamiento]:
+    '''
+    Generador que lee un fichero de entrada y va devolviendo los avistamientos
+    de uno en uno, sin llegar a guardar en memoria el fichero completo.
+    
+    :param fichero: ruta del fichero csv que contiene los datos en codificación utf-8 
+    :param rapido: si es True, las fechas se convierten con parsea_fechahora
+         en lugar de con datetime.strptime
+    :param compacto: si es True, se devuelven objetos AvistamientoCompacto
+         (ver parsea_filas)
+    :param rechazos: lista en la que se guardan las filas erróneas (ver parsea_filas)
+    :param columnas: campos que se materializan (ver lee_avistamientos)
+    :return: iterador sobre las tuplas con la información de los avistamientos 
+    '''
+    if columnas != None:
+        columnas = set(columnas)
+        for columna in columnas:
+            if columna not in CAMPOS_AVISTAMIENTO:
+                raise ValueError(f"Columna no válida: {columna}. Debe ser una de {CAMPOS_AVISTAMIENTO}")
+        if not columnas.issuperset(CAMPOS_DIFERIBLES):
+            yield from _itera_avistamientos_diferidos(fichero, rapido, rechazos, columnas)
+            return
     with open(fichero, encoding="utf-8") as f:
-        res = []
-        lector = csv.reader(f)
-        next(lector)
-        for (fechahora,city,state,shape,duration,
-             comments,latitude,longitude) in lector:
-            fechahora = datetime.strptime(fechahora, "%m/%d/%Y %H:%M")
+        registro = instrumentacion_actual()
+        if registro == None:
+            lector = csv.reader(f)
+            next(lector)
+            yield from parsea_filas(lector, rapido, compacto, rechazos)
+        else:
+            lectura = LecturaMedida(f)
+            lector = csv.reader(lectura)
+            next(lector)
+            yield from _parsea_filas_medido(lector, rapido, compacto, rechazos, registro, lectura)
+
+class _CadenasInternadas(dict):
+    '''
+    Diccionario de los bytes de un campo a la cadena decodificada e
+    internada, que se calcula la primera vez que se pide.
+    '''
+    def __missing__(self, valor:bytes)->str:
+        cadena = sys.intern(valor.decode("utf-8"))
+        self[valor] = cadena
+        return cadena
+
+def _itera_avistamientos_diferidos(fichero:str, rapido:bool, rechazos:list[Rechazo]|None,
+                                   columnas:set[str])->Iterator[AvistamientoDiferido]:
+    '''
+    Lee un fichero proyectado en memoria y devuelve AvistamientoDiferido que
+    sólo guardan los campos de texto que están en columnas.
+
+    Los registros se separan en campos sin decodificarlos (ver separa_campos),
+    así que los campos que no se guardan tampoco se decodifican.
+    '''
+    if os.path.getsize(fichero) == 0:
+        return
+    origen = FicheroMapeado(fichero)
+    registro = instrumentacion_actual()
+    if registro != None:
+        yield from _itera_avistamientos_diferidos_medido(origen, rapido, rechazos, columnas, registro)
+        return
+    lee_linea = origen.datos.readline
+    guarda_ciudad = "ciudad" in columnas
+    guarda_estado = "estado" in columnas
+    guarda_forma = "forma" in columnas
+    guarda_comentarios = "comentarios" in columnas
+    crea = _clase_diferida(frozenset(CAMPOS_DIFERIBLES) - columnas)
+    fechas_convertidas = {}
+    cadenas = _CadenasInternadas()
+    cabecera = lee_linea()
+    posicion = len(cabecera)
+    num_linea = 1
+    while True:
+        linea = lee_linea()
+        if not linea:
+            break
+        inicio = posicion
+        num_linea += 1
+        if b'"' in linea:
+            linea, lineas_extra = _completa_registro(linea, lee_linea)
+            num_linea += lineas_extra
+            fila = _separa_fila(linea)
+        else:
+            # Es lo mismo que separa_campos, escrito aquí porque es el caso más frecuente
+            fila = linea.rstrip(b"\r\n").split(b",")
+        posicion += len(linea)
+        try:
+            (fechahora,city,state,shape,duration,
+             comments,latitude,longitude) = fila
+            cadena = fechahora
+            fechahora = fechas_convertidas.get(cadena)
+            if fechahora == None:
+                if rapido:
+                    fechahora = parsea_fechahora(cadena.decode("utf-8"))
+                else:
+                    fechahora = datetime.strptime(cadena.decode("utf-8"), "%m/%d/%Y %H:%M")
+                if len(fechas_convertidas) == MAX_FECHAS_CONVERTIDAS:
+                    fechas_convertidas.clear()
+                fechas_convertidas[cadena] = fechahora
             duration = int(duration)
             latitude = float(latitude)
             longitude = float(longitude)
+        except ValueError as error:
+            if rechazos == None:
+                raise
+            fila = [campo.decode("utf-8", "replace") for campo in fila if fila != [b""]]
+            rechazos.append(_rechazo(None, fila, rapido, error)._replace(linea=num_linea))
+            continue
+        yield crea(origen, inicio, fechahora,
+                   cadenas[city] if guarda_ciudad else None,
+                   cadenas[state] if guarda_estado else None,
+                   cadenas[shape] if guarda_forma else None,
+                   duration, comments.decode("utf-8") if guarda_comentarios else None,
+                   latitude, longitude)
+
+def _completa_registro(linea:bytes, lee_linea:Callable[[], bytes])->tuple[bytes, int]:
+    '''
+    Devuelve el registro completo que empieza en una línea con comillas y el
+    número de líneas que se han leído después de ella. Un número impar de
+    comillas indica un campo que sigue en la línea siguiente.
+    '''
+    lineas_extra = 0
+    while linea.count(b'"') % 2 == 1:
+        resto = lee_linea()
+        if not resto:
+            break
+        lineas_extra += 1
+        linea += resto
+    return linea, lineas_extra
+
+def _itera_avistamientos_diferidos_medido(origen:FicheroMapeado, rapido:bool,
+                                          rechazos:list[Rechazo]|None, columnas:set[str],
+                                          registro)->Iterator[AvistamientoDiferido]:
+    '''
+    Hace lo mismo que _itera_avistamientos_diferidos, pero mide por separado
+    el tiempo de cada fase de la carga, como _parsea_filas_medido. La fase de
+    E/S es la lectura de las líneas del fichero proyectado en memoria, que
+    incluye la carga de sus páginas.
+
+    :param registro: instrumentación en la que se guardan los tiempos
+    '''
+    lectura = LecturaMedida(iter(origen.datos.readline, b""))
+    lee_linea = lambda: next(lectura, b"")
+    guarda_ciudad = "ciudad" in columnas
+    guarda_estado = "estado" in columnas
+    guarda_forma = "forma" in columnas
+    guarda_comentarios = "comentarios" in columnas
+    crea = _clase_diferida(frozenset(CAMPOS_DIFERIBLES) - columnas)
+    fechas_convertidas = {}
+    cadenas = _CadenasInternadas()
+    tiempos = {"tokenizado": 0.0, "fechas": 0.0, "construcción": 0.0}
+    try:
+        cabecera = lee_linea()
+        posicion = len(cabecera)
+        num_linea = 1
+        while True:
+            inicio_fase = perf_counter()
+            linea = lee_linea()
+            if not linea:
+                tiempos["tokenizado"] += perf_counter() - inicio_fase
+                break
+            inicio = posicion
+            num_linea += 1
+            if b'"' in linea:
+                linea, lineas_extra = _completa_registro(linea, lee_linea)
+                num_linea += lineas_extra
+                fila = _separa_fila(linea)
+            else:
+                fila = linea.rstrip(b"\r\n").split(b",")
+            posicion += len(linea)
+            tras_tokenizado = perf_counter()
+            try:
+                (fechahora,city,state,shape,duration,
+                 comments,latitude,longitude) = fila
+                cadena = fechahora
+                fechahora = fechas_convertidas.get(cadena)
+                if fechahora == None:
+                    if rapido:
+                        fechahora = parsea_fechahora(cadena.decode("utf-8"))
+                    else:
+                        fechahora = datetime.strptime(cadena.decode("utf-8"), "%m/%d/%Y %H:%M")
+                    if len(fechas_convertidas) == MAX_FECHAS_CONVERTIDAS:
+                        fechas_convertidas.clear()
+                    fechas_convertidas[cadena] = fechahora
+                tras_fechas = perf_counter()
+                duration = int(duration)
+                latitude = float(latitude)
+                longitude = float(longitude)
+            except ValueError as error:
+                if rechazos == None:
+                    raise
+                fila = [campo.decode("utf-8", "replace") for campo in fila if fila != [b""]]
+                rechazos.append(_rechazo(None, fila, rapido, error)._replace(linea=num_linea))
+                tiempos["tokenizado"] += tras_tokenizado - inicio_fase
+                continue
+            av = crea(origen, inicio, fechahora,
+                      cadenas[city] if guarda_ciudad else None,
+                      cadenas[state] if guarda_estado else None,
+                      cadenas[shape] if guarda_forma else None,
+                      duration, comments.decode("utf-8") if guarda_comentarios else None,
+                      latitude, longitude)
+            tiempos["tokenizado"] += tras_tokenizado - inicio_fase
+            tiempos["fechas"] += tras_fechas - tras_tokenizado
+            tiempos["construcción"] += perf_counter() - tras_fechas
+            yield av
+    finally:
+        # El tiempo de leer las líneas se cuenta dentro del de tokenizado
+        tiempos["tokenizado"] -= lectura.segundos
+        registro.añade_fase("E/S", lectura.segundos)
+        for fase, segundos in tiempos.items():
+            registro.añade_fase(fase, segundos)
+
+def parsea_filas(filas:Iterable[list[str]], rapido:bool=False, compacto:bool=False,
+                 rechazos:list[Rechazo]|None=None)->Iterator[Avistamiento]:
+    '''
+    Generador que convierte filas ya separadas en campos (por ejemplo, las que
+    devuelve csv.reader, sin la cabecera) en avistamientos.
+    
+    :param filas: iterable de listas con los campos de cada fila del csv
+    :param rapido: si es True, las fechas se convierten con parsea_fechahora
+         en lugar de con datetime.strptime
+    :param compacto: si es True, se devuelven objetos AvistamientoCompacto, las
+         cadenas de ciudad, estado y forma se internan (sys.intern) y los
+         avistamientos con la misma fecha y hora comparten el mismo datetime
+         (si el fichero no tiene más de MAX_FECHAS_CONVERTIDAS fechas distintas)
+    :param rechazos: si es None, una fila errónea (número de campos incorrecto,
+         fecha, duración o coordenadas que no se pueden convertir) lanza
+         ValueError. Si no, la fila se añade a esta lista como un Rechazo, con
+         su número de línea (si filas es un csv.reader; si la fila ocupa varias
+         líneas, la última) y el motivo, y se continúa con la siguiente.
+    :return: iterador sobre las tuplas con la información de los avistamientos 
+    '''
+    registro = instrumentacion_actual()
+    if registro != None:
+        yield from _parsea_filas_medido(filas, rapido, compacto, rechazos, registro)
+        return
+    # En modo rápido (y en modo compacto) se guardan las fechas ya convertidas,
+    # porque muchos avistamientos comparten la misma cadena de fecha y hora.
+    # Como mucho se guardan MAX_FECHAS_CONVERTIDAS, porque el generador puede
+    # recorrer un fichero de cualquier tamaño
+    fechas_convertidas = {}
+    for fila in filas:
+        # El bloque try no tiene coste mientras no se produce ninguna excepción
+        try:
+            (fechahora,city,state,shape,duration,
+             comments,latitude,longitude) = fila
+            if rapido or compacto:
+                cadena = fechahora
+                fechahora = fechas_convertidas.get(cadena)
+                if fechahora == None:
+                    if rapido:
+                        fechahora = parsea_fechahora(cadena)
+                    else:
+                        fechahora = datetime.strptime(cadena, "%m/%d/%Y %H:%M")
+                    if len(fechas_convertidas) == MAX_FECHAS_CONVERTIDAS:
+                        fechas_convertidas.clear()
+                    fechas_convertidas[cadena] = fechahora
+            else:
+                fechahora = datetime.strptime(fechahora, "%m/%d/%Y %H:%M")
+            duration = int(duration)
+            latitude = float(latitude)
+            longitude = float(longitude)
+        except ValueError as error:
+            if rechazos == None:
+                raise
+            rechazos.append(_rechazo(filas, fila, rapido, error))
+            continue
+        if compacto:
+            yield AvistamientoCompacto(fechahora, sys.intern(city), sys.intern(state),
+                                       sys.intern(shape), duration, comments,
+                                       latitude, longitude)
+        else:
             ubicacion = Coordenadas(latitude, longitude)
-            res.append(
-                Avistamiento(fechahora,city,state,shape,duration,
+            yield Avistamiento(fechahora,city,state,shape,duration,
              comments, ubicacion)
-            )
-        return res
+
+def _parsea_filas_medido(filas:Iterable[list[str]], rapido:bool, compacto:bool,
+                         rechazos:list[Rechazo]|None, registro,
+                         lectura:LecturaMedida|None=None)->Iterator[Avistamiento]:
+    '''
+    Hace lo mismo que parsea_filas, pero mide por separado el tiempo de cada
+    fase de la carga (ver instrumentacion). Sólo se usa con la instrumentación
+    activa, para no añadir ningún coste a parsea_filas.
+
+    :param registro: instrumentación en la que se guardan los tiempos
+    :param lectura: lectura del fichero del que proceden las filas, si se
+         quiere separar el tiempo de E/S del de tokenizado
+    '''
+    fechas_convertidas = {}
+    tiempos = {"tokenizado": 0.0, "fechas": 0.0, "construcción": 0.0}
+    filas = iter(filas)
+    try:
+        while True:
+            inicio = perf_counter()
+            try:
+                fila = next(filas)
+            except StopIteration:
+                tiempos["tokenizado"] += perf_counter() - inicio
+                break
+            tras_tokenizado = perf_counter()
+            try:
+                (fechahora,city,state,shape,duration,
+                 comments,latitude,longitude) = fila
+                if rapido or compacto:
+                    cadena = fechahora
+                    fechahora = fechas_convertidas.get(cadena)
+                    if fechahora == None:
+                        if rapido:
+                            fechahora = parsea_fechahora(cadena)
+                        else:
+                            fechahora = datetime.strptime(cadena, "%m/%d/%Y %H:%M")
+                        if len(fechas_convertidas) == MAX_FECHAS_CONVERTIDAS:
+                            fechas_convertidas.clear()
+                        fechas_convertidas[cadena] = fechahora
+                else:
+                    fechahora = datetime.strptime(fechahora, "%m/%d/%Y %H:%M")
+                tras_fechas = perf_counter()
+                duration = int(duration)
+                latitude = float(latitude)
+                longitude = float(longitude)
+            except ValueError as error:
+                if rechazos == None:
+                    raise
+                rechazos.append(_rechazo(filas, fila, rapido, error))
+                tiempos["tokenizado"] += tras_tokenizado - inicio
+                continue
+            if compacto:
+                av = AvistamientoCompacto(fechahora, sys.intern(city), sys.intern(state),
+                                          sys.intern(shape), duration, comments,
+                                          latitude, longitude)
+            else:
+                av = Avistamiento(fechahora, city, state, shape, duration,
+                                  comments, Coordenadas(latitude, longitude))
+            tiempos["tokenizado"] += tras_tokenizado - inicio
+            tiempos["fechas"] += tras_fechas - tras_tokenizado
+            tiempos["construcción"] += perf_counter() - tras_fechas
+            yield av
+    finally:
+        # El tiempo de leer las líneas del fichero se cuenta dentro del de next(filas)
+        if lectura != None:
+            tiempos["tokenizado"] -= lectura.segundos
+            registro.añade_fase("E/S", lectura.segundos)
+        for fase, segundos in tiempos.items():
+            registro.añade_fase(fase, segundos)
+
+def _rechazo(filas:Iterable[list[str]], fila:list[str], rapido:bool, error:ValueError)->Rechazo:
+    '''
+    Construye el Rechazo de una fila errónea, buscando el primer campo que no
+    se puede convertir para explicar el motivo.
+    '''
+    # csv.reader guarda el número de la última línea leída del fichero
+    linea = getattr(filas, "line_num", None)
+    if len(fila) != 8:
+        return Rechazo(linea, f"se esperaban 8 campos y hay {len(fila)}", fila)
+    conversiones = [("fecha", parsea_fechahora if rapido
+                              else lambda cadena: datetime.strptime(cadena, "%m/%d/%Y %H:%M"), 0),
+                    ("duración", int, 4), ("latitud", float, 6), ("longitud", float, 7)]
+    for campo, conversion, posicion in conversiones:
+        try:
+            conversion(fila[posicion])
+        except ValueError:
+            return Rechazo(linea, f"{campo} no válida: {fila[posicion]!r}", fila)
+    return Rechazo(linea, str(error), fila)
+
+def parsea_fechahora(cadena:str)->datetime:
+    '''
+    Convierte una cadena con el formato "%m/%d/%Y %H:%M" en un datetime,
+    separando los campos a mano. Es equivalente a 
+        datetime.strptime(cadena, "%m/%d/%Y %H:%M")
+    para las cadenas válidas, pero bastante más rápida.
+    
+    :param cadena: cadena con la fecha y la hora, por ejemplo "07/04/2011 22:00"
+    :return: objeto datetime con la fecha y la hora
+    '''
+    fecha, hora = cadena.split(" ")
+    mes, dia, anyo = fecha.split("/")
+    horas, minutos = hora.split(":")
+    return datetime(int(anyo), int(mes), int(dia), int(horas), int(minutos))
+
+def itera_lotes_avistamientos(fichero:str, tam_lote:int=10000)->Iterator[list[Avistamiento]]:
+    '''
+    Generador que lee un fichero de entrada y va devolviendo los avistamientos
+    en listas (lotes) de, como mucho, tam_lote elementos. El último lote
+    puede tener menos elementos.
+    
+    :param fichero: ruta del fichero csv que contiene los datos en codificación utf-8 
+    :param tam_lote: número máximo de avistamientos de cada lote
+    :return: iterador sobre listas de avistamientos 
+    '''
+    if tam_lote <= 0:
+        raise ValueError(f"El tamaño de lote debe ser positivo: {tam_lote}")
+    lote = []
+    for av in itera_avistamientos(fichero):
+        lote.append(av)
+        if len(lote) == tam_lote:
+            yield lote
+            lote = []
+    if len(lote) > 0:
+        yield lote
+
+### 1.3 Caché binaria de los datos leídos
+def ruta_cache(fichero:str)->str:
+    '''
+    Devuelve la ruta del fichero de caché asociado a un fichero csv.
+    '''
+    return fichero + ".cache"
+
+def huella_fichero(fichero:str)->str:
+    '''
+    Devuelve el resumen SHA-256 (en hexadecimal) del contenido de un fichero.
+    '''
+    resumen = hashlib.sha256()
+    with open(fichero, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            resumen.update(bloque)
+    return resumen.hexdigest()
+
+@instrumentada(recorre=False)
+def lee_avistamientos_cache(fichero:str, rapido:bool=False, compacto:bool=False,
+                            rechazos:list[Rechazo]|None=None)->list[Avistamiento]:
+    '''
+    Devuelve los avistamientos de un fichero csv usando una caché en disco.
+
+    La caché se guarda junto al fichero csv (ver ruta_cache) en formato pickle,
+    junto con el tamaño, la fecha de modificación y el resumen SHA-256 del csv.
+    Si el tamaño ha cambiado, o la fecha de modificación ha cambiado y también
+    el resumen, la caché está obsoleta: se vuelve a leer el csv y se reescribe.
+    Si la caché no existe o no se puede leer, también se reconstruye.
+    
+    Como la caché se carga con pickle, solo se debe usar con ficheros de
+    caché creados por esta misma función.
+
+    :param fichero: ruta del fichero csv que contiene los datos en codificación utf-8 
+    :param rapido: modo de conversión de fechas si hay que leer el csv
+    :param compacto: si es True, se devuelven objetos AvistamientoCompacto. Una
+         caché creada con otro valor de compacto se considera obsoleta.
+    :param rechazos: lista en la que se guardan las filas erróneas (ver
+         parsea_filas). Las filas erróneas se guardan también en la caché; si
+         las hay y rechazos es None, se vuelve a leer el csv para que se lance
+         el mismo error que sin caché.
+    :return: lista de tuplas con la información de los avistamientos 
+    '''
+    estado_csv = os.stat(fichero)
+    cache = ruta_cache(fichero)
+    try:
+        with open(cache, "rb") as f:
+            # La cabecera va en un pickle aparte para no cargar los
+            # avistamientos si la caché está obsoleta
+            cabecera = pickle.load(f)
+            if (cabecera["version"] == VERSION_CACHE and cabecera["compacto"] == compacto
+                    and cabecera["tamaño"] == estado_csv.st_size
+                    and (rechazos != None or not cabecera["rechazos"])):
+                res = None
+                if cabecera["mtime"] == estado_csv.st_mtime_ns:
+                    res = pickle.load(f)
+                elif cabecera["hash"] == huella_fichero(fichero):
+                    # Solo ha cambiado la fecha: se reescribe la caché con la nueva fecha
+                    res = pickle.load(f)
+                    escribe_cache(fichero, res, compacto, cabecera["hash"], cabecera["rechazos"])
+                if res != None:
+                    if rechazos != None:
+                        rechazos.extend(cabecera["rechazos"])
+                    return res
+    except (OSError, EOFError, KeyError, TypeError, pickle.UnpicklingError):
+        pass
+    # Se usa una lista propia para guardar en la caché sólo los rechazos de este fichero
+    nuevos_rechazos = None if rechazos == None else []
+    res = list(itera_avistamientos(fichero, rapido, compacto, nuevos_rechazos))
+    escribe_cache(fichero, res, compacto, rechazos=nuevos_rechazos)
+    if rechazos != None:
+        rechazos.extend(nuevos_rechazos)
+    return res
+
+def escribe_cache(fichero:str, avistamientos:list[Avistamiento], compacto:bool=False,
+                  huella:str|None=None, rechazos:list[Rechazo]|None=None)->None:
+    '''
+    Guarda los avistamientos leídos de un fichero csv en su fichero de caché.
+    El fichero se escribe primero con otro nombre y luego se renombra, para
+    que nunca quede una caché a medio escribir.
+
+    :param fichero: ruta del fichero csv del que se han leído los avistamientos
+    :param avistamientos: lista de avistamientos leídos del fichero
+    :param compacto: si los avistamientos son objetos AvistamientoCompacto
+    :param huella: resumen SHA-256 del fichero, si ya se conoce
+    :param rechazos: filas erróneas encontradas al leer el fichero
+    '''
+    estado_csv = os.stat(fichero)
+    if huella == None:
+        huella = huella_fichero(fichero)
+    cabecera = {"version": VERSION_CACHE,
+                "compacto": compacto,
+                "tamaño": estado_csv.st_size,
+                "mtime": estado_csv.st_mtime_ns,
+                "hash": huella,
+                "rechazos": rechazos or []}
+    cache = ruta_cache(fichero)
+    temporal = cache + ".tmp"
+    with open(temporal, "wb") as f:
+        pickle.dump(cabecera, f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(avistamientos, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporal, cache)
+
+### 1.4 Filas erróneas
+def escribe_rechazos(fichero:str, rechazos:Iterable[Rechazo])->None:
+    '''
+    Guarda en un fichero csv las filas que no se han podido leer. Cada fila
+    del fichero tiene el número de línea, el motivo y los campos originales.
+
+    :param fichero: ruta del fichero csv que se va a crear
+    :param rechazos: filas erróneas, por ejemplo las que guarda lee_avistamientos
+    '''
+    with open(fichero, "w", encoding="utf-8", newline="") as f:
+        escritor = csv.writer(f)
+        escritor.writerow(["linea", "motivo", "campos"])
+        for rechazo in rechazos:
+            escritor.writerow([rechazo.linea, rechazo.motivo, *rechazo.fila])
 
 ### 2.1 Número de avistamientos producidos en una fecha
+@instrumentada
 def numero_avistamientos_fecha(
         avistamientos: list[Avistamiento], 
-        fecha: date) -> int:
+        fecha: date,
+        indice: "IndiceTemporal|None" = None) -> int:
     ''' Avistamientos que se han producido en una fecha
     
     Toma como entrada una lista de avistamientos y una fecha.
@@ -59,8 +945,12 @@ def numero_avistamientos_fecha(
 
     :param avistamientos: lista de avistamientos
     :param fecha: fecha del avistamiento 
+    :param indice: índice temporal construido sobre "avistamientos". Si no es None,
+         se usa para no tener que recorrer todos los avistamientos
     :return:  Número de avistamientos producidos en la fecha 
     '''
+    if indice != None:
+        return indice.numero_fecha(fecha)
     contador = 0
     for av in avistamientos:
         if av.fechahora.date() == fecha:
@@ -68,6 +958,7 @@ def numero_avistamientos_fecha(
     return contador
 
 ### 2.2 Número de formas observadas en un conjunto de estados
+@instrumentada
 def formas_estados(avistamientos:list[Avistamiento], estados:set[str])->int:
     ''' 
     Devuelve el número de formas distintas observadas en avistamientos 
@@ -83,6 +974,7 @@ def formas_estados(avistamientos:list[Avistamiento], estados:set[str])->int:
     return len(formas)    
 
 ### 2.3 Duración total de los avistamientos en un estado
+@instrumentada
 def duracion_total(avistamientos:list[Avistamiento], estado:str)->int:
     ''' 
     Devuelve la duración total de los avistamientos de un estado. 
@@ -99,15 +991,21 @@ def duracion_total(avistamientos:list[Avistamiento], estado:str)->int:
 
 
 ### 2.4 Avistamientos cercanos a una ubicación
-def avistamientos_cercanos_ubicacion(avistamientos:list[Avistamiento], ubicacion:Coordenadas, radio:float)->set[Avistamiento]:
+@instrumentada
+def avistamientos_cercanos_ubicacion(avistamientos:list[Avistamiento], ubicacion:Coordenadas, radio:float,
+                                     indice:"IndiceEspacial|None"=None)->set[Avistamiento]:
     ''' 
     Devuelve el conjunto de avistamientos cercanos a una ubicación.
     :param avistamientos: lista de tuplas con la información de los avistamientos
     :param ubicacion: coordenadas de la ubicación para la cual queremos encontrar avistamientos cercanos 
     :param radio: radio de distancia
+    :param indice: índice espacial construido sobre "avistamientos". Si no es None,
+         se usa para no tener que recorrer todos los avistamientos
     :return:Conjunto de avistamientos que se encuentran a una distancia
          inferior al valor "radio" de la ubicación dada por el parámetro "ubicacion" 
     '''
+    if indice != None:
+        return set(indice.cercanos(ubicacion, radio))
     res = set()
     for av in avistamientos:
         # Si está en el radio de búsqueda
@@ -119,6 +1017,7 @@ def avistamientos_cercanos_ubicacion(avistamientos:list[Avistamiento], ubicacion
 
 ## Operaciones con máximos y mínimos
 ### 3.1 Avistamiento de una forma con mayor duración
+@instrumentada
 def avistamiento_mayor_duracion(avistamientos: list[Avistamiento], forma:str)->Avistamiento:
     '''
     Devuelve el avistamiento de mayor duración de entre todos los
@@ -134,6 +1033,7 @@ def avistamiento_mayor_duracion(avistamientos: list[Avistamiento], forma:str)->A
                 mas_largo = av
     return mas_largo
 
+@instrumentada
 def avistamiento_mayor_duracion_2(avistamientos: list[Avistamiento], forma:str)->Avistamiento:
     '''
     Devuelve el avistamiento de mayor duración de entre todos los
@@ -150,7 +1050,9 @@ def avistamiento_mayor_duracion_2(avistamientos: list[Avistamiento], forma:str)-
     return max(filtrado, key=lambda av:av.duracion)
 
 ### 3.2 Avistamiento cercano a un punto con mayor duración
-def avistamiento_cercano_mayor_duracion(avistamientos:list[Avistamiento], ubicacion:Coordenadas, radio:float=0.5)->tuple[str, int]:
+@instrumentada
+def avistamiento_cercano_mayor_duracion(avistamientos:list[Avistamiento], ubicacion:Coordenadas, radio:float=0.5,
+                                        indice:"IndiceEspacial|None"=None)->tuple[str, int]:
     '''
     Devuelve el comentario y la duración del avistamiento que más 
     tiempo ha durado de aquellos situados en el entorno de las
@@ -160,8 +1062,16 @@ def avistamiento_cercano_mayor_duracion(avistamientos:list[Avistamiento], ubicac
     :param avistamientos: lista de tuplas con la información de los avistamientos 
     :param coordenadas: tupla con latitud y longitud
     :param radio: radio de búsqueda
+    :param indice: índice espacial construido sobre "avistamientos". Si no es None,
+         se usa para no tener que recorrer todos los avistamientos
     :return: comentario y duración del avistamiento más largo en el entorno de las coordenadas 
     '''
+    if indice != None:
+        res = indice.mayor_duracion_cercano(ubicacion, radio)
+        if res == None:
+            raise ValueError("No hay avistamientos en el entorno de las coordenadas")
+        return (res.comentarios, res.duracion)
+
     # TODO: Para el próximo miércoles, resolver en casa
     filtrado = []
     for av in avistamientos:
@@ -174,7 +1084,9 @@ def avistamiento_cercano_mayor_duracion(avistamientos:list[Avistamiento], ubicac
 
 ### 3.3 Avistamientos producidos entre dos fechas
 
-def avistamientos_fechas(avistamientos:list[Avistamiento], fecha_inicial:date|None=None, fecha_final:date|None=None)->list[Avistamiento]:
+@instrumentada
+def avistamientos_fechas(avistamientos:list[Avistamiento], fecha_inicial:date|None=None, fecha_final:date|None=None,
+                         indice:"IndiceTemporal|None"=None)->list[Avistamiento]:
     '''
     Devuelve una lista con los avistamientos que han tenido lugar
     entre fecha_inicial y fecha_final (ambas inclusive). La lista devuelta
@@ -192,11 +1104,16 @@ def avistamientos_fechas(avistamientos:list[Avistamiento], fecha_inicial:date|No
     :param avistamientos: lista de tuplas con la información de los avistamientos 
     :param fecha_inicial: fecha a partir de la cual se devuelven los avistamientos
     :param fecha_final: fecha hasta la cual se devuelven los avistamientos
+    :param indice: índice temporal construido sobre "avistamientos". Si no es None,
+         se usa para no tener que recorrer ni ordenar todos los avistamientos
     :return: lista de tuplas con la información de los avistamientos en el rango de fechas
     '''
+    if indice != None:
+        return indice.rango(fecha_inicial, fecha_final)
     res = []
     for av in avistamientos:
-        if (fecha_inicial == None or fecha_inicial <= av.fechahora.date()) and (fecha_final == None or av.fechahora.date() <= fecha_final):
+        fecha = av.fechahora.date()
+        if (fecha_inicial == None or fecha_inicial <= fecha) and (fecha_final == None or fecha <= fecha_final):
             res.append(av)
     # Como el primer elemento de las tuplas es fechahora, se ordena por ese campo
     res.sort(reverse=True) # reverse=True para ordenar de mayor a menor
@@ -206,7 +1123,9 @@ def avistamientos_fechas(avistamientos:list[Avistamiento], fecha_inicial:date|No
     # return sorted(res, reverse=True)
 
 ### 3.4 Avistamiento de un año con el comentario más largo
-def comentario_mas_largo(avistamientos:list[Avistamiento], anyo:int, palabra:str)->Avistamiento:
+@instrumentada
+def comentario_mas_largo(avistamientos:list[Avistamiento], anyo:int, palabra:str,
+                         indice:"IndiceTextual|None"=None)->Avistamiento:
     ''' 
     Devuelve el avistamiento cuyo comentario es el más largo, de entre
     los avistamientos observados en el año dado por el parámetro "anyo"
@@ -215,8 +1134,12 @@ def comentario_mas_largo(avistamientos:list[Avistamiento], anyo:int, palabra:str
     :param avistamientos: lista de tuplas con la información de los avistamientos 
     :param anyo: año para el que se hará la búsqueda 
     :param palabra: palabra que debe incluir el comentario del avistamiento buscado 
+    :param indice: índice de texto construido sobre "avistamientos". Si no es None,
+         sólo se revisan los avistamientos cuyo comentario puede contener la palabra
     :return: avistamiento con el comentario más largo
     '''    
+    if indice != None:
+        return indice.comentario_mas_largo(anyo, palabra)
     filtrado = []
     for av in avistamientos:
         if av.fechahora.year == anyo and palabra in av.comentarios:
@@ -225,6 +1148,7 @@ def comentario_mas_largo(avistamientos:list[Avistamiento], anyo:int, palabra:str
     
 
 ### 3.5 Media de días entre avistamientos consecutivos
+@instrumentada
 def media_dias_entre_avistamientos(avistamientos:list[Avistamiento], anyo:int|None=None)->float|None:
     ''' 
     Devuelve la media de días transcurridos entre dos avistamientos consecutivos.
@@ -235,55 +1159,109 @@ def media_dias_entre_avistamientos(avistamientos:list[Avistamiento], anyo:int|No
     :param anyo: año para el que se hará la búsqueda 
     :return: media de días transcurridos entre avistamientos. Si no se puede realizar el cálculo, devuelve None 
     '''    
-    #Filtramos por año
-    filtrado = []
+    # La suma de las diferencias entre días consecutivos se simplifica a
+    # (último día - primer día), así que no hace falta ordenar: basta con
+    # el día mínimo, el máximo y el número de avistamientos del año
+    minimo = maximo = None
+    num = 0
     for av in avistamientos:
-        if anyo == None or av.fechahora.year == anyo:
-            filtrado.append(av)
+        fechahora = av.fechahora
+        if anyo == None or fechahora.year == anyo:
+            dia = fechahora.toordinal()
+            if num == 0:
+                minimo = maximo = dia
+            elif dia < minimo:
+                minimo = dia
+            elif dia > maximo:
+                maximo = dia
+            num += 1
+    return _media_dias(minimo, maximo, num)
 
-    # Debe haber al menos dos avistamientos para poder hacer el cálculo que me piden
-    if len(filtrado) <= 1:
+def _media_dias(minimo:int|None, maximo:int|None, num:int)->float|None:
+    '''
+    Media de días entre avistamientos consecutivos a partir del ordinal del
+    primer y el último día y del número de avistamientos. Debe haber al menos
+    dos avistamientos para poder hacer el cálculo.
+    '''
+    if num <= 1:
         return None
+    return (maximo - minimo) / (num - 1)
 
-    # Creamos una copia ordenada. CUIDADO! No ordenamos directamente la recibida,
-    # porque si no estaríamos cambiándole la lista a quien nos la ha pasado
-    ordenados = sorted(filtrado) 
-
-    # Alternativa usando un generador:
-    ordenados = sorted(av for av in avistamientos if anyo==None or av.fechahora.year==anyo)
+@instrumentada
+def resumen_dias_por_año(avistamientos:Iterable[Avistamiento])->dict[int, list[int]]:
+    '''
+    Devuelve, para cada año, el ordinal del primer y del último día con
+    avistamientos y el número de avistamientos, en un único recorrido.
+    Con este resumen, media_dias_resumen calcula la media de días entre
+    avistamientos de cualquier año sin volver a recorrerlos.
 
-    # avistamientos[1:] devuelve el trozo de avistamientos
-    # que comienza en el segundo elemento (índice 1) y
-    # llega hasta el final
-    suma_dias = 0
-    for av1, av2 in zip(ordenados, ordenados[1:]):
-        dias = (av2.fechahora.date() - av1.fechahora.date()).days
-        suma_dias += dias
+    :param avistamientos: iterable de tuplas con la información de los avistamientos
+    :return: diccionario de año a lista [día mínimo, día máximo, número de avistamientos]
+    '''
+    res = {}
+    for av in avistamientos:
+        fechahora = av.fechahora
+        añade_dia_resumen(res, fechahora.year, fechahora.toordinal())
+    return res
 
-    return suma_dias / (len(ordenados)-1)
+def añade_dia_resumen(resumen:dict[int, list[int]], año:int, dia:int)->None:
+    '''
+    Actualiza un resumen de resumen_dias_por_año con un avistamiento.
+    '''
+    datos = resumen.get(año)
+    if datos == None:
+        resumen[año] = [dia, dia, 1]
+    else:
+        if dia < datos[0]:
+            datos[0] = dia
+        elif dia > datos[1]:
+            datos[1] = dia
+        datos[2] += 1
 
+@instrumentada(recorre=False)
+def media_dias_resumen(resumen:dict[int, list[int]], anyo:int|None=None)->float|None:
+    '''
+    Equivale a media_dias_entre_avistamientos, a partir de un resumen de
+    resumen_dias_por_año. Cuesta O(1) para un año y O(número de años) para
+    todos los años.
 
+    :param resumen: resumen de los avistamientos por año
+    :param anyo: año para el que se hará el cálculo. Si es None, se usan todos los años.
+    :return: media de días transcurridos entre avistamientos, o None si hay menos de dos
+    '''
+    if anyo != None:
+        datos = resumen.get(anyo)
+        if datos == None:
+            return None
+        return _media_dias(*datos)
+    if len(resumen) == 0:
+        return None
+    return _media_dias(min(datos[0] for datos in resumen.values()),
+                       max(datos[1] for datos in resumen.values()),
+                       sum(datos[2] for datos in resumen.values()))
 
 
 ## 4 Operaciones con diccionarios
 
 ### 4.1 Avistamientos por fecha
-def avistamientos_por_fecha(avistamientos:list[Avistamiento])->dict[date, list[Avistamiento]]:
+@instrumentada
+def avistamientos_por_fecha(avistamientos:Iterable[Avistamiento])->dict[date, list[Avistamiento]]:
     ''' 
     Devuelve un diccionario que indexa los avistamientos por fechas
     
-    :param avistamientos: lista de tuplas con la información de los avistamientos 
+    :param avistamientos: iterable de tuplas con la información de los avistamientos 
     :return diccionario en el que las claves son las fechas de los avistamientos 
          y los valores son conjuntos con los avistamientos observados en esa fecha
     '''
-    res = {} # res = dict()
-    for av in avistamientos:
-        fecha = av.fechahora.date()
-        # Si fecha aún no está en el diccionario (no existe la clave)
-        if fecha not in res:
-            res[fecha] = [av] # Crea una lista con av, y la guarda en el diccionario para la clave fecha
-        else:
-            res[fecha].append(av)
+    # Solo se recorre una vez "avistamientos", porque puede ser un generador
+    # res = {} # res = dict()
+    # for av in avistamientos:
+    #     fecha = av.fechahora.date()
+    #     # Si fecha aún no está en el diccionario (no existe la clave)
+    #     if fecha not in res:
+    #         res[fecha] = [av] # Crea una lista con av, y la guarda en el diccionario para la clave fecha
+    #     else:
+    #         res[fecha].append(av)
 
     # Otra forma de escribir lo mismo:
     res = {} # res = dict()
@@ -296,7 +1274,8 @@ def avistamientos_por_fecha(avistamientos:list[Avistamiento])->dict[date, list[A
     return res
 
 ### 4.1.2 Formas distintas por año
-def formas_distintas_por_año(avistamientos: list[Avistamiento]) -> dict[int, set[str]]:
+@instrumentada
+def formas_distintas_por_año(avistamientos: Iterable[Avistamiento]) -> dict[int, set[str]]:
     '''
     Devuelve un diccionario en el que se agrupan para cada año las formas distintas de los
     avistamientos de ese año. Las claves del diccionario son años (int) y los valores asociados
@@ -311,14 +1290,15 @@ def formas_distintas_por_año(avistamientos: list[Avistamiento]) -> dict[int, se
     return res
 
 ### 4.2 Formas de avistamientos por mes
-def formas_por_mes(avistamientos:list[Avistamiento])->dict[str, set[str]]:
+@instrumentada
+def formas_por_mes(avistamientos:Iterable[Avistamiento])->dict[str, set[str]]:
     ''' 
     Devuelve un diccionario que indexa las distintas formas de avistamientos
     por los nombres de los meses en que se observan.
     Por ejemplo, para el mes "Enero" se asociará un conjunto con todas las
     formas distintas observadas en dicho mes.
         
-    :param avistamientos: lista de tuplas con la información de los avistamientos 
+    :param avistamientos: iterable de tuplas con la información de los avistamientos 
     :return: diccionario en el que las claves son los nombres de los meses 
          y los valores son conjuntos con las formas observadas en cada mes
     '''
@@ -342,11 +1322,12 @@ def pasa_mes_a_nombre(mes: int) -> str:
 '''
 
 ### 4.3 Número de avistamientos por año
-def numero_avistamientos_por_año(avistamientos:list[Avistamiento])->dict[int, int]:
+@instrumentada
+def numero_avistamientos_por_año(avistamientos:Iterable[Avistamiento])->dict[int, int]:
     '''
     Devuelve el número de avistamientos observados en cada año.
              
-    :param avistamientos: lista de tuplas con la información de los avistamientos 
+    :param avistamientos: iterable de tuplas con la información de los avistamientos 
     :return: diccionario en el que las claves son los años
          y los valores son el número de avistamientos observados en ese año
     '''
@@ -359,13 +1340,14 @@ def numero_avistamientos_por_año(avistamientos:list[Avistamiento])->dict[int, i
     return res
 
 ### 4.4 Número de avistamientos por mes del año
-def num_avistamientos_por_mes(avistamientos:list[Avistamiento])->dict[int, int]:
+@instrumentada
+def num_avistamientos_por_mes(avistamientos:Iterable[Avistamiento])->dict[int, int]:
     '''
     Devuelve el número de avistamientos observados en cada mes del año.
     Usar la expresión .date().month para obtener el número del mes de un objeto datetime.
     Usar como claves los nombres de los doce meses con la inicial en mayúsculas:
 
-    :param avistamientos: lista de tuplas con la información de los avistamientos 
+    :param avistamientos: iterable de tuplas con la información de los avistamientos 
     :return:diccionario en el que las claves son los nombres de los meses y 
          los valores son el número de avistamientos observados en ese mes
     '''
@@ -378,12 +1360,13 @@ def num_avistamientos_por_mes(avistamientos:list[Avistamiento])->dict[int, int]:
     return res
 
 ### 4.5 Coordenadas con mayor número de avistamientos
-def coordenadas_mas_avistamientos(avistamientos:list[Avistamiento])->Coordenadas:
+@instrumentada
+def coordenadas_mas_avistamientos(avistamientos:Iterable[Avistamiento])->Coordenadas:
     '''
     Devuelve las coordenadas enteras que se corresponden con 
     la zona donde más avistamientos se han observado.
     
-    :param avistamientos: lista de tuplas con la información de los avistamientos 
+    :param avistamientos: iterable de tuplas con la información de los avistamientos 
     :return: Coordenadas (sin decimales) que acumulan más avistamientos
     '''
     # Hay que seguir dos pasos:
@@ -406,11 +1389,12 @@ def coordenadas_mas_avistamientos(avistamientos:list[Avistamiento])->Coordenadas
 
 
 ### 4.6 Hora del día con mayor número de avistamientos
-def hora_mas_avistamientos(avistamientos:list[Avistamiento])->int:
+@instrumentada
+def hora_mas_avistamientos(avistamientos:Iterable[Avistamiento])->int:
     ''' 
     Devuelve la hora del día (de 0 a 23) con mayor número de avistamientos
     
-    :param avistamientos: lista de tuplas con la información de los avistamientos 
+    :param avistamientos: iterable de tuplas con la información de los avistamientos 
     :return: hora del día en la que se producen más avistamientos
       
     '''
@@ -420,7 +1404,7 @@ def hora_mas_avistamientos(avistamientos:list[Avistamiento])->int:
         hora = av.fechahora.hour
         if hora not in conteo_por_horas:
             conteo_por_horas[hora] = 0
-        conteo_por_horas += 1
+        conteo_por_horas[hora] += 1
     # Segundo paso
     #                      devuelve un item (clave, valor)
     #      =======================================================
@@ -431,38 +1415,42 @@ def hora_mas_avistamientos(avistamientos:list[Avistamiento])->int:
     
 
 ### 4.7 Longitud media de los comentarios por estado
-def longitud_media_comentarios_por_estado(avistamientos:list[Avistamiento])->dict[str,float]:
+@instrumentada
+def longitud_media_comentarios_por_estado(avistamientos:Iterable[Avistamiento])->dict[str,float]:
     '''
     Devuelve un diccionario en el que las claves son los estados donde se
     producen los avistamientos y los valores son la longitud media de los
     comentarios de los avistamientos en cada estado.
     
-    :param avistamientos: lista de tuplas con la información de los avistamientos 
+    :param avistamientos: iterable de tuplas con la información de los avistamientos 
     :return: diccionario que almacena la longitud media de los comentarios (valores) por estado (claves)
     '''
-    # 1. Hacer un dicc que agrupe en listas los tamaños de los comentarios por estados
-    # (clave: estados, valores: lista de tamaños de comentarios)
+    # 1. Hacer un dicc que acumule la suma de los tamaños de los comentarios y
+    # su número por estados (clave: estados, valores: [suma, número]), para no
+    # guardar un tamaño por avistamiento
     aux = {}
     for av in avistamientos:
         if av.estado not in aux:
-            aux[av.estado] = []
-        aux[av.estado].append(len(av.comentarios))
+            aux[av.estado] = [0, 0]
+        suma = aux[av.estado]
+        suma[0] += len(av.comentarios)
+        suma[1] += 1
     
-    # 2. Recorrer cada estado y lista anterior, y calcular la media de la lista
+    # 2. Recorrer cada estado y calcular la media a partir de la suma y el número
     res = {}
-    for estado, lista_tams_comentarios in aux.items():
-        media = sum(lista_tams_comentarios) / len(lista_tams_comentarios)
-        res[estado] = media
+    for estado, (total, num) in aux.items():
+        res[estado] = total / num
 
     return res    
 
 ### 4.8 Porcentaje de avistamientos por forma
-def porc_avistamientos_por_forma(avistamientos:list[Avistamiento])->dict[str,float]:  
+@instrumentada
+def porc_avistamientos_por_forma(avistamientos:Iterable[Avistamiento])->dict[str,float]:  
     '''
     Devuelve un diccionario en el que las claves son las formas de los
     avistamientos, y los valores los porcentajes de avistamientos con cada forma.
     
-    :param avistamientos: lista de tuplas con la información de los avistamientos 
+    :param avistamientos: iterable de tuplas con la información de los avistamientos 
     :return:  diccionario que almacena los porcentajes de avistamientos (valores)
          por forma (claves)
     '''  
@@ -470,45 +1458,38 @@ def porc_avistamientos_por_forma(avistamientos:list[Avistamiento])->dict[str,flo
     conteos = Counter(av.forma for av in avistamientos)
 
     res = {}
-    total = len(avistamientos)
+    # No se usa len(avistamientos), porque puede ser un generador
+    total = sum(conteos.values())
     for forma, recuento in conteos.items():
         res[forma] = recuento*100/total
     return res
 
 
 ### 4.9 Avistamientos de mayor duración por estado
-def avistamientos_mayor_duracion_por_estado(avistamientos:list[Avistamiento], n:int=3)->dict[str,Avistamiento]:
+@instrumentada
+def avistamientos_mayor_duracion_por_estado(avistamientos:Iterable[Avistamiento], n:int=3)->dict[str,Avistamiento]:
     '''
     Devuelve un diccionario que almacena los n avistamientos de mayor duración 
     en cada estado, ordenados de mayor a menor duración.
     
-    :param avistamientos: lista de tuplas con la información de los avistamientos 
+    :param avistamientos: iterable de tuplas con la información de los avistamientos 
     :param n: número de avistamientos a almacenar por cada estado 
     :return: diccionario en el que las claves son los estados y los valores son listas con los "n" avistamientos de mayor duración de cada estado, ordenados de mayor a menor duración
     '''
-    # SI uso defaultdict(list), no tengo que preguntar si existe la
-    # clave, porque en caso de no existir se añadirá automáticamente
-    # un list asociado a esa clave
-    indice_por_estado = defaultdict(list)
-    for av in avistamientos:
-        indice_por_estado[av.estado].append(av)
-
-    res = {}
-    for estado, avs_estado in indice_por_estado.items():
-        # Tengo que quedarme con los n avistamientos más largos
-        # de avs_estado
-        avs_estado.sort(key=lambda av:av.duracion, reverse=True) 
-        res[estado] = avs_estado[:n]
-    
-    return res
+    # En lugar de guardar todos los avistamientos de cada estado y ordenarlos,
+    # se guardan sólo los n más largos de cada estado en un montículo
+    return n_mayores_por_grupo(avistamientos, n, 
+                               grupo=lambda av:av.estado, 
+                               key=lambda av:av.duracion)
 
 ### 4.10 Año con más avistamientos de una forma
-def año_mas_avistamientos_forma(avistamientos:list[Avistamiento], forma:str)->int:
+@instrumentada
+def año_mas_avistamientos_forma(avistamientos:Iterable[Avistamiento], forma:str)->int:
     '''
     Devuelve el año en el que se han observado más avistamientos
     de una forma dada.
     
-    :param avistamientos: lista de tuplas con la información de los avistamientos 
+    :param avistamientos: iterable de tuplas con la información de los avistamientos 
     :param forma: forma del avistamiento 
     :return: año con mayor número de avistamientos de la forma dada
     '''
@@ -516,17 +1497,17 @@ def año_mas_avistamientos_forma(avistamientos:list[Avistamiento], forma:str)->i
                       for av in avistamientos 
                       if av.forma==forma)
 
-    return conteos.most_common(1)[0][0]
-in
+    return n_mayores(conteos.items(), 1, key=lambda item:item[1])[0][0]
 
 ### 4.11 Estados con mayor número de avistamientos
-def estados_mas_avistamientos(avistamientos:list[Avistamiento], n:int=5)->list[tuple[str,int]]:
+@instrumentada
+def estados_mas_avistamientos(avistamientos:Iterable[Avistamiento], n:int=5)->list[tuple[str,int]]:
     '''
     Devuelve una lista con los estados en los que se han observado
     más avistamientos, junto con el número de avistamientos,
     ordenados de mayor a menor número de avistamientos.
     
-    :param avistamientos: lista de tuplas con la información de los avistamientos 
+    :param avistamientos: iterable de tuplas con la información de los avistamientos 
     :type avistamientos: [Avistamiento(datetime, str, str, str, int, str, Coordenadas(float, float))]
     :param n: número de estados a devolver 
     :return: lista con los estados donde se han observado más avistamientos,
@@ -534,14 +1515,16 @@ def estados_mas_avistamientos(avistamientos:list[Avistamiento], n:int=5)->list[t
          del número de avistamientos y con un máximo de "limite" estados.
     '''
     contador = Counter(av.estado for av in avistamientos)
+    return n_mayores(contador.items(), n, key=lambda item:item[1])
 
 ### 4.12 Duración total de los avistamientos de cada año en un estado dado
-def duracion_total_avistamientos_año(avistamientos:list[Avistamiento], estado:str)-> dict[int, int]:
+@instrumentada
+def duracion_total_avistamientos_año(avistamientos:Iterable[Avistamiento], estado:str)-> dict[int, int]:
     '''
     Devuelve un diccionario que almacena la duración total de los avistamientos 
     en cada año, para un estado dado.
     
-    :param avistamientos: lista de tuplas con la información de los avistamientos 
+    :param avistamientos: iterable de tuplas con la información de los avistamientos 
     :param estado: nombre del estado
     :return: diccionario en el que las claves son los años y los valores son números con la suma de las duraciones de los avistamientos observados ese año en el estado dado.
     '''
@@ -554,30 +1537,29 @@ def duracion_total_avistamientos_año(avistamientos:list[Avistamiento], estado:s
     return res
 
 ### 4.13 Fecha del avistamiento más reciente de cada estado
-def avistamiento_mas_reciente_por_estado(avistamientos:list[Avistamiento])->dict[str, datetime]:
+@instrumentada
+def avistamiento_mas_reciente_por_estado(avistamientos:Iterable[Avistamiento])->dict[str, datetime]:
     '''
     Devuelve un diccionario que almacena la fecha del último avistamiento
     observado en cada estado.
     
-    :param avistamientos: lista de tuplas con la información de los avistamientos 
+    :param avistamientos: iterable de tuplas con la información de los avistamientos 
     :return:  diccionario en el que las claves son los estados y los valores son 
          las fechas del último avistamientos observado en ese estado.
     '''
-    indice_por_estado = defaultdict(list)
-    for av in avistamientos:
-        # En las listas del diccionario voy a meter
-        # sólo las fechas, porque es lo único que necesito
-        # luego para buscar la mayor
-        indice_por_estado[av.estado].append(av.fechahora)
-    
+    # Se guarda sólo la fecha más reciente de cada estado, actualizándola
+    # con cada avistamiento, en lugar de una lista de fechas por estado
     res = {}
-    for estado, fechas_estado in indice_por_estado.items():
-        res[estado] = max(fechas_estado)
+    for av in avistamientos:
+        fecha = res.get(av.estado)
+        if fecha == None or av.fechahora > fecha:
+            res[av.estado] = av.fechahora
 
     return res
 
 ### EXTRA:
-def ciudad_mayor_duracion_media(avistamientos:list[Avistamiento], 
+@instrumentada
+def ciudad_mayor_duracion_media(avistamientos:Iterable[Avistamiento], 
                               fecha_ini: date | None = None,
                               fecha_fin: date | None = None) -> str:
     '''
@@ -0,0 +1,200 @@
+'''
+Representación por columnas (struct-of-arrays) de un conjunto de avistamientos.
+
+Cada campo numérico se guarda en un array de NumPy, y los campos categóricos
+(estado, forma y ciudad) se guardan como códigos enteros que indexan una lista
+con los valores distintos. Así las operaciones de recuento y suma se hacen
+sobre arrays completos, sin recorrer los avistamientos uno a uno en Python.
+'''
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from avistamientos import MESES, Avistamiento, itera_avistamientos
+from coordenadas import Coordenadas, distancias
+
+## Definición de constantes
+EPOCA = datetime(1970, 1, 1)
+MINUTO = timedelta(minutes=1)
+
+def _codifica(valores:Iterable[str])->tuple[np.ndarray, list[str], dict[str, int]]:
+    '''
+    Codifica una secuencia de cadenas como enteros (codificación por diccionario).
+
+    :param valores: cadenas que se quieren codificar
+    :return: tupla con el array de códigos, la lista de valores distintos
+         (indexada por código) y el diccionario de valor a código
+    '''
+    codigos_por_valor = {}
+    codigos = np.fromiter((codigos_por_valor.setdefault(valor, len(codigos_por_valor))
+                           for valor in valores), dtype=np.int32)
+    return codigos, list(codigos_por_valor), codigos_por_valor
+
+class AvistamientosColumnar:
+    '''
+    Conjunto de avistamientos almacenado por columnas.
+
+    Atributos:
+        minutos: instante de cada avistamiento, en minutos desde el 1/1/1970 (int64)
+        latitudes, longitudes: coordenadas de cada avistamiento (float64)
+        duraciones: duración en segundos de cada avistamiento (int64)
+        estados, formas, ciudades: códigos enteros de cada avistamiento (int32)
+        valores_estado, valores_forma, valores_ciudad: valor de cada código
+        comentarios: lista con los comentarios de cada avistamiento
+    '''
+
+    def __init__(self, avistamientos:Iterable[Avistamiento]):
+        '''
+        Construye el conjunto a partir de los avistamientos dados, por ejemplo
+        la lista que devuelve lee_avistamientos.
+
+        :param avistamientos: iterable de tuplas con la información de los avistamientos
+        '''
+        avistamientos = list(avistamientos)
+        self.minutos = np.array([av.fechahora for av in avistamientos],
+                                dtype="datetime64[m]").astype(np.int64)
+        self.latitudes = np.array([av.ubicacion.latitud for av in avistamientos], dtype=np.float64)
+        self.longitudes = np.array([av.ubicacion.longitud for av in avistamientos], dtype=np.float64)
+        self.duraciones = np.array([av.duracion for av in avistamientos], dtype=np.int64)
+        self.estados, self.valores_estado, self._codigos_estado = \
+            _codifica(av.estado for av in avistamientos)
+        self.formas, self.valores_forma, self._codigos_forma = \
+            _codifica(av.forma for av in avistamientos)
+        self.ciudades, self.valores_ciudad, self._codigos_ciudad = \
+            _codifica(av.ciudad for av in avistamientos)
+        self.comentarios = [av.comentarios for av in avistamientos]
+
+    @classmethod
+    def desde_fichero(cls, fichero:str, rapido:bool=False)->"AvistamientosColumnar":
+        '''
+        Construye el conjunto leyendo directamente un fichero csv.
+
+        :param fichero: ruta del fichero csv que contiene los datos en codificación utf-8
+        :param rapido: modo de conversión de fechas (ver lee_avistamientos)
+        :return: conjunto de avistamientos por columnas
+        '''
+        return cls(itera_avistamientos(fichero, rapido))
+
+    def __len__(self)->int:
+        return len(self.minutos)
+
+    def __getitem__(self, indice:int)->Avistamiento:
+        '''
+        Reconstruye el avistamiento que ocupa la posición indice.
+        '''
+        return Avistamiento(EPOCA + int(self.minutos[indice]) * MINUTO,
+                            self.valores_ciudad[self.ciudades[indice]],
+                            self.valores_estado[self.estados[indice]],
+                            self.valores_forma[self.formas[indice]],
+                            int(self.duraciones[indice]),
+                            self.comentarios[indice],
+                            Coordenadas(float(self.latitudes[indice]),
+                                        float(self.longitudes[indice])))
+
+    def __iter__(self)->Iterator[Avistamiento]:
+        for indice in range(len(self)):
+            yield self[indice]
+
+    def avistamientos(self)->list[Avistamiento]:
+        '''
+        Devuelve la lista de avistamientos, en el mismo orden en que se recibieron.
+        '''
+        return list(self)
+
+    def años(self)->np.ndarray:
+        '''
+        Devuelve un array con el año de cada avistamiento.
+        '''
+        return self.minutos.astype("datetime64[m]").astype("datetime64[Y]").astype(np.int64) + 1970
+
+    def meses(self)->np.ndarray:
+        '''
+        Devuelve un array con el mes de cada avistamiento, de 0 (enero) a 11 (diciembre).
+        '''
+        return self.minutos.astype("datetime64[m]").astype("datetime64[M]").astype(np.int64) % 12
+
+    def horas(self)->np.ndarray:
+        '''
+        Devuelve un array con la hora de cada avistamiento, de 0 a 23.
+        '''
+        return (self.minutos // 60) % 24
+
+    ### Versiones vectorizadas de las funciones de avistamientos
+    def duracion_total(self, estado:str)->int:
+        '''
+        Devuelve la duración total de los avistamientos de un estado.
+        Equivale a avistamientos.duracion_total.
+        '''
+        codigo = self._codigos_estado.get(estado)
+        if codigo == None:
+            return 0
+        return int(self.duraciones[self.estados == codigo].sum())
+
+    def numero_avistamientos_por_año(self)->dict[int, int]:
+        '''
+        Devuelve el número de avistamientos observados en cada año.
+        Equivale a avistamientos.numero_avistamientos_por_año.
+        '''
+        años, conteos = np.unique(self.años(), return_counts=True)
+        return {int(año): int(conteo) for año, conteo in zip(años, conteos)}
+
+    def num_avistamientos_por_mes(self)->dict[str, int]:
+        '''
+        Devuelve el número de avistamientos observados en cada mes del año.
+        Equivale a avistamientos.num_avistamientos_por_mes.
+        '''
+        conteos = np.bincount(self.meses(), minlength=12)
+        return {MESES[mes]: int(conteo) for mes, conteo in enumerate(conteos) if conteo > 0}
+
+    def hora_mas_avistamientos(self)->int:
+        '''
+        Devuelve la hora del día (de 0 a 23) con mayor número de avistamientos.
+        Equivale a avistamientos.hora_mas_avistamientos: si varias horas tienen
+        el máximo, devuelve la del primer avistamiento de esas horas, y si no
+        hay avistamientos lanza ValueError.
+        '''
+        horas = self.horas()
+        if len(horas) == 0:
+            raise ValueError("No hay avistamientos")
+        conteos = np.bincount(horas, minlength=24)
+        empatadas = np.flatnonzero(conteos == conteos.max())
+        if len(empatadas) == 1:
+            return int(empatadas[0])
+        # argmax devuelve la posición del primer avistamiento de alguna de las horas empatadas
+        return int(horas[np.argmax(np.isin(horas, empatadas))])
+
+    def ids_cercanos(self, ubicacion:Coordenadas, radio:float, haversine:bool=False)->np.ndarray:
+        '''
+        Devuelve las posiciones de los avistamientos que están a una distancia
+        menor o igual que radio de la ubicación, calculadas con una sola máscara.
+
+        :param ubicacion: coordenadas del centro de la búsqueda
+        :param radio: radio de distancia (en grados, o en kilómetros si haversine es True)
+        :param haversine: tipo de distancia (ver coordenadas.distancias)
+        :return: array con las posiciones de los avistamientos, en orden creciente
+        '''
+        mascara = distancias(ubicacion, self.latitudes, self.longitudes, haversine) <= radio
+        return np.flatnonzero(mascara)
+
+    def avistamientos_cercanos_ubicacion(self, ubicacion:Coordenadas, radio:float,
+                                         haversine:bool=False)->set[Avistamiento]:
+        '''
+        Devuelve el conjunto de avistamientos cercanos a una ubicación.
+        Equivale a avistamientos.avistamientos_cercanos_ubicacion.
+        '''
+        return {self[id] for id in self.ids_cercanos(ubicacion, radio, haversine)}
+
+    def avistamiento_cercano_mayor_duracion(self, ubicacion:Coordenadas, radio:float=0.5,
+                                            haversine:bool=False)->tuple[str, int]:
+        '''
+        Devuelve el comentario y la duración del avistamiento más largo de
+        los situados en el entorno de la ubicación.
+        Equivale a avistamientos.avistamiento_cercano_mayor_duracion.
+        '''
+        ids = self.ids_cercanos(ubicacion, radio, haversine)
+        if len(ids) == 0:
+            raise ValueError("No hay avistamientos en el entorno de las coordenadas")
+        # argmax devuelve el primero de los máximos, igual que max
+        id = ids[np.argmax(self.duraciones[ids])]
+        return (self.comentarios[id], int(self.duraciones[id]))
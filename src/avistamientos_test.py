@@ -1,5 +1,17 @@
 import avistamientos as av
 from avistamientos import Avistamiento
+from avistamientos_columnar import AvistamientosColumnar
+from agregados import calcula_agregados
+from estadisticas import EstadisticasIncrementales
+from indices import IndiceEspacial, IndiceHash, IndiceTemporal, IndiceTextual
+from consultas import Consulta
+from conjunto import ConjuntoAvistamientos
+from memoizacion import CacheLRU
+from instrumentacion import instrumenta
+from rejilla import PiramideRejillas
+from series_temporales import SerieDiaria
+import particiones
+import tempfile
 from datetime import datetime, date
 from coordenadas import *
 from typing import Iterable, TypeVar
@@ -28,6 +40,14 @@ def test_lee_avistamientos(avistamientos:list[Avistamiento])->None:
     print("Los cinco avistamientos últimos son: ")
     mostrar_iterable_enumerado(avistamientos [-5:])
 
+def test_itera_lotes_avistamientos(fichero:str, tam_lote:int=10000)->None:
+    print(f"Leyendo avistamientos en lotes de {tam_lote}:")
+    for indx, lote in enumerate(av.itera_lotes_avistamientos(fichero, tam_lote), 1):
+        print(f"\tLote {indx}: {len(lote)} avistamientos")
+    # Las funciones de la sección 4 admiten cualquier iterable, también un generador
+    print("Estados con más avistamientos (leyendo de forma perezosa):",
+          av.estados_mas_avistamientos(av.itera_avistamientos(fichero)))
+
 def test_numero_avistamientos_fecha(avistamientos:list[Avistamiento], fecha:datetime)->None:
     res = av.numero_avistamientos_fecha(avistamientos, fecha)
     fechastr = fecha.strftime("%m/%d/%Y")
@@ -161,6 +181,173 @@ def test_avistamiento_mas_reciente_por_estado(avistamientos:list[Avistamiento])-
     print("Mostrando la fecha del último avistamiento por estado")
     mostrar_diccionario2(indice)
 
+def test_avistamientos_columnar(avistamientos:list[Avistamiento])->None:
+    columnar = AvistamientosColumnar(avistamientos)
+    print(f"Se han pasado {len(columnar)} avistamientos a formato columnar.")
+    print(f"Duración total de los avistamientos en ca: {columnar.duracion_total('ca')} segundos.")
+    print(f"Hora en la que se han observado más avistamientos: {columnar.hora_mas_avistamientos()}")
+    # Con un empate, la hora del primer avistamiento, como av.hora_mas_avistamientos
+    empate = [avistamientos[1], avistamientos[0]]
+    print(f"Con un empate entre {empate[0].fechahora.hour} y {empate[1].fechahora.hour}: "
+          f"{AvistamientosColumnar(empate).hora_mas_avistamientos()} "
+          f"(sin formato columnar: {av.hora_mas_avistamientos(empate)})")
+    print("Número de avistamientos por mes")
+    mostrar_diccionario2(columnar.num_avistamientos_por_mes())
+    print("El primer avistamiento reconstruido es:", columnar[0])
+
+def test_indice_espacial(avistamientos:list[Avistamiento], ubicacion:Coordenadas, radio:float)->None:
+    indice = IndiceEspacial(avistamientos)
+    print(f"Índice espacial con {len(indice.celdas)} celdas.")
+    test_avistamientos_cercanos_ubicacion_indice(avistamientos, ubicacion, radio, indice)
+    res = av.avistamiento_cercano_mayor_duracion(avistamientos, ubicacion, radio, indice)
+    print(f"Avistamiento más largo en un radio {radio} (usando el índice): {res}")
+
+def test_avistamientos_cercanos_ubicacion_indice(avistamientos:list[Avistamiento], ubicacion:Coordenadas, radio:float, indice:IndiceEspacial)->None:
+    res = av.avistamientos_cercanos_ubicacion(avistamientos, ubicacion, radio, indice)
+    print(f"Avistamientos cercanos a ({ubicacion.latitud}, {ubicacion.longitud}) (usando el índice): {len(res)}")
+
+def test_indice_temporal(avistamientos:list[Avistamiento], fecha_inicial:date|None=None, fecha_final:date|None=None)->None:
+    indice = IndiceTemporal(avistamientos)
+    res = av.avistamientos_fechas(avistamientos, fecha_inicial, fecha_final, indice)
+    print(msg_avistamientos_fecha(fecha_inicial, fecha_final), "(usando el índice)")
+    print(f"Total avistamientos {len(res)}")
+    if fecha_inicial != None:
+        num = av.numero_avistamientos_fecha(avistamientos, fecha_inicial, indice)
+        print(f"El día {fecha_inicial.strftime('%m/%d/%Y')} se produjeron {num} avistamientos")
+
+def test_calcula_agregados(avistamientos:list[Avistamiento])->None:
+    peticiones = ["numero_avistamientos_por_año", "porc_avistamientos_por_forma",
+                  ("estados_mas_avistamientos", 3), "avistamiento_mas_reciente_por_estado"]
+    res = calcula_agregados(avistamientos, peticiones)
+    for peticion, resultado in res.items():
+        print(f"{peticion} ==> {resultado}")
+
+def test_estadisticas_incrementales(avistamientos:list[Avistamiento])->None:
+    estadisticas = EstadisticasIncrementales(avistamientos[:-1])
+    estadisticas.añade(avistamientos[-1])
+    print(f"Estadísticas de {len(estadisticas)} avistamientos:")
+    print(f"\tDuración total en ca: {estadisticas.duracion_total('ca')} segundos")
+    res = estadisticas.coordenadas_mas_avistamientos()
+    print(f"\tCoordenadas con más avistamientos: ({res.latitud}, {res.longitud})")
+    print("\tPorcentajes de avistamientos por forma:")
+    mostrar_diccionario2(estadisticas.porc_avistamientos_por_forma())
+
+def test_indice_textual(avistamientos:list[Avistamiento], anyo:int, palabra:str)->None:
+    indice = IndiceTextual(avistamientos)
+    print(f"Índice de texto con {len(indice.vocabulario)} palabras distintas.")
+    res = indice.avistamientos_palabra(palabra, anyo)
+    print(f'Avistamientos de {anyo} con la palabra "{palabra}": {len(res)}')
+    res = indice.avistamientos_prefijo(palabra, anyo)
+    print(f'Avistamientos de {anyo} con palabras que empiezan por "{palabra}": {len(res)}')
+    print(f'El avistamiento con el comentario más largo de {anyo} incluyendo la palabra "{palabra}" es:')
+    print(av.comentario_mas_largo(avistamientos, anyo, palabra, indice))
+
+def test_consulta(avistamientos:list[Avistamiento], estado:str, fecha_inicial:date, fecha_final:date)->None:
+    consulta = Consulta(avistamientos,
+                        indice_temporal=IndiceTemporal(avistamientos),
+                        indice_estado=IndiceHash(avistamientos, lambda av: av.estado))
+    consulta = consulta.donde(estado=estado, desde=fecha_inicial, hasta=fecha_final)
+    print(f"Consulta resuelta con: {consulta.explica()}")
+    print(f"Número de avistamientos por año en {estado} entre {fecha_inicial} y {fecha_final}:")
+    mostrar_diccionario2(consulta.agrega(av.numero_avistamientos_por_año))
+
+def test_conjunto_avistamientos(avistamientos:list[Avistamiento], estados:set[str], forma:str)->None:
+    conjunto = ConjuntoAvistamientos(avistamientos)
+    for estado in estados:
+        print(f"Duración total de los avistamientos en {estado}: {conjunto.duracion_total(estado)} segundos.")
+    print(f"Número de formas distintas observadas en los estados {', '.join(estados)}: {conjunto.formas_estados(estados)}")
+    print(f"Avistamiento de forma '{forma}' de mayor duración: {conjunto.avistamiento_mayor_duracion(forma)}")
+
+def test_cache_conjunto(avistamientos:list[Avistamiento])->None:
+    conjunto = ConjuntoAvistamientos(avistamientos, cache=CacheLRU(64))
+    for _ in range(3):
+        conjunto.estados_mas_avistamientos()
+        conjunto.hora_mas_avistamientos()
+    print(f"Estados con más avistamientos: {conjunto.estados_mas_avistamientos()}")
+    print(f"Estadísticas de la caché: {conjunto.cache.estadisticas()}")
+    conjunto.añade(avistamientos[0])
+    print(f"Tras añadir un avistamiento (versión {conjunto.version}): {conjunto.cache.estadisticas()}")
+    otro = ConjuntoAvistamientos(avistamientos[:100], cache=conjunto.cache)
+    print(f"Estados con más avistamientos de otro conjunto con la misma caché: "
+          f"{otro.estados_mas_avistamientos()}")
+
+def test_avistamientos_compactos(fichero:str)->None:
+    normales = av.lee_avistamientos(fichero)
+    compactos = av.lee_avistamientos(fichero, compacto=True)
+    print(f"Primer avistamiento compacto: {compactos[0]}")
+    print(f"¿Iguales a los avistamientos normales? {compactos == normales}")
+    print(f"¿Mismo número de avistamientos por año? "
+          f"{av.numero_avistamientos_por_año(compactos) == av.numero_avistamientos_por_año(normales)}")
+
+def test_instrumentacion(fichero:str)->None:
+    with instrumenta() as medidas:
+        avistamientos = av.lee_avistamientos(fichero)
+        av.estados_mas_avistamientos(avistamientos)
+        av.hora_mas_avistamientos(avistamientos)
+    print(medidas.tabla())
+    # La lectura con selección de columnas también separa las fases de la carga
+    with instrumenta() as medidas:
+        av.lee_avistamientos(fichero, columnas={"fechahora", "estado", "duracion", "ubicacion"})
+    print(medidas.tabla())
+
+def test_lectura_tolerante(fichero:str)->None:
+    rechazos = []
+    avistamientos = av.lee_avistamientos(fichero, rechazos=rechazos)
+    print(f"Avistamientos leídos: {len(avistamientos)}, filas rechazadas: {len(rechazos)}")
+    for rechazo in rechazos[:5]:
+        print(f"\tlínea {rechazo.linea}: {rechazo.motivo}")
+
+def test_piramide_rejillas(avistamientos:list[Avistamiento])->None:
+    piramide = PiramideRejillas(avistamientos)
+    for tam_celda, rejilla in piramide.niveles.items():
+        print(f"Celdas de {tam_celda} grados con avistamientos: {len(rejilla)}, "
+              f"la de más avistamientos: {rejilla.celda_mas_avistamientos()}")
+    tesela = piramide.tesela(0.1, 40.0, 41.0, -86.0, -85.0)
+    print(f"Tesela de 0.1 grados alrededor de Muncie:\n{tesela.conteos}")
+
+def test_campos_tiempo(avistamientos:list[Avistamiento])->None:
+    av0 = avistamientos[0]
+    print(f"Fecha y hora: {av0.fechahora}")
+    print(f"Ordinal del día: {av0.dia}, año: {av0.año}, mes: {av.MESES[av0.mes]}, hora: {av0.hora}")
+
+def test_media_dias_resumen(avistamientos:list[Avistamiento])->None:
+    resumen = av.resumen_dias_por_año(avistamientos)
+    for anyo in (None, 2000, 2005):
+        print(f"Media de días entre avistamientos ({anyo}): "
+              f"{av.media_dias_resumen(resumen, anyo)} "
+              f"(un recorrido: {av.media_dias_entre_avistamientos(avistamientos, anyo)})")
+
+def test_serie_diaria(avistamientos:list[Avistamiento])->None:
+    serie = SerieDiaria.desde_avistamientos(avistamientos)
+    print(f"Serie diaria de {len(serie)} días")
+    print(f"Avistamientos el 4/7/2005: {serie.numero_avistamientos_fecha(date(2005, 7, 4))}")
+    anual = serie.remuestrea("año")
+    for fecha, conteo, duracion in list(zip(anual.fechas, anual.conteos, anual.duraciones))[-5:]:
+        print(f"\t{fecha}: {conteo} avistamientos, {duracion} segundos")
+    print(f"Media móvil de 30 días (último día): {serie.media_movil(30).conteos[-1]:.2f}")
+
+def test_particiones(fichero:str)->None:
+    with tempfile.TemporaryDirectory() as directorio:
+        manifiesto = particiones.particiona(fichero, directorio)
+        print(f"Particiones: {len(manifiesto['particiones'])} años")
+        avistamientos = particiones.lee_avistamientos_particiones(directorio, anyo=2005)
+        print(f"Avistamientos leídos para 2005: {len(avistamientos)}")
+        print(f"Media de días entre avistamientos en 2005: "
+              f"{av.media_dias_entre_avistamientos(avistamientos, 2005)}")
+        fecha_inicial, fecha_final = date(2004, 12, 20), date(2005, 1, 10)
+        print(f"Años necesarios entre {fecha_inicial} y {fecha_final}: "
+              f"{particiones.años_necesarios(manifiesto, fecha_inicial, fecha_final)}")
+
+def test_columnas(fichero:str)->None:
+    columnas = {"fechahora", "ciudad", "estado", "forma", "duracion", "ubicacion"}
+    avistamientos = av.lee_avistamientos(fichero, columnas=columnas)
+    print(f"Avistamientos leídos sin comentarios: {len(avistamientos)}")
+    print(f"Duración total en 'ca': {av.duracion_total(avistamientos, 'ca')}")
+    print(f"Comentario del primero (se lee del fichero): {avistamientos[0].comentarios}")
+    todos = av.lee_avistamientos(fichero)
+    print(f"Igual que con todos los campos: {avistamientos == todos}")
+    print(f"Mismo orden que con todos los campos: {sorted(avistamientos) == sorted(todos)}")
+
 def test_ej2_1(avistamientos:list[Avistamiento])->None:
     print("2.1" , "#"*70)
     fecha = datetime(2005, 5, 1).date()
@@ -263,8 +450,9 @@ def test_ej4_13(avistamientos:list[Avistamiento])->None:
     test_avistamiento_mas_reciente_por_estado(avistamientos)
 
 def main():
-    avistamientos = av.lee_avistamientos("data/ovnis.csv")
+    avistamientos = av.lee_avistamientos("data/ovnis.csv", usar_cache=True)
     test_lee_avistamientos(avistamientos)
+    #test_itera_lotes_avistamientos("data/ovnis.csv")
 
     #test_ej2_1(avistamientos)
     #test_ej2_2(avistamientos)
@@ -288,6 +476,24 @@ def main():
     # test_ej4_11(avistamientos)
     # test_ej4_12(avistamientos)
     # test_ej4_13(avistamientos)
+    # test_avistamientos_columnar(avistamientos)
+    # test_indice_espacial(avistamientos, Coordenadas(40.1933333,-85.3863889), 0.5)
+    # test_indice_temporal(avistamientos, date(2005, 5, 1), date(2005, 5, 31))
+    # test_calcula_agregados(avistamientos)
+    # test_estadisticas_incrementales(avistamientos)
+    # test_indice_textual(avistamientos, 2005, "ufo")
+    # test_consulta(avistamientos, 'ca', date(2005, 1, 1), date(2005, 12, 31))
+    # test_conjunto_avistamientos(avistamientos, {'in', 'nm', 'pa', 'wa'}, 'circle')
+    # test_cache_conjunto(avistamientos)
+    # test_avistamientos_compactos("data/ovnis.csv")
+    # test_instrumentacion("data/ovnis.csv")
+    # test_lectura_tolerante("data/ovnis.csv")
+    # test_piramide_rejillas(avistamientos)
+    # test_campos_tiempo(avistamientos)
+    # test_media_dias_resumen(avistamientos)
+    # test_serie_diaria(avistamientos)
+    # test_particiones("data/ovnis.csv")
+    # test_columnas("data/ovnis.csv")
 
 if __name__=="__main__":
     main()
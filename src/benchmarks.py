@@ -0,0 +1,695 @@
+'''
+Medidas de rendimiento de las funciones de carga y consulta de avistamientos.
+
+Se ejecuta desde la carpeta src:
+    python benchmarks.py
+    python benchmarks.py suite --salida resultados.json --base referencia.json
+
+La suite mide todas las funciones públicas de avistamientos y coordenadas
+sobre datos sintéticos de varios tamaños, guarda los tiempos en JSON y falla
+(código de salida 1) si algún caso es más lento que en la ejecución de
+referencia por encima del umbral indicado.
+'''
+import argparse
+import calendar
+import csv
+import inspect
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+from datetime import date, datetime
+from itertools import accumulate
+from typing import Callable, Iterable
+
+import numpy as np
+
+import avistamientos as av
+import coordenadas
+import particiones
+from avistamientos import Avistamiento
+from avistamientos_columnar import AvistamientosColumnar
+from coordenadas import Coordenadas
+from indices import IndiceTemporal
+from rejilla import PiramideRejillas, Rejilla
+from series_temporales import SerieDiaria
+from lectura_paralela import lee_avistamientos_paralelo
+
+## Definición de constantes
+# Ciudades de los datos sintéticos: (ciudad, estado, latitud, longitud, peso).
+# Los pesos imitan el reparto de ovnis.csv, con muchos más avistamientos en
+# California, Washington o Florida que en el resto de estados.
+CIUDADES = [("seattle", "wa", 47.6063889, -122.3308333, 9),
+            ("portland", "or", 45.5236111, -122.675, 6),
+            ("spokane", "wa", 47.6588889, -117.425, 3),
+            ("los angeles", "ca", 34.0522222, -118.2427778, 8),
+            ("san diego", "ca", 32.7152778, -117.1563889, 7),
+            ("sacramento", "ca", 38.5816667, -121.4933333, 5),
+            ("san jose", "ca", 37.3394444, -121.8938889, 4),
+            ("phoenix", "az", 33.4483333, -112.0733333, 7),
+            ("tucson", "az", 32.2216667, -110.9258333, 4),
+            ("las vegas", "nv", 36.175, -115.1363889, 6),
+            ("albuquerque", "nm", 35.0844444, -106.6505556, 3),
+            ("houston", "tx", 29.7630556, -95.3630556, 5),
+            ("austin", "tx", 30.2669444, -97.7427778, 3),
+            ("miami", "fl", 25.7738889, -80.1938889, 4),
+            ("orlando", "fl", 28.5380556, -81.3794444, 4),
+            ("tampa", "fl", 27.9472222, -82.4586111, 3),
+            ("chicago", "il", 41.85, -87.65, 6),
+            ("new york city", "ny", 40.7141667, -74.0063889, 6),
+            ("columbus", "oh", 39.9611111, -82.9988889, 3),
+            ("detroit", "mi", 42.3313889, -83.0458333, 3),
+            ("erie", "pa", 42.1291667, -80.0852778, 1),
+            ("muncie", "in", 40.1933333, -85.3863889, 1)]
+# Formas y su peso relativo
+FORMAS = [("light", 21), ("triangle", 10), ("circle", 9), ("fireball", 8),
+          ("other", 7), ("unknown", 7), ("sphere", 7), ("disk", 6), ("oval", 5),
+          ("formation", 3), ("changing", 3), ("cigar", 3), ("flash", 2),
+          ("rectangle", 2), ("cylinder", 2), ("diamond", 2), ("chevron", 1),
+          ("egg", 1), ("teardrop", 1), ("cone", 1), ("cross", 1)]
+# Los avistamientos son mucho más frecuentes en los últimos años, en verano
+# y a última hora de la tarde
+AÑOS = list(range(1950, 2015))
+PESOS_AÑOS = [1.08 ** (año - 1950) for año in AÑOS]
+PESOS_MESES = [6, 5, 6, 6, 6, 8, 12, 10, 9, 9, 9, 8]
+PESOS_HORAS = [8, 5, 4, 3, 3, 2, 2, 1, 1, 1, 1, 1, 1, 1, 1, 2, 2, 3, 5, 12, 18, 20, 18, 12]
+DURACIONES = [(2, 3), (5, 8), (10, 8), (30, 10), (60, 12), (120, 12), (180, 9),
+              (300, 14), (600, 10), (900, 5), (1200, 4), (1800, 3), (3600, 2), (7200, 1)]
+COMENTARIOS = ["Bright light moving fast across the sky",
+               "Three orange orbs in formation, then vanished",
+               "((NUFORC Note: Witness elects to remain anonymous.  PD))",
+               "Saw a disc shaped object hovering over the lake"]
+# Dispersión (en grados) de los avistamientos alrededor de cada ciudad
+DISPERSION = 0.3
+# Tamaños de los datos sintéticos de la suite de regresión
+TAMAÑOS_SUITE = (10_000, 100_000, 1_000_000, 10_000_000)
+
+## Generación de datos sintéticos
+def genera_fichero_sintetico(fichero:str, num_filas:int, semilla:int=0)->None:
+    '''
+    Escribe un fichero csv con el mismo formato que ovnis.csv y
+    num_filas avistamientos generados aleatoriamente. Los estados, las formas,
+    las fechas, las horas y las duraciones siguen repartos parecidos a los de
+    los datos reales, y las coordenadas se agrupan alrededor de cada ciudad.
+
+    :param fichero: ruta del fichero csv que se va a crear
+    :param num_filas: número de avistamientos del fichero
+    :param semilla: semilla del generador de números aleatorios
+    '''
+    aleatorio = random.Random(semilla)
+    # Se usan los pesos acumulados para no recalcularlos en cada elección
+    acumulados_ciudades = list(accumulate(ciudad[-1] for ciudad in CIUDADES))
+    formas, pesos_formas = zip(*FORMAS)
+    acumulados_formas = list(accumulate(pesos_formas))
+    duraciones, pesos_duraciones = zip(*DURACIONES)
+    acumulados_duraciones = list(accumulate(pesos_duraciones))
+    acumulados_años = list(accumulate(PESOS_AÑOS))
+    acumulados_meses = list(accumulate(PESOS_MESES))
+    acumulados_horas = list(accumulate(PESOS_HORAS))
+    with open(fichero, "w", encoding="utf-8", newline="") as f:
+        escritor = csv.writer(f, lineterminator="\n")
+        escritor.writerow(["datetime", "city", "state", "shape", "duration",
+                           "comments", "latitude", "longitude"])
+        for _ in range(num_filas):
+            ciudad, estado, latitud, longitud, _ = \
+                aleatorio.choices(CIUDADES, cum_weights=acumulados_ciudades)[0]
+            año = aleatorio.choices(AÑOS, cum_weights=acumulados_años)[0]
+            mes = aleatorio.choices(range(1, 13), cum_weights=acumulados_meses)[0]
+            dia = aleatorio.randint(1, calendar.monthrange(año, mes)[1])
+            hora = aleatorio.choices(range(24), cum_weights=acumulados_horas)[0]
+            # La mitad de los avistamientos se registran en punto o a y media
+            minuto = aleatorio.choice((0, 30)) if aleatorio.random() < 0.5 else aleatorio.randint(0, 59)
+            escritor.writerow([f"{mes}/{dia}/{año} {hora}:{minuto:02d}", ciudad, estado,
+                               aleatorio.choices(formas, cum_weights=acumulados_formas)[0],
+                               aleatorio.choices(duraciones, cum_weights=acumulados_duraciones)[0],
+                               aleatorio.choice(COMENTARIOS),
+                               round(latitud + aleatorio.uniform(-DISPERSION, DISPERSION), 7),
+                               round(longitud + aleatorio.uniform(-DISPERSION, DISPERSION), 7)])
+
+## Utilidades de medida
+def mide(funcion:Callable, *args, repeticiones:int=1)->float:
+    '''
+    Devuelve el menor tiempo, en segundos, de varias ejecuciones de funcion(*args).
+
+    :param funcion: función que se quiere medir
+    :param args: argumentos con los que se invoca la función
+    :param repeticiones: número de veces que se ejecuta la función
+    :return: tiempo en segundos de la ejecución más rápida
+    '''
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(*args)
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+## Benchmarks
+def benchmark_parseo_fechas(num_filas:int=1_000_000)->dict[str, float]:
+    '''
+    Compara el tiempo de carga de lee_avistamientos con y sin el modo
+    rápido de conversión de fechas, sobre un fichero sintético.
+
+    :param num_filas: número de avistamientos del fichero sintético
+    :return: diccionario con los segundos empleados por cada modo
+    '''
+    with tempfile.TemporaryDirectory() as directorio:
+        fichero = os.path.join(directorio, "ovnis.csv")
+        genera_fichero_sintetico(fichero, num_filas)
+        if av.lee_avistamientos(fichero) != av.lee_avistamientos(fichero, rapido=True):
+            raise AssertionError("El modo rápido no produce los mismos avistamientos")
+        res = {"strptime": mide(av.lee_avistamientos, fichero),
+               "rapido": mide(av.lee_avistamientos, fichero, True)}
+    print(f"Carga de {num_filas} avistamientos:")
+    for modo, segundos in res.items():
+        print(f"\t{modo}: {segundos:.2f} s")
+    print(f"\tAceleración: {res['strptime'] / res['rapido']:.1f}x")
+    return res
+
+def benchmark_lectura_paralela(num_filas:int=1_000_000,
+                               procesos:tuple[int, ...]=(1, 2, 4, 8, 16, 32))->dict[int, float]:
+    '''
+    Mide cómo escala lee_avistamientos_paralelo con el número de procesos,
+    comparándolo con la lectura secuencial de lee_avistamientos.
+
+    :param num_filas: número de avistamientos del fichero sintético
+    :param procesos: números de procesos que se quieren probar
+    :return: diccionario con los segundos empleados con cada número de procesos
+         (la clave 0 corresponde a la lectura secuencial)
+    '''
+    with tempfile.TemporaryDirectory() as directorio:
+        fichero = os.path.join(directorio, "ovnis.csv")
+        genera_fichero_sintetico(fichero, num_filas)
+        res = {0: mide(av.lee_avistamientos, fichero)}
+        for num_procesos in procesos:
+            res[num_procesos] = mide(lee_avistamientos_paralelo, fichero, num_procesos)
+    print(f"Carga en paralelo de {num_filas} avistamientos ({os.cpu_count()} CPUs):")
+    print(f"\tsecuencial: {res[0]:.2f} s")
+    for num_procesos in procesos:
+        print(f"\t{num_procesos} procesos: {res[num_procesos]:.2f} s "
+              f"(aceleración {res[0] / res[num_procesos]:.1f}x)")
+    return res
+
+def memoria_lectura(fichero:str, compacto:bool, **opciones)->int:
+    '''
+    Devuelve los bytes que ocupa la lista de avistamientos leída de un fichero
+    (memoria reservada y no liberada durante la lectura, según tracemalloc).
+    El resto de opciones se pasan a lee_avistamientos.
+    '''
+    tracemalloc.start()
+    try:
+        inicial = tracemalloc.get_traced_memory()[0]
+        avistamientos = av.lee_avistamientos(fichero, compacto=compacto, **opciones)
+        final = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del avistamientos
+    return final - inicial
+
+def benchmark_memoria_compacta(num_filas:int=1_000_000)->dict[str, float]:
+    '''
+    Compara la memoria que ocupan los avistamientos leídos en modo normal
+    (Avistamiento) y en modo compacto (AvistamientoCompacto).
+
+    :param num_filas: número de avistamientos del fichero sintético
+    :return: diccionario con los bytes por avistamiento de cada modo
+    '''
+    with tempfile.TemporaryDirectory() as directorio:
+        fichero = os.path.join(directorio, "ovnis.csv")
+        genera_fichero_sintetico(fichero, num_filas)
+        res = {"normal": memoria_lectura(fichero, False) / num_filas,
+               "compacto": memoria_lectura(fichero, True) / num_filas}
+    print(f"Memoria de {num_filas} avistamientos:")
+    for modo, bytes_por_fila in res.items():
+        print(f"\t{modo}: {bytes_por_fila:.0f} bytes/avistamiento "
+              f"({bytes_por_fila * 1_000_000 / 2**20:.0f} MB por millón)")
+    print(f"\treducción: {1 - res['compacto'] / res['normal']:.0%}")
+    return res
+
+def benchmark_modo_tolerante(num_filas:int=1_000_000, porc_erroneas:float=0.01)->dict[str, float]:
+    '''
+    Mide el coste del modo tolerante de lee_avistamientos (parámetro rechazos)
+    sobre un fichero sin errores, comparado con el modo normal, y su tiempo
+    sobre un fichero con un porcentaje de filas erróneas.
+
+    :param num_filas: número de avistamientos del fichero sintético
+    :param porc_erroneas: proporción de filas erróneas del segundo fichero
+    :return: diccionario con los segundos empleados en cada caso
+    '''
+    with tempfile.TemporaryDirectory() as directorio:
+        fichero = os.path.join(directorio, "ovnis.csv")
+        genera_fichero_sintetico(fichero, num_filas)
+        # Se estropea la duración de algunas filas del fichero
+        erroneo = os.path.join(directorio, "erroneo.csv")
+        aleatorio = random.Random(0)
+        with open(fichero, encoding="utf-8", newline="") as entrada, \
+             open(erroneo, "w", encoding="utf-8", newline="") as salida:
+            lector = csv.reader(entrada)
+            escritor = csv.writer(salida, lineterminator="\n")
+            escritor.writerow(next(lector))
+            for fila in lector:
+                if aleatorio.random() < porc_erroneas:
+                    fila[4] = ""
+                escritor.writerow(fila)
+        rechazos = []
+        res = {"normal": mide(av.lee_avistamientos, fichero, repeticiones=3),
+               "tolerante": mide(lambda: av.lee_avistamientos(fichero, rechazos=[]), repeticiones=3),
+               "tolerante con errores": mide(lambda: av.lee_avistamientos(erroneo, rechazos=rechazos))}
+    print(f"Carga tolerante de {num_filas} avistamientos:")
+    for modo, segundos in res.items():
+        print(f"\t{modo}: {segundos:.2f} s")
+    print(f"\tcoste del modo tolerante sin errores: {res['tolerante'] / res['normal'] - 1:+.1%}")
+    print(f"\tfilas rechazadas en el fichero con errores: {len(rechazos)}")
+    return res
+
+def benchmark_rejilla(num_filas:int=1_000_000)->dict[str, float]:
+    '''
+    Compara coordenadas_mas_avistamientos con la construcción de una pirámide
+    de rejillas (celdas de 0.01, 0.1 y 1 grados) y la consulta de teselas.
+
+    :param num_filas: número de avistamientos del fichero sintético
+    :return: diccionario con los segundos empleados en cada operación
+    '''
+    with tempfile.TemporaryDirectory() as directorio:
+        fichero = os.path.join(directorio, "ovnis.csv")
+        genera_fichero_sintetico(fichero, num_filas)
+        avistamientos = av.lee_avistamientos(fichero)
+    columnar = AvistamientosColumnar(avistamientos)
+    piramide = PiramideRejillas(columnar)
+    res = {"coordenadas_mas_avistamientos": mide(av.coordenadas_mas_avistamientos, avistamientos),
+           "rejilla de 1 grado": mide(Rejilla.desde_columnar, columnar, 1.0),
+           "pirámide (0.01, 0.1, 1)": mide(PiramideRejillas, columnar),
+           "tesela de 1 grado": mide(piramide.tesela, 1.0),
+           "tesela de 0.01 grados (2x2 grados)": mide(piramide.tesela, 0.01, 33.0, 35.0, -119.0, -117.0)}
+    print(f"Rejillas de {num_filas} avistamientos:")
+    for operacion, segundos in res.items():
+        print(f"\t{operacion}: {segundos:.3f} s")
+    return res
+
+def _media_dias_ordenando(avistamientos:list[Avistamiento], anyo:int|None=None)->float|None:
+    '''
+    Versión anterior de media_dias_entre_avistamientos, que ordena los
+    avistamientos y suma las diferencias entre días consecutivos.
+    '''
+    filtrado = sorted(av for av in avistamientos if anyo == None or av.fechahora.year == anyo)
+    if len(filtrado) <= 1:
+        return None
+    return sum(av2.fechahora.toordinal() - av1.fechahora.toordinal()
+               for av1, av2 in zip(filtrado, filtrado[1:])) / (len(filtrado) - 1)
+
+def benchmark_media_dias(tamaños:Iterable[int]=(10_000, 100_000, 1_000_000))->dict[int, dict[str, float]]:
+    '''
+    Compara media_dias_entre_avistamientos ordenando los avistamientos, con un
+    único recorrido y con el resumen por año de resumen_dias_por_año, para
+    varios tamaños. Se muestran los nanosegundos por avistamiento, que se
+    mantienen constantes si el coste es lineal.
+
+    :param tamaños: números de avistamientos de los datos sintéticos
+    :return: diccionario de tamaño a segundos empleados en cada caso
+    '''
+    res = {}
+    print("Media de días entre avistamientos (todos los años):")
+    for num_filas in tamaños:
+        with tempfile.TemporaryDirectory() as directorio:
+            fichero = os.path.join(directorio, "ovnis.csv")
+            genera_fichero_sintetico(fichero, num_filas)
+            avistamientos = av.lee_avistamientos(fichero)
+        resumen = av.resumen_dias_por_año(avistamientos)
+        res[num_filas] = {"ordenando": mide(_media_dias_ordenando, avistamientos),
+                          "un recorrido": mide(av.media_dias_entre_avistamientos, avistamientos, repeticiones=3),
+                          "resumen por año": mide(av.resumen_dias_por_año, avistamientos, repeticiones=3),
+                          "consulta al resumen": mide(av.media_dias_resumen, resumen, 2005, repeticiones=3)}
+        print(f"\t{num_filas} avistamientos:")
+        for caso, segundos in res[num_filas].items():
+            print(f"\t\t{caso}: {segundos:.4f} s ({1e9 * segundos / num_filas:.1f} ns por avistamiento)")
+    return res
+
+def _conteos_por_mes_diccionario(avistamientos:list[Avistamiento])->dict[date, tuple[int, int]]:
+    '''
+    Número de avistamientos y duración total por mes a partir de
+    avistamientos_por_fecha, como se hacía antes de las series diarias.
+    '''
+    res = {}
+    for fecha, avs in av.avistamientos_por_fecha(avistamientos).items():
+        mes = fecha.replace(day=1)
+        conteo, duracion = res.get(mes, (0, 0))
+        res[mes] = (conteo + len(avs), duracion + sum(a.duracion for a in avs))
+    return res
+
+def benchmark_series_temporales(num_filas:int=1_000_000)->dict[str, float]:
+    '''
+    Compara los conteos y duraciones por mes calculados con avistamientos_por_fecha
+    con la construcción de una serie diaria y las operaciones sobre ella.
+
+    :param num_filas: número de avistamientos del fichero sintético
+    :return: diccionario con los segundos empleados en cada operación
+    '''
+    with tempfile.TemporaryDirectory() as directorio:
+        fichero = os.path.join(directorio, "ovnis.csv")
+        genera_fichero_sintetico(fichero, num_filas)
+        avistamientos = av.lee_avistamientos(fichero)
+    columnar = AvistamientosColumnar(avistamientos)
+    serie = SerieDiaria.desde_columnar(columnar)
+    res = {"por mes con avistamientos_por_fecha": mide(_conteos_por_mes_diccionario, avistamientos),
+           "serie diaria desde avistamientos": mide(SerieDiaria.desde_avistamientos, avistamientos),
+           "serie diaria desde columnas": mide(SerieDiaria.desde_columnar, columnar, repeticiones=3),
+           "remuestreo por mes": mide(serie.remuestrea, "mes", repeticiones=3),
+           "media móvil de 30 días": mide(serie.media_movil, 30, repeticiones=3)}
+    print(f"Series temporales de {num_filas} avistamientos ({len(serie)} días):")
+    for operacion, segundos in res.items():
+        print(f"\t{operacion}: {segundos:.4f} s")
+    return res
+
+def benchmark_particiones(num_filas:int=1_000_000)->dict[str, dict[str, float]]:
+    '''
+    Compara la lectura del fichero completo con la lectura de las particiones
+    por año que necesita una consulta de un año y otra de tres semanas.
+
+    :param num_filas: número de avistamientos del fichero sintético
+    :return: diccionario con los segundos y los bytes leídos en cada caso
+    '''
+    with tempfile.TemporaryDirectory() as directorio:
+        fichero = os.path.join(directorio, "ovnis.csv")
+        genera_fichero_sintetico(fichero, num_filas)
+        carpeta = os.path.join(directorio, "particiones")
+        segundos_particionado = mide(particiones.particiona, fichero, carpeta)
+        manifiesto = particiones.lee_manifiesto(carpeta)
+        consultas = {"fichero completo": (None, None, None),
+                     "año 2005": (None, None, 2005),
+                     "20/12/2004 - 10/1/2005": (date(2004, 12, 20), date(2005, 1, 10), None)}
+        res = {}
+        for consulta, (fecha_inicial, fecha_final, anyo) in consultas.items():
+            if consulta == "fichero completo":
+                segundos = mide(av.lee_avistamientos, fichero)
+                leidos = os.path.getsize(fichero)
+            else:
+                segundos = mide(particiones.lee_avistamientos_particiones, carpeta,
+                                fecha_inicial, fecha_final, anyo)
+                años = [anyo] if anyo != None else particiones.años_necesarios(manifiesto, fecha_inicial,
+                                                                               fecha_final)
+                leidos = sum(manifiesto["particiones"][str(año)]["bytes"] for año in años)
+            res[consulta] = {"segundos": segundos, "bytes": leidos}
+    print(f"Particiones por año de {num_filas} avistamientos (particionado en {segundos_particionado:.2f} s):")
+    total = res["fichero completo"]["bytes"]
+    for consulta, medidas in res.items():
+        print(f"\t{consulta}: {medidas['segundos']:.3f} s, "
+              f"{medidas['bytes'] / 2**20:.1f} MB leídos ({medidas['bytes'] / total:.1%})")
+    return res
+
+def benchmark_columnas(num_filas:int=1_000_000)->dict[str, dict[str, float]]:
+    '''
+    Compara el tiempo de carga y la memoria de los avistamientos leídos con
+    todos los campos y sin materializar los comentarios (o sólo con el estado),
+    el tiempo de una consulta que no usa los comentarios y el de ordenar los
+    avistamientos y construir su índice temporal, que los comparan.
+
+    :param num_filas: número de avistamientos del fichero sintético
+    :return: diccionario con los segundos de carga, los bytes por avistamiento
+         y los segundos de la consulta, la ordenación y el índice de cada modo
+    '''
+    sin_comentarios = set(av.CAMPOS_AVISTAMIENTO) - {"comentarios"}
+    modos = {"normal": {"compacto": False},
+             "compacto": {"compacto": True},
+             "sin comentarios": {"compacto": False, "columnas": sin_comentarios},
+             "sólo estado": {"compacto": False, "columnas": {"fechahora", "duracion", "ubicacion", "estado"}}}
+    res = {}
+    with tempfile.TemporaryDirectory() as directorio:
+        fichero = os.path.join(directorio, "ovnis.csv")
+        genera_fichero_sintetico(fichero, num_filas)
+        for modo, opciones in modos.items():
+            avistamientos = av.lee_avistamientos(fichero, rapido=True, **opciones)
+            res[modo] = {"carga": mide(lambda: av.lee_avistamientos(fichero, rapido=True, **opciones),
+                                       repeticiones=3),
+                         "bytes": memoria_lectura(fichero, rapido=True, **opciones) / num_filas,
+                         "consulta": mide(av.duracion_total, avistamientos, "ca", repeticiones=3),
+                         "ordenación": mide(sorted, avistamientos, repeticiones=3),
+                         "índice": mide(IndiceTemporal, avistamientos, repeticiones=3)}
+            del avistamientos
+    print(f"Selección de columnas con {num_filas} avistamientos (fechas en modo rápido):")
+    for modo, medidas in res.items():
+        print(f"\t{modo}: carga {medidas['carga']:.2f} s, {medidas['bytes']:.0f} bytes/avistamiento, "
+              f"duracion_total {medidas['consulta']:.3f} s, sorted {medidas['ordenación']:.3f} s, "
+              f"IndiceTemporal {medidas['índice']:.3f} s")
+    return res
+
+## Suite de regresión de rendimiento
+def casos_suite(fichero:str, avistamientos:list[Avistamiento])->dict[str, Callable[[], object]]:
+    '''
+    Devuelve los casos de la suite: una función sin parámetros por cada función
+    pública de avistamientos y coordenadas. Las funciones que reciben un solo
+    valor (como parsea_fechahora o distancia) se aplican a todos los
+    avistamientos, para que el tiempo crezca con el tamaño de los datos.
+
+    :param fichero: fichero csv del que se han leído los avistamientos
+    :param avistamientos: lista de avistamientos leída de fichero
+    :return: diccionario de nombre del caso (módulo.función) a caso
+    '''
+    fecha = date(2005, 7, 4)
+    ubicacion = Coordenadas(40.19, -85.39)
+    ubicaciones = [a.ubicacion for a in avistamientos]
+    latitudes = np.array([u.latitud for u in ubicaciones])
+    longitudes = np.array([u.longitud for u in ubicaciones])
+    # La matriz de distancias es cuadrática: se limita a los primeros avistamientos
+    muestra = slice(0, 2000)
+    with open(fichero, encoding="utf-8") as f:
+        lector = csv.reader(f)
+        next(lector)
+        filas = list(lector)
+    cadenas_fechas = [fila[0] for fila in filas]
+    with open(fichero, "rb") as f:
+        next(f)
+        registros = list(f)
+    rechazos = [av.Rechazo(linea, "fila de prueba", fila) for linea, fila in enumerate(filas, 2)]
+    resumen_dias = av.resumen_dias_por_año(avistamientos)
+    resumen_incremental = {}
+    return {
+        # Carga de datos
+        "avistamientos.lee_avistamientos": lambda: av.lee_avistamientos(fichero),
+        "avistamientos.itera_avistamientos": lambda: deque(av.itera_avistamientos(fichero), maxlen=0),
+        "avistamientos.parsea_filas": lambda: deque(av.parsea_filas(filas), maxlen=0),
+        "avistamientos.parsea_fechahora": lambda: [av.parsea_fechahora(c) for c in cadenas_fechas],
+        "avistamientos.separa_campos": lambda: [av.separa_campos(registro) for registro in registros],
+        "avistamientos.campos_tiempo": lambda: [av.campos_tiempo(a.fechahora) for a in avistamientos],
+        "avistamientos.itera_lotes_avistamientos":
+            lambda: deque(av.itera_lotes_avistamientos(fichero), maxlen=0),
+        "avistamientos.ruta_cache": lambda: [av.ruta_cache(fichero) for _ in avistamientos],
+        "avistamientos.huella_fichero": lambda: av.huella_fichero(fichero),
+        "avistamientos.escribe_cache": lambda: av.escribe_cache(fichero, avistamientos),
+        # Se ejecuta después de escribe_cache, así que lee la caché ya creada
+        "avistamientos.lee_avistamientos_cache": lambda: av.lee_avistamientos_cache(fichero),
+        "avistamientos.escribe_rechazos":
+            lambda: av.escribe_rechazos(fichero + ".rechazos", rechazos),
+        # Consultas
+        "avistamientos.numero_avistamientos_fecha": lambda: av.numero_avistamientos_fecha(avistamientos, fecha),
+        "avistamientos.formas_estados": lambda: av.formas_estados(avistamientos, {"in", "nm", "pa", "wa"}),
+        "avistamientos.duracion_total": lambda: av.duracion_total(avistamientos, "ca"),
+        "avistamientos.avistamientos_cercanos_ubicacion":
+            lambda: av.avistamientos_cercanos_ubicacion(avistamientos, ubicacion, 0.5),
+        "avistamientos.avistamiento_mayor_duracion": lambda: av.avistamiento_mayor_duracion(avistamientos, "light"),
+        "avistamientos.avistamiento_mayor_duracion_2":
+            lambda: av.avistamiento_mayor_duracion_2(avistamientos, "light"),
+        "avistamientos.avistamiento_cercano_mayor_duracion":
+            lambda: av.avistamiento_cercano_mayor_duracion(avistamientos, ubicacion, 0.5),
+        "avistamientos.avistamientos_fechas":
+            lambda: av.avistamientos_fechas(avistamientos, date(2005, 1, 1), date(2005, 12, 31)),
+        "avistamientos.comentario_mas_largo": lambda: av.comentario_mas_largo(avistamientos, 2005, "light"),
+        "avistamientos.media_dias_entre_avistamientos":
+            lambda: av.media_dias_entre_avistamientos(avistamientos, 2005),
+        "avistamientos.resumen_dias_por_año": lambda: av.resumen_dias_por_año(avistamientos),
+        "avistamientos.añade_dia_resumen":
+            lambda: [av.añade_dia_resumen(resumen_incremental, a.año, a.dia) for a in avistamientos],
+        "avistamientos.media_dias_resumen": lambda: av.media_dias_resumen(resumen_dias),
+        "avistamientos.avistamientos_por_fecha": lambda: av.avistamientos_por_fecha(avistamientos),
+        "avistamientos.formas_distintas_por_año": lambda: av.formas_distintas_por_año(avistamientos),
+        "avistamientos.formas_por_mes": lambda: av.formas_por_mes(avistamientos),
+        "avistamientos.numero_avistamientos_por_año": lambda: av.numero_avistamientos_por_año(avistamientos),
+        "avistamientos.num_avistamientos_por_mes": lambda: av.num_avistamientos_por_mes(avistamientos),
+        "avistamientos.coordenadas_mas_avistamientos": lambda: av.coordenadas_mas_avistamientos(avistamientos),
+        "avistamientos.hora_mas_avistamientos": lambda: av.hora_mas_avistamientos(avistamientos),
+        "avistamientos.longitud_media_comentarios_por_estado":
+            lambda: av.longitud_media_comentarios_por_estado(avistamientos),
+        "avistamientos.porc_avistamientos_por_forma": lambda: av.porc_avistamientos_por_forma(avistamientos),
+        "avistamientos.avistamientos_mayor_duracion_por_estado":
+            lambda: av.avistamientos_mayor_duracion_por_estado(avistamientos),
+        "avistamientos.año_mas_avistamientos_forma": lambda: av.año_mas_avistamientos_forma(avistamientos, "light"),
+        "avistamientos.estados_mas_avistamientos": lambda: av.estados_mas_avistamientos(avistamientos),
+        "avistamientos.duracion_total_avistamientos_año":
+            lambda: av.duracion_total_avistamientos_año(avistamientos, "ca"),
+        "avistamientos.avistamiento_mas_reciente_por_estado":
+            lambda: av.avistamiento_mas_reciente_por_estado(avistamientos),
+        "avistamientos.ciudad_mayor_duracion_media": lambda: av.ciudad_mayor_duracion_media(avistamientos),
+        # Coordenadas
+        "coordenadas.distancia": lambda: [coordenadas.distancia(ubicacion, u) for u in ubicaciones],
+        "coordenadas.redondear": lambda: [coordenadas.redondear(u) for u in ubicaciones],
+        "coordenadas.distancia_haversine":
+            lambda: [coordenadas.distancia_haversine(ubicacion, u) for u in ubicaciones],
+        "coordenadas.distancias": lambda: coordenadas.distancias(ubicacion, latitudes, longitudes),
+        "coordenadas.matriz_distancias":
+            lambda: coordenadas.matriz_distancias(latitudes[muestra], longitudes[muestra],
+                                                  latitudes[muestra], longitudes[muestra]),
+    }
+
+def funciones_sin_medir(casos:Iterable[str])->list[str]:
+    '''
+    Devuelve las funciones públicas de avistamientos y coordenadas que no
+    tienen ningún caso en la suite, para no olvidar añadir las funciones nuevas.
+    '''
+    casos = set(casos)
+    res = []
+    for modulo in (av, coordenadas):
+        for nombre, funcion in inspect.getmembers(modulo, inspect.isfunction):
+            nombre_completo = f"{modulo.__name__}.{nombre}"
+            if (funcion.__module__ == modulo.__name__ and not nombre.startswith("_")
+                    and nombre_completo not in casos):
+                res.append(nombre_completo)
+    return res
+
+def fichero_suite(directorio:str, num_filas:int, semilla:int=0)->str:
+    '''
+    Devuelve la ruta del fichero sintético de num_filas avistamientos dentro de
+    directorio, generándolo si todavía no existe. Así los ficheros grandes se
+    pueden reutilizar entre ejecuciones de la suite.
+    '''
+    fichero = os.path.join(directorio, f"ovnis_{num_filas}_{semilla}.csv")
+    if not os.path.exists(fichero):
+        genera_fichero_sintetico(fichero + ".tmp", num_filas, semilla)
+        os.replace(fichero + ".tmp", fichero)
+    return fichero
+
+def ejecuta_suite(tamaños:Iterable[int]=TAMAÑOS_SUITE, repeticiones:int=3, semilla:int=0,
+                  directorio:str|None=None)->dict:
+    '''
+    Mide todos los casos de la suite sobre ficheros sintéticos de cada tamaño.
+    El conjunto de 10 millones de avistamientos necesita varios GB de memoria.
+
+    :param tamaños: números de avistamientos de los ficheros sintéticos
+    :param repeticiones: número de ejecuciones de cada caso (se guarda la más rápida)
+    :param semilla: semilla de los datos sintéticos
+    :param directorio: carpeta en la que se guardan los ficheros sintéticos para
+         reutilizarlos. Si es None, se usa una carpeta temporal.
+    :return: diccionario con los metadatos de la ejecución y, para cada tamaño,
+         los segundos empleados por cada caso
+    '''
+    res = {"metadatos": {"fecha": datetime.now().isoformat(timespec="seconds"),
+                         "python": platform.python_version(),
+                         "plataforma": platform.platform(),
+                         "cpus": os.cpu_count(),
+                         "semilla": semilla,
+                         "repeticiones": repeticiones},
+           "resultados": {}}
+    # Casos medidos con algún tamaño
+    medidos = set()
+    with tempfile.TemporaryDirectory() as temporal:
+        for num_filas in tamaños:
+            fichero = fichero_suite(directorio or temporal, num_filas, semilla)
+            avistamientos = av.lee_avistamientos(fichero)
+            casos = casos_suite(fichero, avistamientos)
+            tiempos = {}
+            for nombre, caso in casos.items():
+                tiempos[nombre] = mide(caso, repeticiones=repeticiones)
+                print(f"{num_filas:>10} {nombre:<55} {tiempos[nombre]:10.4f} s")
+            res["resultados"][str(num_filas)] = tiempos
+            medidos.update(tiempos)
+            # La caché y los rechazos se escriben junto al fichero sintético: no se reutilizan
+            for ruta in (av.ruta_cache(fichero), fichero + ".rechazos"):
+                if os.path.exists(ruta):
+                    os.remove(ruta)
+            del avistamientos, casos
+    if medidos:
+        for nombre in funciones_sin_medir(medidos):
+            print(f"Aviso: la función {nombre} no tiene ningún caso en la suite")
+    return res
+
+def compara_resultados(actuales:dict, base:dict, umbral:float=1.25,
+                       tiempo_minimo:float=0.01)->list[tuple[str, str, float, float]]:
+    '''
+    Compara dos ejecuciones de la suite y devuelve los casos que se han
+    vuelto más lentos. Sólo se comparan los tamaños y casos que aparecen en
+    las dos ejecuciones.
+
+    :param actuales: resultado de ejecuta_suite que se quiere comprobar
+    :param base: resultado de ejecuta_suite de referencia
+    :param umbral: un caso es una regresión si tarda más de umbral veces lo que
+         tardaba en la ejecución de referencia
+    :param tiempo_minimo: los tiempos de referencia menores que este valor (en
+         segundos) se cuentan como tiempo_minimo, para que el ruido de medida
+         de los casos muy rápidos no se tome como una regresión. Debe ser
+         positivo.
+    :return: lista de tuplas (tamaño, caso, segundos de referencia, segundos
+         actuales) con las regresiones, de mayor a menor empeoramiento
+    '''
+    # Los tiempos de referencia se dividen por, como mínimo, tiempo_minimo
+    if tiempo_minimo <= 0:
+        raise ValueError(f"El tiempo mínimo debe ser positivo: {tiempo_minimo}")
+    res = []
+    for tamaño, tiempos in actuales["resultados"].items():
+        tiempos_base = base["resultados"].get(tamaño, {})
+        for nombre, segundos in tiempos.items():
+            segundos_base = tiempos_base.get(nombre)
+            if segundos_base != None and segundos > max(segundos_base, tiempo_minimo) * umbral:
+                res.append((tamaño, nombre, segundos_base, segundos))
+    res.sort(key=lambda regresion: regresion[3] / max(regresion[2], tiempo_minimo), reverse=True)
+    return res
+
+def main(argumentos:list[str]|None=None)->int:
+    '''
+    Punto de entrada de la línea de órdenes. Sin subórdenes, ejecuta los
+    benchmarks de carga. Con "suite", ejecuta la suite de regresión:
+
+        python benchmarks.py suite --tamaños 10000 100000 --salida actual.json \\
+            --base referencia.json --umbral 1.25
+
+    :return: código de salida (1 si la suite encuentra regresiones)
+    '''
+    analizador = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subordenes = analizador.add_subparsers(dest="orden")
+    suite = subordenes.add_parser("suite", help="mide todas las funciones públicas")
+    suite.add_argument("--tamaños", type=int, nargs="+", default=list(TAMAÑOS_SUITE),
+                       help="números de avistamientos de los datos sintéticos")
+    suite.add_argument("--repeticiones", type=int, default=3,
+                       help="ejecuciones de cada caso (se guarda la más rápida)")
+    suite.add_argument("--semilla", type=int, default=0, help="semilla de los datos sintéticos")
+    suite.add_argument("--directorio", help="carpeta en la que se guardan los datos sintéticos")
+    suite.add_argument("--salida", help="fichero JSON en el que se guardan los resultados")
+    suite.add_argument("--base", help="fichero JSON con los resultados de referencia")
+    suite.add_argument("--umbral", type=float, default=1.25,
+                       help="empeoramiento máximo permitido respecto a la referencia")
+    suite.add_argument("--tiempo-minimo", type=float, default=0.01,
+                       help="segundos por debajo de los cuales no se comparan los tiempos")
+    args = analizador.parse_args(argumentos)
+
+    if args.orden != "suite":
+        benchmark_parseo_fechas()
+        benchmark_lectura_paralela()
+        benchmark_memoria_compacta()
+        benchmark_modo_tolerante()
+        benchmark_rejilla()
+        benchmark_media_dias()
+        benchmark_series_temporales()
+        benchmark_particiones()
+        benchmark_columnas()
+        return 0
+
+    resultados = ejecuta_suite(args.tamaños, args.repeticiones, args.semilla, args.directorio)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+    if args.base:
+        with open(args.base, encoding="utf-8") as f:
+            base = json.load(f)
+        regresiones = compara_resultados(resultados, base, args.umbral, args.tiempo_minimo)
+        for tamaño, nombre, segundos_base, segundos in regresiones:
+            print(f"Regresión: {nombre} con {tamaño} avistamientos: "
+                  f"{segundos_base:.4f} s -> {segundos:.4f} s "
+                  f"({segundos / max(segundos_base, args.tiempo_minimo):.2f}x)")
+        if regresiones:
+            return 1
+        print(f"Sin regresiones respecto a {args.base} (umbral {args.umbral}x)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
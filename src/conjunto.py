@@ -0,0 +1,254 @@
+'''
+Conjunto de avistamientos que construye sus índices la primera vez que se
+necesitan y los reutiliza en las consultas siguientes.
+'''
+import copy
+from collections import defaultdict
+from itertools import count
+from typing import Any, Callable, Iterable, Iterator
+
+import avistamientos as av_funciones
+from avistamientos import Avistamiento, lee_avistamientos
+from consultas import Consulta
+from coordenadas import Coordenadas
+from indices import IndiceEspacial, IndiceHash, IndiceTemporal, IndiceTextual
+from memoizacion import CacheLRU
+
+def _clave_hashable(valor:Any)->Any:
+    '''
+    Convierte los conjuntos y listas de los parámetros en frozenset y tuple
+    para poder usarlos como parte de la clave de la caché.
+    '''
+    if isinstance(valor, (set, frozenset)):
+        return frozenset(valor)
+    if isinstance(valor, (list, tuple)):
+        return tuple(_clave_hashable(elemento) for elemento in valor)
+    return valor
+
+def _copia_resultado(valor:Any)->Any:
+    '''
+    Copia los diccionarios, listas y conjuntos de un resultado (también los
+    que contienen), para que modificar el resultado devuelto no cambie el
+    guardado en la caché. Los demás valores, como los avistamientos, no se
+    pueden modificar y se comparten.
+    '''
+    if isinstance(valor, dict):
+        # copy.copy conserva el tipo (defaultdict, Counter...)
+        copia = copy.copy(valor)
+        for clave, elemento in copia.items():
+            copia[clave] = _copia_resultado(elemento)
+        return copia
+    if isinstance(valor, list):
+        return [_copia_resultado(elemento) for elemento in valor]
+    if isinstance(valor, set):
+        return set(valor)
+    return valor
+
+# Número de cada conjunto, para distinguir sus resultados en una caché compartida
+_numeros_conjunto = count()
+
+class ConjuntoAvistamientos:
+    '''
+    Lista de avistamientos junto con sus índices, que se construyen de forma
+    perezosa: ninguno se calcula hasta que alguna consulta lo necesita.
+
+    Las consultas por igualdad (estado, forma, ciudad) usan los índices hash,
+    así que, una vez construido el índice, cuestan O(número de coincidencias).
+
+    Opcionalmente, los resultados de las funciones de análisis se pueden
+    guardar en una caché LRU. La clave de cada resultado incluye el número
+    del conjunto, así que varios conjuntos pueden compartir la misma caché,
+    y la versión de los datos, que cambia cada vez que se cargan o se añaden
+    avistamientos; en ese momento también se vacía la caché y se descartan
+    los índices.
+    '''
+
+    def __init__(self, avistamientos:Iterable[Avistamiento], cache:CacheLRU|None=None):
+        '''
+        :param avistamientos: iterable de tuplas con la información de los avistamientos
+        :param cache: caché para los resultados de calcula. Si es None, no se guardan.
+        '''
+        self.avistamientos = list(avistamientos)
+        self._indices: dict[str, Any] = {}
+        self.cache = cache
+        self.version = 0
+        self._numero = next(_numeros_conjunto)
+
+    @classmethod
+    def desde_fichero(cls, fichero:str, cache:CacheLRU|None=None, **opciones)->"ConjuntoAvistamientos":
+        '''
+        Construye el conjunto leyendo un fichero csv.
+
+        :param fichero: ruta del fichero csv que contiene los datos en codificación utf-8
+        :param cache: caché para los resultados de calcula
+        :param opciones: opciones de lectura (ver avistamientos.lee_avistamientos)
+        :return: conjunto de avistamientos
+        '''
+        return cls(lee_avistamientos(fichero, **opciones), cache)
+
+    def __len__(self)->int:
+        return len(self.avistamientos)
+
+    def _datos_modificados(self)->None:
+        '''
+        Cambia la versión de los datos, descarta los índices y vacía la caché.
+        '''
+        self.version += 1
+        self._indices.clear()
+        if self.cache != None:
+            self.cache.invalida()
+
+    def carga(self, fichero:str, **opciones)->None:
+        '''
+        Sustituye los avistamientos del conjunto por los de un fichero csv.
+
+        :param fichero: ruta del fichero csv que contiene los datos en codificación utf-8
+        :param opciones: opciones de lectura (ver avistamientos.lee_avistamientos)
+        '''
+        self.avistamientos = lee_avistamientos(fichero, **opciones)
+        self._datos_modificados()
+
+    def añade(self, av:Avistamiento)->None:
+        '''
+        Añade un avistamiento al final del conjunto.
+        '''
+        self.añade_todos([av])
+
+    def añade_todos(self, avistamientos:Iterable[Avistamiento])->None:
+        '''
+        Añade varios avistamientos al final del conjunto.
+        '''
+        self.avistamientos.extend(avistamientos)
+        self._datos_modificados()
+
+    def __iter__(self)->Iterator[Avistamiento]:
+        return iter(self.avistamientos)
+
+    def _indice(self, nombre:str, constructor:Callable[[list[Avistamiento]], Any])->Any:
+        '''
+        Devuelve el índice con el nombre dado, construyéndolo si todavía no existe.
+        '''
+        indice = self._indices.get(nombre)
+        if indice == None:
+            indice = constructor(self.avistamientos)
+            self._indices[nombre] = indice
+        return indice
+
+    ### Índices
+    @property
+    def indice_estado(self)->IndiceHash:
+        return self._indice("estado", lambda avs: IndiceHash(avs, lambda av: av.estado))
+
+    @property
+    def indice_forma(self)->IndiceHash:
+        return self._indice("forma", lambda avs: IndiceHash(avs, lambda av: av.forma))
+
+    @property
+    def indice_ciudad(self)->IndiceHash:
+        return self._indice("ciudad", lambda avs: IndiceHash(avs, lambda av: av.ciudad))
+
+    @property
+    def indice_temporal(self)->IndiceTemporal:
+        return self._indice("temporal", IndiceTemporal)
+
+    @property
+    def indice_espacial(self)->IndiceEspacial:
+        return self._indice("espacial", IndiceEspacial)
+
+    @property
+    def indice_textual(self)->IndiceTextual:
+        return self._indice("textual", IndiceTextual)
+
+    def consulta(self)->Consulta:
+        '''
+        Devuelve una consulta sobre todos los avistamientos del conjunto. La
+        consulta usa los índices hash por estado y forma y los índices temporal
+        y espacial si ya se han construido, pero no construye ninguno.
+        '''
+        return Consulta(self.avistamientos,
+                        indice_temporal=self._indices.get("temporal"),
+                        indice_espacial=self._indices.get("espacial"),
+                        indice_estado=self._indices.get("estado"),
+                        indice_forma=self._indices.get("forma"))
+
+    ### Funciones de análisis con caché
+    def calcula(self, funcion:Callable[..., Any], *args)->Any:
+        '''
+        Devuelve funcion(avistamientos, *args), donde funcion es una función
+        de análisis como avistamientos.estados_mas_avistamientos. Si el conjunto
+        tiene caché, el resultado se guarda con el número del conjunto, la
+        versión de los datos, el nombre de la función y los parámetros como
+        clave. Se devuelve una copia de los diccionarios, listas y conjuntos
+        del resultado guardado, que se puede modificar sin afectar a la caché.
+
+        :param funcion: función que recibe la lista de avistamientos como primer parámetro
+        :param args: resto de parámetros de la función
+        :return: resultado de la función
+        '''
+        if self.cache == None:
+            return funcion(self.avistamientos, *args)
+        clave = (self._numero, self.version, funcion.__module__, funcion.__qualname__,
+                 _clave_hashable(args))
+        try:
+            hash(clave)
+        except TypeError:
+            # Parámetros que no se pueden usar como clave: no se guarda el resultado
+            return funcion(self.avistamientos, *args)
+        return _copia_resultado(self.cache.obtiene(clave, lambda: funcion(self.avistamientos, *args)))
+
+    def estados_mas_avistamientos(self, n:int=5)->list[tuple[str, int]]:
+        '''Equivale a avistamientos.estados_mas_avistamientos'''
+        return self.calcula(av_funciones.estados_mas_avistamientos, n)
+
+    def hora_mas_avistamientos(self)->int:
+        '''Equivale a avistamientos.hora_mas_avistamientos'''
+        return self.calcula(av_funciones.hora_mas_avistamientos)
+
+    def coordenadas_mas_avistamientos(self)->Coordenadas:
+        '''Equivale a avistamientos.coordenadas_mas_avistamientos'''
+        return self.calcula(av_funciones.coordenadas_mas_avistamientos)
+
+    ### Consultas por igualdad
+    def avistamientos_estado(self, estado:str)->list[Avistamiento]:
+        '''
+        Devuelve los avistamientos de un estado, en el orden original.
+        '''
+        return self.indice_estado.avistamientos_valor(estado)
+
+    def avistamientos_forma(self, forma:str)->list[Avistamiento]:
+        '''
+        Devuelve los avistamientos de una forma, en el orden original.
+        '''
+        return self.indice_forma.avistamientos_valor(forma)
+
+    def avistamientos_ciudad(self, ciudad:str)->list[Avistamiento]:
+        '''
+        Devuelve los avistamientos de una ciudad, en el orden original.
+        '''
+        return self.indice_ciudad.avistamientos_valor(ciudad)
+
+    def duracion_total(self, estado:str)->int:
+        '''Equivale a avistamientos.duracion_total'''
+        return sum(av.duracion for av in self.avistamientos_estado(estado))
+
+    def duracion_total_avistamientos_año(self, estado:str)->dict[int, int]:
+        '''Equivale a avistamientos.duracion_total_avistamientos_año'''
+        res = defaultdict(int)
+        for av in self.avistamientos_estado(estado):
+            res[av.fechahora.year] += av.duracion
+        return res
+
+    def formas_estados(self, estados:set[str])->int:
+        '''Equivale a avistamientos.formas_estados'''
+        formas = set()
+        for estado in estados:
+            formas.update(av.forma for av in self.avistamientos_estado(estado))
+        return len(formas)
+
+    def avistamiento_mayor_duracion(self, forma:str)->Avistamiento|None:
+        '''Equivale a avistamientos.avistamiento_mayor_duracion'''
+        mas_largo = None
+        for av in self.avistamientos_forma(forma):
+            if mas_largo == None or av.duracion > mas_largo.duracion:
+                mas_largo = av
+        return mas_largo
@@ -0,0 +1,163 @@
+'''
+Consultas componibles sobre una lista de avistamientos.
+
+Ejemplo de uso:
+    consulta = Consulta(avistamientos, indice_estado=IndiceHash(avistamientos, lambda av: av.estado))
+    consulta.donde(estado="ca", desde=date(2005, 1, 1)).agrega(numero_avistamientos_por_año)
+
+Antes de filtrar, la consulta elige el índice disponible que deja menos
+avistamientos candidatos (hash por estado o forma, índice temporal o índice
+espacial) y sólo revisa esos candidatos. Si no hay ningún índice útil, se
+recorren todos los avistamientos.
+'''
+from datetime import date
+from typing import Any, Callable, Iterable, Iterator
+
+from avistamientos import Avistamiento
+from coordenadas import Coordenadas, distancia
+from indices import IndiceEspacial, IndiceHash, IndiceTemporal
+
+def _como_conjunto(valor:str|Iterable[str])->set[str]:
+    if isinstance(valor, str):
+        return {valor}
+    return set(valor)
+
+class Consulta:
+    '''
+    Filtros sobre una lista de avistamientos, junto con los índices que se
+    pueden usar para resolverlos. Los índices deben estar construidos sobre
+    la misma lista de avistamientos.
+    '''
+
+    def __init__(self, avistamientos:list[Avistamiento],
+                 indice_temporal:IndiceTemporal|None=None,
+                 indice_espacial:IndiceEspacial|None=None,
+                 indice_estado:IndiceHash|None=None,
+                 indice_forma:IndiceHash|None=None):
+        '''
+        :param avistamientos: lista de tuplas con la información de los avistamientos
+        :param indice_temporal: índice por fechahora
+        :param indice_espacial: índice por ubicacion
+        :param indice_estado: índice hash por estado
+        :param indice_forma: índice hash por forma
+        '''
+        self.avistamientos = avistamientos
+        self.indice_temporal = indice_temporal
+        self.indice_espacial = indice_espacial
+        self.indice_estado = indice_estado
+        self.indice_forma = indice_forma
+        self.estados: set[str]|None = None
+        self.formas: set[str]|None = None
+        self.desde: date|None = None
+        self.hasta: date|None = None
+        self.cerca: list[tuple[Coordenadas, float]] = []
+
+    def _copia(self)->"Consulta":
+        res = Consulta(self.avistamientos, self.indice_temporal, self.indice_espacial,
+                       self.indice_estado, self.indice_forma)
+        res.estados, res.formas = self.estados, self.formas
+        res.desde, res.hasta = self.desde, self.hasta
+        res.cerca = list(self.cerca)
+        return res
+
+    def donde(self, estado:str|Iterable[str]|None=None, forma:str|Iterable[str]|None=None,
+              desde:date|None=None, hasta:date|None=None,
+              cerca:tuple[Coordenadas, float]|None=None)->"Consulta":
+        '''
+        Devuelve una nueva consulta con los filtros añadidos. Los filtros se
+        combinan con "y", también con los de llamadas anteriores a donde.
+
+        :param estado: estado, o conjunto de estados, de los avistamientos
+        :param forma: forma, o conjunto de formas, de los avistamientos
+        :param desde: fecha mínima de los avistamientos (inclusive)
+        :param hasta: fecha máxima de los avistamientos (inclusive)
+        :param cerca: tupla (ubicacion, radio); los avistamientos deben estar
+             a una distancia menor o igual que radio de la ubicación
+        :return: nueva consulta con los filtros
+        '''
+        res = self._copia()
+        if estado != None:
+            estados = _como_conjunto(estado)
+            res.estados = estados if res.estados == None else res.estados & estados
+        if forma != None:
+            formas = _como_conjunto(forma)
+            res.formas = formas if res.formas == None else res.formas & formas
+        if desde != None and (res.desde == None or desde > res.desde):
+            res.desde = desde
+        if hasta != None and (res.hasta == None or hasta < res.hasta):
+            res.hasta = hasta
+        if cerca != None:
+            res.cerca.append(cerca)
+        return res
+
+    def _planes(self)->list[tuple[int, str, Callable[[], Iterable[int]]]]:
+        '''
+        Devuelve las formas posibles de obtener los candidatos, como tuplas
+        (número estimado de candidatos, nombre, función que devuelve los ids).
+        '''
+        res = [(len(self.avistamientos), "recorrido completo",
+                lambda: range(len(self.avistamientos)))]
+        if self.estados != None and self.indice_estado != None:
+            res.append((self.indice_estado.num(self.estados), "índice por estado",
+                        lambda: self.indice_estado.ids(self.estados)))
+        if self.formas != None and self.indice_forma != None:
+            res.append((self.indice_forma.num(self.formas), "índice por forma",
+                        lambda: self.indice_forma.ids(self.formas)))
+        if (self.desde != None or self.hasta != None) and self.indice_temporal != None:
+            res.append((self.indice_temporal.num_rango(self.desde, self.hasta), "índice temporal",
+                        lambda: sorted(self.indice_temporal.ids_rango(self.desde, self.hasta))))
+        if self.indice_espacial != None:
+            for ubicacion, radio in self.cerca:
+                res.append((self.indice_espacial.num_candidatos(ubicacion, radio), "índice espacial",
+                            lambda ubicacion=ubicacion, radio=radio:
+                                self.indice_espacial.ids_cercanos(ubicacion, radio)))
+        return res
+
+    def explica(self)->str:
+        '''
+        Devuelve el nombre de la forma de obtener los candidatos que se va a usar.
+        '''
+        return min(self._planes(), key=lambda plan: plan[0])[1]
+
+    def _cumple(self, av:Avistamiento)->bool:
+        if self.estados != None and av.estado not in self.estados:
+            return False
+        if self.formas != None and av.forma not in self.formas:
+            return False
+        if self.desde != None or self.hasta != None:
+            fecha = av.fechahora.date()
+            if (self.desde != None and fecha < self.desde) or (self.hasta != None and fecha > self.hasta):
+                return False
+        for ubicacion, radio in self.cerca:
+            if distancia(ubicacion, av.ubicacion) > radio:
+                return False
+        return True
+
+    def ids(self)->list[int]:
+        '''
+        Devuelve los ids de los avistamientos que cumplen todos los filtros,
+        en orden creciente.
+        '''
+        _, _, candidatos = min(self._planes(), key=lambda plan: plan[0])
+        return [id for id in candidatos() if self._cumple(self.avistamientos[id])]
+
+    def lista(self)->list[Avistamiento]:
+        '''
+        Devuelve los avistamientos que cumplen todos los filtros, en el orden
+        de la lista original.
+        '''
+        return [self.avistamientos[id] for id in self.ids()]
+
+    def __iter__(self)->Iterator[Avistamiento]:
+        return iter(self.lista())
+
+    def agrega(self, funcion:Callable[..., Any], *args, **kwargs)->Any:
+        '''
+        Aplica una función de avistamientos a los avistamientos que cumplen
+        todos los filtros, por ejemplo numero_avistamientos_por_año.
+
+        :param funcion: función que recibe la lista de avistamientos como primer parámetro
+        :param args: resto de parámetros de la función
+        :return: resultado de la función
+        '''
+        return funcion(self.lista(), *args, **kwargs)
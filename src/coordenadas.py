@@ -3,10 +3,16 @@
 import math
 from typing import NamedTuple
 
+import numpy as np
+
 Coordenadas = NamedTuple('Coordenadas', [
     ('latitud', float), ('longitud', float)
 ])
 
+## Definición de constantes
+# Radio medio de la Tierra en kilómetros
+RADIO_TIERRA_KM = 6371.0088
+
 def distancia(coordenadas1:Coordenadas, coordenadas2:Coordenadas)->float:
     '''Devuelve la distancia euclidea entre dos coordenadas
 
@@ -25,4 +31,70 @@ def redondear(coordenadas:Coordenadas)->Coordenadas:
     :param coordenadas: Coordenadas que se quieren redondear
     :return: Las coordenadas redondeadas
     '''
-    return Coordenadas(round(coordenadas.latitud, 0), round(coordenadas.longitud, 0))
\ No newline at end of file
+    return Coordenadas(round(coordenadas.latitud, 0), round(coordenadas.longitud, 0))
+
+
+def distancia_haversine(coordenadas1:Coordenadas, coordenadas2:Coordenadas)->float:
+    '''Devuelve la distancia en kilómetros entre dos coordenadas, medida
+    sobre la superficie de la Tierra (fórmula del semiverseno o haversine)
+
+    :param coordenadas1: Coordenadas del primer punto
+    :param coordenadas2: Coordenadas del segundo punto
+    :return: La distancia en kilómetros entre las dos coordenadas dadas como parámetro
+    '''
+    lat1, lat2 = math.radians(coordenadas1.latitud), math.radians(coordenadas2.latitud)
+    dlat = lat2 - lat1
+    dlon = math.radians(coordenadas2.longitud - coordenadas1.longitud)
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * math.asin(math.sqrt(a))
+
+
+def _distancias(latitudes1:np.ndarray, longitudes1:np.ndarray,
+                latitudes2:np.ndarray, longitudes2:np.ndarray, haversine:bool)->np.ndarray:
+    '''Calcula las distancias entre arrays de latitudes y longitudes,
+    aplicando las reglas de broadcasting de NumPy
+    '''
+    if not haversine:
+        return np.sqrt((latitudes1 - latitudes2) ** 2 + (longitudes1 - longitudes2) ** 2)
+    lat1, lat2 = np.radians(latitudes1), np.radians(latitudes2)
+    dlat = lat2 - lat1
+    dlon = np.radians(longitudes2 - longitudes1)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def distancias(origen:Coordenadas, latitudes:np.ndarray, longitudes:np.ndarray,
+               haversine:bool=False)->np.ndarray:
+    '''Devuelve las distancias entre unas coordenadas y muchos puntos a la vez
+
+    :param origen: Coordenadas del punto de origen
+    :param latitudes: array con las latitudes de los puntos
+    :param longitudes: array con las longitudes de los puntos
+    :param haversine: si es True, devuelve kilómetros (ver distancia_haversine);
+         si es False, devuelve la distancia euclídea en grados (ver distancia)
+    :return: array con la distancia desde el origen a cada punto
+    '''
+    return _distancias(origen.latitud, origen.longitud,
+                       np.asarray(latitudes, dtype=np.float64),
+                       np.asarray(longitudes, dtype=np.float64), haversine)
+
+
+def matriz_distancias(latitudes1:np.ndarray, longitudes1:np.ndarray,
+                      latitudes2:np.ndarray, longitudes2:np.ndarray,
+                      haversine:bool=False)->np.ndarray:
+    '''Devuelve las distancias entre todos los pares de puntos de dos conjuntos
+
+    :param latitudes1: array con las latitudes del primer conjunto de puntos (n)
+    :param longitudes1: array con las longitudes del primer conjunto de puntos (n)
+    :param latitudes2: array con las latitudes del segundo conjunto de puntos (m)
+    :param longitudes2: array con las longitudes del segundo conjunto de puntos (m)
+    :param haversine: si es True, devuelve kilómetros (ver distancia_haversine);
+         si es False, devuelve la distancia euclídea en grados (ver distancia)
+    :return: matriz n x m en la que la posición [i, j] es la distancia entre
+         el punto i del primer conjunto y el punto j del segundo
+    '''
+    latitudes1 = np.asarray(latitudes1, dtype=np.float64)[:, np.newaxis]
+    longitudes1 = np.asarray(longitudes1, dtype=np.float64)[:, np.newaxis]
+    latitudes2 = np.asarray(latitudes2, dtype=np.float64)[np.newaxis, :]
+    longitudes2 = np.asarray(longitudes2, dtype=np.float64)[np.newaxis, :]
+    return _distancias(latitudes1, longitudes1, latitudes2, longitudes2, haversine)
@@ -3,7 +3,7 @@ Ejemplos para explicar qué son y para qué sirve los generadores
 '''
 from avistamientos import lee_avistamientos
 
-avistamientos = lee_avistamientos("data/ovnis.csv")
+avistamientos = lee_avistamientos("data/ovnis.csv", usar_cache=True)
 
 # ¿Cuál es la suma de las duraciones de los avistamientos en la ciudad "muncie"
 
@@ -25,3 +25,12 @@ filtrado = [av for av in avistamientos if av.ciudad=="muncie"]
 
 # ¿Y si quiero construir un conjunto con las formas distintas de la ciudad "muncie"?
 formas = {av.forma for av in avistamientos if av.ciudad == "muncie"}
+
+# Si se van a hacer muchas consultas por ciudad, es mejor indexar los avistamientos
+# una sola vez. ConjuntoAvistamientos construye el índice por ciudad la primera vez
+# que se usa, y a partir de ahí sólo se recorren los avistamientos de esa ciudad.
+from conjunto import ConjuntoAvistamientos
+
+conjunto = ConjuntoAvistamientos(avistamientos)
+suma_duraciones = sum(av.duracion for av in conjunto.avistamientos_ciudad("muncie"))
+formas = {av.forma for av in conjunto.avistamientos_ciudad("muncie")}
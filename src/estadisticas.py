@@ -0,0 +1,118 @@
+'''
+Estadísticas de avistamientos que se actualizan cada vez que llega un
+avistamiento nuevo, sin tener que volver a recorrer el histórico completo.
+'''
+from collections import Counter
+from datetime import datetime
+from typing import Iterable
+
+from avistamientos import MESES, Avistamiento, añade_dia_resumen, media_dias_resumen
+from coordenadas import Coordenadas, redondear
+
+class EstadisticasIncrementales:
+    '''
+    Contadores por año, mes, estado, forma y coordenadas redondeadas, sumas
+    de duraciones por estado, fecha del último avistamiento de cada estado y
+    primer y último día de cada año.
+
+    El método añade actualiza todos los contadores en tiempo O(1), y las
+    consultas se responden a partir de los contadores, con los mismos
+    resultados que las funciones equivalentes de avistamientos.
+    '''
+
+    def __init__(self, avistamientos:Iterable[Avistamiento]=()):
+        '''
+        :param avistamientos: avistamientos con los que se inicializan las estadísticas
+        '''
+        self.num_avistamientos = 0
+        self.conteos_año: dict[int, int] = {}
+        # Para cada año, [día mínimo, día máximo, número de avistamientos]
+        self.dias_año: dict[int, list[int]] = {}
+        self.conteos_mes: dict[str, int] = {}
+        self.conteos_estado: dict[str, int] = {}
+        self.duraciones_estado: dict[str, int] = {}
+        self.mas_reciente_estado: dict[str, datetime] = {}
+        self.conteos_forma = Counter()
+        # Para cada celda, [número de avistamientos, orden de aparición de la celda]
+        self.conteos_celda: dict[Coordenadas, list[int]] = {}
+        self.celda_mas_avistamientos: Coordenadas|None = None
+        self.añade_todos(avistamientos)
+
+    def añade(self, av:Avistamiento)->None:
+        '''
+        Actualiza las estadísticas con un nuevo avistamiento.
+
+        :param av: avistamiento que se añade
+        '''
+        self.num_avistamientos += 1
+        fechahora = av.fechahora
+        año = fechahora.year
+        self.conteos_año[año] = self.conteos_año.get(año, 0) + 1
+        añade_dia_resumen(self.dias_año, año, fechahora.toordinal())
+        mes = MESES[fechahora.month - 1]
+        self.conteos_mes[mes] = self.conteos_mes.get(mes, 0) + 1
+
+        estado = av.estado
+        self.conteos_estado[estado] = self.conteos_estado.get(estado, 0) + 1
+        self.duraciones_estado[estado] = self.duraciones_estado.get(estado, 0) + av.duracion
+        fecha = self.mas_reciente_estado.get(estado)
+        if fecha == None or av.fechahora > fecha:
+            self.mas_reciente_estado[estado] = av.fechahora
+
+        self.conteos_forma[av.forma] += 1
+
+        celda = redondear(av.ubicacion)
+        if celda not in self.conteos_celda:
+            self.conteos_celda[celda] = [0, len(self.conteos_celda)]
+        conteo = self.conteos_celda[celda]
+        conteo[0] += 1
+        # Como max, a igual número de avistamientos gana la celda que apareció antes
+        if self.celda_mas_avistamientos == None:
+            self.celda_mas_avistamientos = celda
+        else:
+            mejor = self.conteos_celda[self.celda_mas_avistamientos]
+            if conteo[0] > mejor[0] or (conteo[0] == mejor[0] and conteo[1] < mejor[1]):
+                self.celda_mas_avistamientos = celda
+
+    def añade_todos(self, avistamientos:Iterable[Avistamiento])->None:
+        '''
+        Actualiza las estadísticas con varios avistamientos nuevos.
+
+        :param avistamientos: iterable de tuplas con la información de los avistamientos
+        '''
+        for av in avistamientos:
+            self.añade(av)
+
+    def __len__(self)->int:
+        return self.num_avistamientos
+
+    def duracion_total(self, estado:str)->int:
+        '''Equivale a avistamientos.duracion_total'''
+        return self.duraciones_estado.get(estado, 0)
+
+    def numero_avistamientos_por_año(self)->dict[int, int]:
+        '''Equivale a avistamientos.numero_avistamientos_por_año'''
+        return dict(self.conteos_año)
+
+    def num_avistamientos_por_mes(self)->dict[str, int]:
+        '''Equivale a avistamientos.num_avistamientos_por_mes'''
+        return dict(self.conteos_mes)
+
+    def coordenadas_mas_avistamientos(self)->Coordenadas:
+        '''Equivale a avistamientos.coordenadas_mas_avistamientos'''
+        if self.celda_mas_avistamientos == None:
+            raise ValueError("No se ha añadido ningún avistamiento")
+        return self.celda_mas_avistamientos
+
+    def media_dias_entre_avistamientos(self, anyo:int|None=None)->float|None:
+        '''Equivale a avistamientos.media_dias_entre_avistamientos'''
+        return media_dias_resumen(self.dias_año, anyo)
+
+    def avistamiento_mas_reciente_por_estado(self)->dict[str, datetime]:
+        '''Equivale a avistamientos.avistamiento_mas_reciente_por_estado'''
+        return dict(self.mas_reciente_estado)
+
+    def porc_avistamientos_por_forma(self)->dict[str, float]:
+        '''Equivale a avistamientos.porc_avistamientos_por_forma'''
+        return {forma: recuento*100/self.num_avistamientos
+                for forma, recuento in self.conteos_forma.items()}
@@ -0,0 +1,356 @@
+'''
+Índices que se construyen una vez sobre una lista de avistamientos y que
+permiten responder consultas sin recorrer la lista completa.
+
+Los índices guardan posiciones (ids) dentro de la lista de avistamientos
+sobre la que se construyen, y se deben usar siempre con esa misma lista.
+'''
+import re
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time
+from typing import Callable, Hashable, Iterable
+
+from avistamientos import Avistamiento
+from coordenadas import Coordenadas, distancia
+
+## Definición de constantes
+PATRON_PALABRA = re.compile(r"\w+")
+
+def _une(listas:Iterable[list[int]])->list[int]:
+    '''
+    Devuelve la unión ordenada y sin repetidos de varias listas de ids.
+    '''
+    res = set()
+    for ids in listas:
+        res.update(ids)
+    return sorted(res)
+
+## Índice espacial
+class IndiceEspacial:
+    '''
+    Rejilla uniforme sobre el campo ubicacion de los avistamientos.
+
+    Cada celda agrupa los avistamientos cuyas coordenadas, divididas por el
+    tamaño de celda, se redondean a los mismos enteros (con tam_celda=1 las
+    celdas son las mismas que las de coordenadas.redondear). Dentro de cada
+    celda los ids se guardan ordenados de mayor a menor duración.
+    '''
+
+    def __init__(self, avistamientos:Iterable[Avistamiento], tam_celda:float=1.0):
+        '''
+        :param avistamientos: iterable de tuplas con la información de los avistamientos
+        :param tam_celda: tamaño en grados del lado de cada celda
+        '''
+        if tam_celda <= 0:
+            raise ValueError(f"El tamaño de celda debe ser positivo: {tam_celda}")
+        self.avistamientos = list(avistamientos)
+        self.tam_celda = tam_celda
+        self.celdas: dict[tuple[int, int], list[int]] = {}
+        for id, av in enumerate(self.avistamientos):
+            celda = self._celda(av.ubicacion.latitud, av.ubicacion.longitud)
+            if celda not in self.celdas:
+                self.celdas[celda] = []
+            self.celdas[celda].append(id)
+        for ids in self.celdas.values():
+            # A igual duración, primero el que aparece antes en la lista
+            ids.sort(key=lambda id: (-self.avistamientos[id].duracion, id))
+
+    def _celda(self, latitud:float, longitud:float)->tuple[int, int]:
+        return (round(latitud / self.tam_celda), round(longitud / self.tam_celda))
+
+    def _celdas_cercanas(self, ubicacion:Coordenadas, radio:float)->list[list[int]]:
+        '''
+        Devuelve las listas de ids de las celdas que pueden contener avistamientos
+        a una distancia menor o igual que radio de la ubicación.
+        '''
+        lat_min, lon_min = self._celda(ubicacion.latitud - radio, ubicacion.longitud - radio)
+        lat_max, lon_max = self._celda(ubicacion.latitud + radio, ubicacion.longitud + radio)
+        num_celdas = (lat_max - lat_min + 1) * (lon_max - lon_min + 1)
+        if num_celdas > len(self.celdas):
+            # El radio es muy grande: sale más barato recorrer las celdas ocupadas
+            return [ids for (lat, lon), ids in self.celdas.items()
+                    if lat_min <= lat <= lat_max and lon_min <= lon <= lon_max]
+        res = []
+        for lat in range(lat_min, lat_max + 1):
+            for lon in range(lon_min, lon_max + 1):
+                ids = self.celdas.get((lat, lon))
+                if ids != None:
+                    res.append(ids)
+        return res
+
+    def num_candidatos(self, ubicacion:Coordenadas, radio:float)->int:
+        '''
+        Devuelve el número de avistamientos de las celdas que se revisan en una
+        búsqueda por radio (una cota superior del número de resultados).
+        '''
+        return sum(len(ids) for ids in self._celdas_cercanas(ubicacion, radio))
+
+    def ids_cercanos(self, ubicacion:Coordenadas, radio:float)->list[int]:
+        '''
+        Devuelve los ids de los avistamientos que se encuentran a una distancia
+        menor o igual que radio de la ubicación dada, en orden creciente.
+        '''
+        res = []
+        for ids in self._celdas_cercanas(ubicacion, radio):
+            for id in ids:
+                if distancia(ubicacion, self.avistamientos[id].ubicacion) <= radio:
+                    res.append(id)
+        res.sort()
+        return res
+
+    def cercanos(self, ubicacion:Coordenadas, radio:float)->list[Avistamiento]:
+        '''
+        Devuelve los avistamientos que se encuentran a una distancia menor
+        o igual que radio de la ubicación dada.
+
+        :param ubicacion: coordenadas del centro de la búsqueda
+        :param radio: radio de distancia
+        :return: lista de avistamientos dentro del radio
+        '''
+        res = []
+        for ids in self._celdas_cercanas(ubicacion, radio):
+            for id in ids:
+                av = self.avistamientos[id]
+                if distancia(ubicacion, av.ubicacion) <= radio:
+                    res.append(av)
+        return res
+
+    def mayor_duracion_cercano(self, ubicacion:Coordenadas, radio:float)->Avistamiento|None:
+        '''
+        Devuelve el avistamiento de mayor duración de entre los que se
+        encuentran a una distancia menor o igual que radio de la ubicación.
+        Si hay empate, devuelve el que aparece antes en la lista, igual que max.
+
+        :param ubicacion: coordenadas del centro de la búsqueda
+        :param radio: radio de distancia
+        :return: avistamiento más largo dentro del radio, o None si no hay ninguno
+        '''
+        mejor_id = None
+        for ids in self._celdas_cercanas(ubicacion, radio):
+            for id in ids:
+                av = self.avistamientos[id]
+                if mejor_id != None:
+                    mejor = self.avistamientos[mejor_id]
+                    # Los siguientes ids de la celda no pueden mejorar al actual
+                    if (av.duracion, -id) < (mejor.duracion, -mejor_id):
+                        break
+                if distancia(ubicacion, av.ubicacion) <= radio:
+                    mejor_id = id
+                    break
+        if mejor_id == None:
+            return None
+        return self.avistamientos[mejor_id]
+
+## Índice temporal
+class IndiceTemporal:
+    '''
+    Ids de los avistamientos ordenados por fecha y hora, junto con la lista
+    ordenada de fechas, de forma que las consultas por fecha se resuelven
+    con búsqueda binaria (bisect) en tiempo O(log n + k).
+    '''
+
+    def __init__(self, avistamientos:Iterable[Avistamiento]):
+        '''
+        :param avistamientos: iterable de tuplas con la información de los avistamientos
+        '''
+        self.avistamientos = list(avistamientos)
+        # Se ordena por la tupla completa, igual que avistamientos_fechas,
+        # para que los empates de fechahora salgan en el mismo orden
+        self.ids = sorted(range(len(self.avistamientos)), key=lambda id: self.avistamientos[id])
+        self.fechas = [self.avistamientos[id].fechahora for id in self.ids]
+
+    def _posiciones(self, fecha_inicial:date|None, fecha_final:date|None)->tuple[int, int]:
+        '''
+        Devuelve las posiciones (inicio, fin) de self.ids que delimitan los
+        avistamientos entre fecha_inicial y fecha_final, ambas inclusive.
+        '''
+        inicio = 0
+        if fecha_inicial != None:
+            inicio = bisect_left(self.fechas, datetime.combine(fecha_inicial, time.min))
+        fin = len(self.fechas)
+        if fecha_final != None:
+            fin = bisect_right(self.fechas, datetime.combine(fecha_final, time.max))
+        return inicio, max(inicio, fin)
+
+    def num_rango(self, fecha_inicial:date|None=None, fecha_final:date|None=None)->int:
+        '''
+        Devuelve el número de avistamientos entre fecha_inicial y fecha_final
+        (ambas inclusive). Si alguna de las fechas es None, no se tiene en cuenta.
+        '''
+        inicio, fin = self._posiciones(fecha_inicial, fecha_final)
+        return fin - inicio
+
+    def ids_rango(self, fecha_inicial:date|None=None, fecha_final:date|None=None)->list[int]:
+        '''
+        Devuelve los ids de los avistamientos entre fecha_inicial y fecha_final
+        (ambas inclusive), de más antiguo a más reciente. Si alguna de las
+        fechas es None, no se tiene en cuenta.
+        '''
+        inicio, fin = self._posiciones(fecha_inicial, fecha_final)
+        return self.ids[inicio:fin]
+
+    def rango(self, fecha_inicial:date|None=None, fecha_final:date|None=None)->list[Avistamiento]:
+        '''
+        Devuelve los avistamientos entre fecha_inicial y fecha_final (ambas
+        inclusive), de más reciente a más antiguo. Si alguna de las fechas
+        es None, no se tiene en cuenta.
+
+        :param fecha_inicial: fecha a partir de la cual se devuelven los avistamientos
+        :param fecha_final: fecha hasta la cual se devuelven los avistamientos
+        :return: lista de avistamientos en el rango de fechas
+        '''
+        inicio, fin = self._posiciones(fecha_inicial, fecha_final)
+        return [self.avistamientos[self.ids[pos]] for pos in range(fin - 1, inicio - 1, -1)]
+
+    def numero_fecha(self, fecha:date)->int:
+        '''
+        Devuelve el número de avistamientos que se han producido en una fecha.
+
+        :param fecha: fecha de los avistamientos
+        :return: número de avistamientos producidos en la fecha
+        '''
+        inicio, fin = self._posiciones(fecha, fecha)
+        return fin - inicio
+
+## Índice hash
+class IndiceHash:
+    '''
+    Diccionario que asocia a cada valor de un campo (por ejemplo, el estado)
+    la lista ordenada de ids de los avistamientos que tienen ese valor.
+    '''
+
+    def __init__(self, avistamientos:Iterable[Avistamiento], clave:Callable[[Avistamiento], Hashable]):
+        '''
+        :param avistamientos: iterable de tuplas con la información de los avistamientos
+        :param clave: función que devuelve el valor del campo indexado,
+             por ejemplo lambda av: av.estado
+        '''
+        self.avistamientos = list(avistamientos)
+        self.clave = clave
+        self.ids_por_valor: dict[Hashable, list[int]] = {}
+        for id, av in enumerate(self.avistamientos):
+            valor = clave(av)
+            if valor not in self.ids_por_valor:
+                self.ids_por_valor[valor] = []
+            self.ids_por_valor[valor].append(id)
+
+    def num(self, valores:Iterable[Hashable])->int:
+        '''
+        Devuelve el número de avistamientos con alguno de los valores dados.
+        '''
+        return sum(len(self.ids_por_valor.get(valor, ())) for valor in set(valores))
+
+    def ids(self, valores:Iterable[Hashable])->list[int]:
+        '''
+        Devuelve los ids de los avistamientos con alguno de los valores dados,
+        en orden creciente.
+        '''
+        valores = set(valores)
+        if len(valores) == 1:
+            return list(self.ids_por_valor.get(valores.pop(), []))
+        return _une(self.ids_por_valor.get(valor, []) for valor in valores)
+
+    def avistamientos_valor(self, valor:Hashable)->list[Avistamiento]:
+        '''
+        Devuelve los avistamientos con el valor dado, en el orden de la lista original.
+        '''
+        return [self.avistamientos[id] for id in self.ids_por_valor.get(valor, [])]
+
+## Índice de texto
+def tokeniza(texto:str)->list[str]:
+    '''
+    Devuelve las palabras de un texto, en minúsculas.
+    '''
+    return PATRON_PALABRA.findall(texto.lower())
+
+class IndiceTextual:
+    '''
+    Índice invertido sobre los comentarios de los avistamientos: para cada
+    palabra (en minúsculas) guarda la lista ordenada de ids de los avistamientos
+    cuyo comentario la contiene. El vocabulario se guarda ordenado para poder
+    buscar por prefijo con bisect.
+    '''
+
+    def __init__(self, avistamientos:Iterable[Avistamiento]):
+        '''
+        :param avistamientos: iterable de tuplas con la información de los avistamientos
+        '''
+        self.avistamientos = list(avistamientos)
+        self.publicaciones: dict[str, list[int]] = {}
+        for id, av in enumerate(self.avistamientos):
+            for palabra in set(tokeniza(av.comentarios)):
+                if palabra not in self.publicaciones:
+                    self.publicaciones[palabra] = []
+                self.publicaciones[palabra].append(id)
+        self.vocabulario = sorted(self.publicaciones)
+
+    def ids_palabra(self, palabra:str)->list[int]:
+        '''
+        Devuelve los ids de los avistamientos cuyo comentario contiene la
+        palabra completa, sin distinguir mayúsculas de minúsculas.
+        '''
+        return list(self.publicaciones.get(palabra.lower(), []))
+
+    def ids_prefijo(self, prefijo:str)->list[int]:
+        '''
+        Devuelve los ids de los avistamientos cuyo comentario contiene alguna
+        palabra que empieza por el prefijo, sin distinguir mayúsculas de minúsculas.
+        '''
+        prefijo = prefijo.lower()
+        inicio = bisect_left(self.vocabulario, prefijo)
+        fin = inicio
+        while fin < len(self.vocabulario) and self.vocabulario[fin].startswith(prefijo):
+            fin += 1
+        return _une(self.publicaciones[palabra] for palabra in self.vocabulario[inicio:fin])
+
+    def ids_subcadena(self, subcadena:str)->list[int]:
+        '''
+        Devuelve los ids de los avistamientos cuyo comentario contiene la subcadena
+        (distinguiendo mayúsculas de minúsculas), igual que "subcadena in comentarios".
+
+        Si la subcadena es una sola palabra, sólo puede aparecer dentro de una palabra
+        del comentario, así que basta con revisar los avistamientos de las palabras
+        del vocabulario que la contienen. Si no, se revisan todos los avistamientos.
+        '''
+        if PATRON_PALABRA.fullmatch(subcadena):
+            minusculas = subcadena.lower()
+            candidatos = _une(self.publicaciones[palabra] for palabra in self.vocabulario
+                              if minusculas in palabra)
+        else:
+            candidatos = range(len(self.avistamientos))
+        return [id for id in candidatos if subcadena in self.avistamientos[id].comentarios]
+
+    def _filtra_año(self, ids:Iterable[int], anyo:int|None)->list[Avistamiento]:
+        return [self.avistamientos[id] for id in ids
+                if anyo == None or self.avistamientos[id].fechahora.year == anyo]
+
+    def avistamientos_palabra(self, palabra:str, anyo:int|None=None)->list[Avistamiento]:
+        '''
+        Devuelve los avistamientos cuyo comentario contiene la palabra completa
+        (sin distinguir mayúsculas de minúsculas), en el orden de la lista original.
+
+        :param palabra: palabra que se busca
+        :param anyo: si no es None, sólo se devuelven los avistamientos de ese año
+        :return: lista de avistamientos
+        '''
+        return self._filtra_año(self.ids_palabra(palabra), anyo)
+
+    def avistamientos_prefijo(self, prefijo:str, anyo:int|None=None)->list[Avistamiento]:
+        '''
+        Devuelve los avistamientos cuyo comentario contiene alguna palabra que
+        empieza por el prefijo (sin distinguir mayúsculas de minúsculas), en el
+        orden de la lista original.
+
+        :param prefijo: comienzo de las palabras que se buscan
+        :param anyo: si no es None, sólo se devuelven los avistamientos de ese año
+        :return: lista de avistamientos
+        '''
+        return self._filtra_año(self.ids_prefijo(prefijo), anyo)
+
+    def comentario_mas_largo(self, anyo:int, palabra:str)->Avistamiento:
+        '''
+        Devuelve el avistamiento del año dado con el comentario más largo de
+        entre los que incluyen la palabra. Equivale a avistamientos.comentario_mas_largo.
+        '''
+        filtrado = self._filtra_año(self.ids_subcadena(palabra), anyo)
+        return max(filtrado, key = lambda av: len(av.comentarios))
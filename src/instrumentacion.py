@@ -0,0 +1,263 @@
+'''
+Instrumentación opcional de las funciones de avistamientos.
+
+Por defecto no se mide nada. Se activa de dos formas:
+
+- Con la variable de entorno AVISTAMIENTOS_INSTRUMENTACION=1: se mide todo el
+  programa y, al terminar, se escribe el resumen en la salida de error. Si
+  además se define AVISTAMIENTOS_INSTRUMENTACION_PSTATS=ruta, se guardan las
+  medidas en ese fichero con el formato de cProfile.
+- Con el gestor de contexto instrumenta:
+      with instrumenta() as medidas:
+          avistamientos = lee_avistamientos("data/ovnis.csv")
+          estados_mas_avistamientos(avistamientos)
+      print(medidas.tabla())
+      medidas.vuelca_pstats("avistamientos.prof")
+
+De cada función de consulta se registran las llamadas, el tiempo, los
+avistamientos recorridos y los elementos devueltos. La carga de datos se
+divide además en fases: lectura del fichero (E/S), separación en campos
+(tokenizado), conversión de fechas y construcción de los avistamientos.
+'''
+import atexit
+import inspect
+import marshal
+import os
+import sys
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter
+from typing import Any, Callable, Iterable, Iterator
+
+## Definición de constantes
+VARIABLE_ENTORNO = "AVISTAMIENTOS_INSTRUMENTACION"
+VARIABLE_ENTORNO_PSTATS = "AVISTAMIENTOS_INSTRUMENTACION_PSTATS"
+# Fases de la carga de datos, en el orden en que se muestran
+FASES_CARGA = ("E/S", "tokenizado", "fechas", "construcción")
+
+# Claves de las funciones con el formato de pstats: (fichero, línea, nombre)
+Clave = tuple[str, int, str]
+
+class Medida:
+    '''
+    Medidas acumuladas de una función.
+    '''
+    def __init__(self):
+        self.llamadas = 0
+        self.segundos = 0.0
+        self.segundos_propios = 0.0
+        self.recorridos = 0
+        self.devueltos = 0
+        # Llamadas recibidas de cada función instrumentada: clave -> [llamadas, propios, total]
+        self.llamantes: dict[Clave, list] = {}
+
+class Instrumentacion:
+    '''
+    Registro de las medidas tomadas mientras la instrumentación está activa.
+    '''
+    def __init__(self):
+        self.medidas: dict[Clave, Medida] = {}
+        self.fases: dict[str, float] = dict.fromkeys(FASES_CARGA, 0.0)
+        # Pila de las llamadas en curso: [clave, segundos de las llamadas internas]
+        self._pila: list[list] = []
+
+    def _medida(self, clave:Clave)->Medida:
+        medida = self.medidas.get(clave)
+        if medida == None:
+            medida = Medida()
+            self.medidas[clave] = medida
+        return medida
+
+    def _termina(self, clave:Clave, segundos:float, segundos_internos:float)->Medida:
+        '''
+        Anota una ejecución que ha durado segundos, de los que segundos_internos
+        corresponden a otras funciones instrumentadas.
+        '''
+        medida = self._medida(clave)
+        medida.llamadas += 1
+        medida.segundos += segundos
+        medida.segundos_propios += segundos - segundos_internos
+        if self._pila:
+            llamante = self._pila[-1]
+            llamante[1] += segundos
+            anotacion = medida.llamantes.setdefault(llamante[0], [0, 0.0, 0.0])
+            anotacion[0] += 1
+            anotacion[1] += segundos - segundos_internos
+            anotacion[2] += segundos
+        return medida
+
+    def añade_fase(self, fase:str, segundos:float)->None:
+        '''
+        Suma segundos al tiempo de una de las fases de la carga de datos.
+        '''
+        self.fases[fase] += segundos
+        self._termina(("~", 0, f"<carga: {fase}>"), segundos, 0.0)
+
+    def reinicia(self)->None:
+        '''
+        Descarta todas las medidas tomadas hasta ahora.
+        '''
+        self.medidas.clear()
+        self.fases = dict.fromkeys(FASES_CARGA, 0.0)
+
+    def tabla(self)->str:
+        '''
+        Devuelve un resumen de las medidas en forma de tabla de texto, con las
+        funciones ordenadas de mayor a menor tiempo total.
+        '''
+        lineas = [f"{'función':<45} {'llamadas':>9} {'total (s)':>10} {'propio (s)':>10} "
+                  f"{'media (ms)':>10} {'recorridos':>11} {'devueltos':>10}"]
+        funciones = [(clave[2], medida) for clave, medida in self.medidas.items() if clave[0] != "~"]
+        for nombre, medida in sorted(funciones, key=lambda item: item[1].segundos, reverse=True):
+            lineas.append(f"{nombre:<45} {medida.llamadas:>9} {medida.segundos:>10.4f} "
+                          f"{medida.segundos_propios:>10.4f} "
+                          f"{1000 * medida.segundos / medida.llamadas:>10.3f} "
+                          f"{medida.recorridos:>11} {medida.devueltos:>10}")
+        total_carga = sum(self.fases.values())
+        if total_carga > 0:
+            lineas.append("")
+            lineas.append(f"{'fase de la carga':<45} {'total (s)':>10} {'%':>6}")
+            for fase in FASES_CARGA:
+                lineas.append(f"{fase:<45} {self.fases[fase]:>10.4f} "
+                              f"{100 * self.fases[fase] / total_carga:>6.1f}")
+        return "\n".join(lineas)
+
+    def estadisticas_pstats(self)->dict:
+        '''
+        Devuelve las medidas con el formato del diccionario stats de pstats:
+        clave -> (llamadas primitivas, llamadas, tiempo propio, tiempo total, llamantes).
+        '''
+        return {clave: (medida.llamadas, medida.llamadas, medida.segundos_propios, medida.segundos,
+                        {llamante: (n, n, propios, total)
+                         for llamante, (n, propios, total) in medida.llamantes.items()})
+                for clave, medida in self.medidas.items()}
+
+    def vuelca_pstats(self, fichero:str)->None:
+        '''
+        Guarda las medidas en un fichero que se puede abrir con pstats.Stats
+        o con las herramientas de visualización de cProfile (snakeviz, etc.).
+        '''
+        with open(fichero, "wb") as f:
+            marshal.dump(self.estadisticas_pstats(), f)
+
+# Instrumentación activa, o None si no se está midiendo nada
+_actual: Instrumentacion|None = None
+
+def actual()->Instrumentacion|None:
+    '''
+    Devuelve la instrumentación activa, o None si está desactivada.
+    '''
+    return _actual
+
+@contextmanager
+def instrumenta()->Iterator[Instrumentacion]:
+    '''
+    Gestor de contexto que activa una instrumentación nueva mientras dura el
+    bloque with. Al salir se restaura la que hubiera antes.
+    '''
+    global _actual
+    anterior = _actual
+    _actual = Instrumentacion()
+    try:
+        yield _actual
+    finally:
+        _actual = anterior
+
+class _Contador:
+    '''
+    Iterador que cuenta los elementos que se obtienen de otro iterable.
+    '''
+    def __init__(self, iterable:Iterable):
+        self.iterador = iter(iterable)
+        self.num = 0
+
+    def __iter__(self)->"_Contador":
+        return self
+
+    def __next__(self)->Any:
+        elemento = next(self.iterador)
+        self.num += 1
+        return elemento
+
+class LecturaMedida:
+    '''
+    Iterador sobre las líneas de un fichero abierto que acumula el tiempo
+    empleado en leerlas (la fase de E/S de la carga de datos).
+    '''
+    def __init__(self, fichero:Iterable[str]):
+        self.fichero = iter(fichero)
+        self.segundos = 0.0
+
+    def __iter__(self)->"LecturaMedida":
+        return self
+
+    def __next__(self)->str:
+        inicio = perf_counter()
+        try:
+            return next(self.fichero)
+        finally:
+            self.segundos += perf_counter() - inicio
+
+def _num_elementos(resultado:Any)->int:
+    '''
+    Número de elementos devueltos: el tamaño de las colecciones, 0 para None
+    y 1 para cualquier otro valor (un avistamiento, un número, etc.).
+    '''
+    if resultado == None:
+        return 0
+    if isinstance(resultado, (list, set, frozenset, dict)):
+        return len(resultado)
+    return 1
+
+def instrumentada(funcion:Callable|None=None, *, recorre:bool=True)->Callable:
+    '''
+    Decorador que mide una función mientras la instrumentación está activa.
+    Si está desactivada, sólo añade una llamada a la función original.
+
+    :param funcion: función que se quiere medir
+    :param recorre: si es True, el primer parámetro de la función son los
+         avistamientos que recorre. Si la función recibe un índice distinto
+         de None, no recorre los avistamientos y no se cuentan.
+    '''
+    if funcion == None:
+        return lambda funcion: instrumentada(funcion, recorre=recorre)
+    codigo = funcion.__code__
+    clave = (codigo.co_filename, codigo.co_firstlineno, funcion.__qualname__)
+    firma = inspect.signature(funcion)
+    usa_indice = "indice" in firma.parameters
+
+    @wraps(funcion)
+    def envoltorio(*args, **kwargs):
+        registro = _actual
+        if registro == None:
+            return funcion(*args, **kwargs)
+        contador = None
+        recorre_lista = recorre and len(args) > 0
+        if recorre_lista and usa_indice and firma.bind(*args, **kwargs).arguments.get("indice") != None:
+            recorre_lista = False
+        if recorre_lista and not hasattr(args[0], "__len__"):
+            contador = _Contador(args[0])
+            args = (contador,) + args[1:]
+        registro._pila.append([clave, 0.0])
+        inicio = perf_counter()
+        try:
+            res = funcion(*args, **kwargs)
+        finally:
+            segundos = perf_counter() - inicio
+            _, segundos_internos = registro._pila.pop()
+            medida = registro._termina(clave, segundos, segundos_internos)
+        if recorre_lista:
+            medida.recorridos += contador.num if contador != None else len(args[0])
+        medida.devueltos += _num_elementos(res)
+        return res
+    return envoltorio
+
+def _al_terminar(registro:Instrumentacion)->None:
+    print(registro.tabla(), file=sys.stderr)
+    fichero = os.environ.get(VARIABLE_ENTORNO_PSTATS)
+    if fichero:
+        registro.vuelca_pstats(fichero)
+
+if os.environ.get(VARIABLE_ENTORNO, "") not in ("", "0"):
+    _actual = Instrumentacion()
+    atexit.register(_al_terminar, _actual)
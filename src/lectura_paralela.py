@@ -0,0 +1,183 @@
+'''
+Lectura en paralelo de un fichero csv de avistamientos.
+
+El fichero se divide en fragmentos de bytes que empiezan y acaban en un
+límite de registro, y cada fragmento se convierte en avistamientos en un
+proceso distinto (ProcessPoolExecutor). Los resultados se unen en el mismo
+orden en que aparecen en el fichero, así que el resultado es el mismo que el
+de avistamientos.lee_avistamientos.
+
+Los scripts que usen esta función deben proteger su código principal con
+    if __name__ == "__main__":
+porque en algunos sistemas los procesos hijos vuelven a importar el script.
+'''
+import csv
+import io
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from avistamientos import Avistamiento, Rechazo, parsea_filas
+
+## Definición de constantes
+# Tamaño de los bloques en los que se cuentan las comillas al buscar los cortes
+TAM_BLOQUE = 1 << 24
+
+def _cuenta_comillas(datos:mmap.mmap, inicio:int, fin:int)->int:
+    '''
+    Devuelve el número de comillas dobles entre las posiciones inicio y fin.
+    '''
+    res = 0
+    for pos in range(inicio, fin, TAM_BLOQUE):
+        res += datos[pos:min(pos + TAM_BLOQUE, fin)].count(b'"')
+    return res
+
+def _siguiente_limite(datos:mmap.mmap, desde:int, pos:int)->int:
+    '''
+    Devuelve la posición en la que empieza el primer registro situado en pos
+    o después. El parámetro desde debe ser un límite de registro anterior a pos.
+
+    Un salto de línea separa dos registros sólo si antes de él hay un número par
+    de comillas, es decir, si no está dentro de un campo entre comillas (como
+    un comentario que contiene comas o saltos de línea). Las comillas escapadas
+    ("") no cambian la paridad.
+    '''
+    comillas = _cuenta_comillas(datos, desde, pos)
+    while True:
+        salto = datos.find(b"\n", pos)
+        if salto == -1:
+            return len(datos)
+        comillas += _cuenta_comillas(datos, pos, salto)
+        if comillas % 2 == 0:
+            return salto + 1
+        pos = salto + 1
+
+def calcula_fragmentos(fichero:str, num_fragmentos:int)->list[tuple[int, int]]:
+    '''
+    Divide los registros de un fichero csv (sin la cabecera) en fragmentos
+    de tamaño parecido, sin partir ningún registro.
+
+    :param fichero: ruta del fichero csv
+    :param num_fragmentos: número de fragmentos que se quieren obtener
+    :return: lista de tuplas (inicio, fin) con las posiciones en bytes de cada
+         fragmento. Puede tener menos de num_fragmentos elementos si el
+         fichero es pequeño.
+    '''
+    with open(fichero, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as datos:
+            tamaño = len(datos)
+            inicio_datos = _siguiente_limite(datos, 0, 0)
+            limites = [inicio_datos]
+            for i in range(1, num_fragmentos):
+                objetivo = inicio_datos + (tamaño - inicio_datos) * i // num_fragmentos
+                if objetivo <= limites[-1]:
+                    continue
+                limite = _siguiente_limite(datos, limites[-1], objetivo)
+                if limite < tamaño:
+                    limites.append(limite)
+            limites.append(tamaño)
+    return [(inicio, fin) for inicio, fin in zip(limites, limites[1:]) if inicio < fin]
+
+def lineas_iniciales(fichero:str, fragmentos:list[tuple[int, int]])->list[int]:
+    '''
+    Devuelve el número de línea del fichero en el que empieza cada fragmento.
+    '''
+    res = []
+    with open(fichero, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return [1 for _ in fragmentos]
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as datos:
+            linea, posicion = 1, 0
+            for inicio, _ in fragmentos:
+                for pos in range(posicion, inicio, TAM_BLOQUE):
+                    linea += datos[pos:min(pos + TAM_BLOQUE, inicio)].count(b"\n")
+                posicion = max(posicion, inicio)
+                res.append(linea)
+    return res
+
+def lee_fragmento(fichero:str, inicio:int, fin:int, rapido:bool=False,
+                  compacto:bool=False, rechazos:list[Rechazo]|None=None,
+                  linea_inicial:int=1)->list[Avistamiento]:
+    '''
+    Lee los avistamientos de un fragmento de un fichero csv.
+
+    :param fichero: ruta del fichero csv que contiene los datos en codificación utf-8
+    :param inicio: posición en bytes en la que empieza el fragmento
+    :param fin: posición en bytes en la que acaba el fragmento
+    :param rapido: modo de conversión de fechas (ver avistamientos.lee_avistamientos)
+    :param compacto: tipo de los avistamientos (ver avistamientos.lee_avistamientos)
+    :param rechazos: lista en la que se guardan las filas erróneas (ver avistamientos.parsea_filas)
+    :param linea_inicial: número de línea del fichero en el que empieza el
+         fragmento, para calcular la línea de las filas erróneas
+    :return: lista de avistamientos del fragmento
+    '''
+    with open(fichero, "rb") as f:
+        f.seek(inicio)
+        datos = f.read(fin - inicio)
+    # newline=None convierte los saltos de línea igual que open en modo texto
+    texto = io.StringIO(datos.decode("utf-8"), newline=None)
+    if rechazos == None:
+        return list(parsea_filas(csv.reader(texto), rapido, compacto))
+    rechazos_fragmento = []
+    res = list(parsea_filas(csv.reader(texto), rapido, compacto, rechazos_fragmento))
+    rechazos.extend(rechazo._replace(linea=rechazo.linea + linea_inicial - 1)
+                    for rechazo in rechazos_fragmento)
+    return res
+
+def _lee_fragmento_tolerante(fichero:str, inicio:int, fin:int, rapido:bool, compacto:bool,
+                             linea_inicial:int)->tuple[list[Avistamiento], list[Rechazo]]:
+    '''
+    Lee un fragmento guardando las filas erróneas, y devuelve los avistamientos
+    y los rechazos (los procesos hijos no pueden modificar la lista del padre).
+    '''
+    rechazos = []
+    return lee_fragmento(fichero, inicio, fin, rapido, compacto, rechazos, linea_inicial), rechazos
+
+def lee_avistamientos_paralelo(fichero:str, num_procesos:int|None=None,
+                               rapido:bool=False, compacto:bool=False,
+                               rechazos:list[Rechazo]|None=None)->list[Avistamiento]:
+    '''
+    Lee un fichero de entrada usando varios procesos y devuelve la misma lista
+    de avistamientos que avistamientos.lee_avistamientos.
+
+    :param fichero: ruta del fichero csv que contiene los datos en codificación utf-8
+    :param num_procesos: número de procesos. Si es None, se usa el número de CPUs.
+    :param rapido: modo de conversión de fechas (ver avistamientos.lee_avistamientos)
+    :param compacto: tipo de los avistamientos (ver avistamientos.lee_avistamientos)
+    :param rechazos: lista en la que se guardan las filas erróneas, en el orden
+         del fichero (ver avistamientos.lee_avistamientos)
+    :return: lista de tuplas con la información de los avistamientos
+    '''
+    if num_procesos == None:
+        num_procesos = os.cpu_count() or 1
+    if num_procesos <= 0:
+        raise ValueError(f"El número de procesos debe ser positivo: {num_procesos}")
+    fragmentos = calcula_fragmentos(fichero, num_procesos)
+    if rechazos == None:
+        lineas = [1 for _ in fragmentos]
+    else:
+        lineas = lineas_iniciales(fichero, fragmentos)
+    if num_procesos == 1 or len(fragmentos) <= 1:
+        return [av for (inicio, fin), linea in zip(fragmentos, lineas)
+                for av in lee_fragmento(fichero, inicio, fin, rapido, compacto, rechazos, linea)]
+
+    res = []
+    with ProcessPoolExecutor(max_workers=num_procesos) as ejecutor:
+        if rechazos == None:
+            futuros = [ejecutor.submit(lee_fragmento, fichero, inicio, fin, rapido, compacto)
+                       for inicio, fin in fragmentos]
+        else:
+            futuros = [ejecutor.submit(_lee_fragmento_tolerante, fichero, inicio, fin,
+                                       rapido, compacto, linea)
+                       for (inicio, fin), linea in zip(fragmentos, lineas)]
+        # Se recogen en el orden de los fragmentos para respetar el orden del fichero
+        for futuro in futuros:
+            if rechazos == None:
+                res.extend(futuro.result())
+            else:
+                avistamientos, rechazos_fragmento = futuro.result()
+                res.extend(avistamientos)
+                rechazos.extend(rechazos_fragmento)
+    return res
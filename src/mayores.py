@@ -0,0 +1,93 @@
+'''
+Selección de los n mayores elementos de un iterable usando montículos (heapq)
+acotados a n elementos, de forma que se recorre el iterable una sola vez y
+nunca se guardan más de n candidatos (por grupo).
+
+Los empates se resuelven como en una ordenación estable de mayor a menor:
+a igual clave, va antes el elemento que aparece antes en el iterable.
+'''
+import heapq
+from typing import Callable, Hashable, Iterable, TypeVar
+
+T = TypeVar('T')
+K = TypeVar('K', bound=Hashable)
+
+def _añade_acotado(monticulo:list, n:int, entrada:tuple)->None:
+    '''
+    Añade una entrada (clave, -orden, elemento) a un montículo de mínimos
+    que nunca tiene más de n entradas. Como el orden de cada elemento es
+    distinto, las tuplas nunca llegan a comparar los elementos.
+    '''
+    if len(monticulo) < n:
+        heapq.heappush(monticulo, entrada)
+    elif entrada > monticulo[0]:
+        heapq.heapreplace(monticulo, entrada)
+
+def _ordena(monticulo:list)->list:
+    '''
+    Devuelve los elementos del montículo ordenados de mayor a menor clave.
+    '''
+    return [elemento for _, _, elemento in sorted(monticulo, reverse=True)]
+
+def n_mayores(iterable:Iterable[T], n:int, key:Callable[[T], object])->list[T]:
+    '''
+    Devuelve los n elementos del iterable con mayor valor de key, ordenados
+    de mayor a menor. Equivale a sorted(iterable, key=key, reverse=True)[:n].
+
+    :param iterable: elementos entre los que se hace la selección
+    :param n: número de elementos a devolver
+    :param key: función que calcula la clave por la que se compara cada elemento
+    :return: lista con los n elementos de mayor clave, de mayor a menor
+    '''
+    monticulo = []
+    if n > 0:
+        for orden, elemento in enumerate(iterable):
+            _añade_acotado(monticulo, n, (key(elemento), -orden, elemento))
+    return _ordena(monticulo)
+
+class MayoresPorGrupo:
+    '''
+    Mantiene, para cada grupo, los n elementos con mayor valor de key
+    vistos hasta el momento.
+    '''
+    def __init__(self, n:int, grupo:Callable[[T], K], key:Callable[[T], object]):
+        '''
+        :param n: número de elementos a guardar por cada grupo
+        :param grupo: función que calcula el grupo de cada elemento
+        :param key: función que calcula la clave por la que se compara cada elemento
+        '''
+        self.n = n
+        self.grupo = grupo
+        self.key = key
+        self.monticulos: dict[K, list] = {}
+        self.num_elementos = 0
+
+    def añade(self, elemento:T)->None:
+        grupo = self.grupo(elemento)
+        if grupo not in self.monticulos:
+            self.monticulos[grupo] = []
+        if self.n > 0:
+            _añade_acotado(self.monticulos[grupo], self.n,
+                           (self.key(elemento), -self.num_elementos, elemento))
+        self.num_elementos += 1
+
+    def resultado(self)->dict[K, list[T]]:
+        return {grupo: _ordena(monticulo) for grupo, monticulo in self.monticulos.items()}
+
+def n_mayores_por_grupo(iterable:Iterable[T], n:int, grupo:Callable[[T], K],
+                        key:Callable[[T], object])->dict[K, list[T]]:
+    '''
+    Devuelve un diccionario con los n elementos de mayor key de cada grupo,
+    ordenados de mayor a menor.
+
+    :param iterable: elementos entre los que se hace la selección
+    :param n: número de elementos a devolver por cada grupo
+    :param grupo: función que calcula el grupo de cada elemento
+    :param key: función que calcula la clave por la que se compara cada elemento
+    :return: diccionario en el que las claves son los grupos y los valores son
+         listas con los n elementos de mayor clave del grupo
+    '''
+    mayores = MayoresPorGrupo(n, grupo, key)
+    for elemento in iterable:
+        mayores.añade(elemento)
+    return mayores.resultado()
@@ -0,0 +1,62 @@
+'''
+Caché LRU (least recently used) para los resultados de las funciones de
+análisis de avistamientos.
+'''
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+class CacheLRU:
+    '''
+    Caché con un número máximo de entradas. Cuando se llena, se elimina la
+    entrada que hace más tiempo que no se usa. Lleva la cuenta de los
+    aciertos (resultados que ya estaban en la caché) y de los fallos.
+
+    Los resultados se devuelven tal cual están guardados, así que no se
+    deben modificar.
+    '''
+
+    def __init__(self, tam_maximo:int=128):
+        '''
+        :param tam_maximo: número máximo de resultados guardados
+        '''
+        if tam_maximo <= 0:
+            raise ValueError(f"El tamaño máximo debe ser positivo: {tam_maximo}")
+        self.tam_maximo = tam_maximo
+        self.entradas: OrderedDict[Hashable, Any] = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def __len__(self)->int:
+        return len(self.entradas)
+
+    def obtiene(self, clave:Hashable, calcula:Callable[[], Any])->Any:
+        '''
+        Devuelve el resultado guardado para la clave. Si no está, lo calcula
+        llamando a calcula(), lo guarda y lo devuelve.
+
+        :param clave: clave del resultado
+        :param calcula: función sin parámetros que calcula el resultado
+        :return: resultado asociado a la clave
+        '''
+        if clave in self.entradas:
+            self.aciertos += 1
+            self.entradas.move_to_end(clave)
+            return self.entradas[clave]
+        self.fallos += 1
+        res = calcula()
+        self.entradas[clave] = res
+        if len(self.entradas) > self.tam_maximo:
+            self.entradas.popitem(last=False)
+        return res
+
+    def invalida(self)->None:
+        '''
+        Elimina todos los resultados guardados (los contadores se conservan).
+        '''
+        self.entradas.clear()
+
+    def estadisticas(self)->dict[str, int]:
+        '''
+        Devuelve un diccionario con los aciertos, los fallos y el número de entradas.
+        '''
+        return {"aciertos": self.aciertos, "fallos": self.fallos, "entradas": len(self.entradas)}
@@ -0,0 +1,214 @@
+'''
+Almacenamiento de los avistamientos en un fichero csv por año.
+
+particiona divide un fichero csv de avistamientos en una carpeta con un
+fichero por año (ovnis_1995.csv, ovnis_1996.csv, ...) y un manifiesto en
+JSON. El manifiesto indica, para cada año, el fichero, el número de
+avistamientos, su tamaño en bytes y el primer y último día con avistamientos.
+
+lee_avistamientos_particiones usa el manifiesto para leer sólo los ficheros
+de los años que pueden contener avistamientos entre dos fechas (poda de
+particiones), así que las consultas de un año o de un intervalo corto leen
+una pequeña parte de los datos:
+
+    avistamientos = lee_avistamientos_particiones("datos/ovnis_por_año", anyo=2005)
+    comentario_mas_largo(avistamientos, 2005, "light")
+
+También se puede usar desde la línea de órdenes:
+
+    python particiones.py data/ovnis.csv datos/ovnis_por_año
+'''
+import argparse
+import csv
+import json
+import os
+import sys
+from datetime import date, datetime
+from typing import Any
+
+from avistamientos import Avistamiento, Rechazo, huella_fichero, lee_avistamientos, parsea_fechahora
+
+## Definición de constantes
+VERSION_MANIFIESTO = 1
+NOMBRE_MANIFIESTO = "manifiesto.json"
+
+def ruta_particion(directorio:str, año:int)->str:
+    '''
+    Devuelve la ruta del fichero csv con los avistamientos de un año.
+    '''
+    return os.path.join(directorio, f"ovnis_{año}.csv")
+
+def particiona(fichero:str, directorio:str, rapido:bool=False,
+               rechazos:list[Rechazo]|None=None)->dict[str, Any]:
+    '''
+    Divide un fichero csv de avistamientos en un fichero por año, en el mismo
+    formato y con la misma cabecera, y escribe el manifiesto. Dentro de cada
+    año, los avistamientos conservan el orden del fichero original.
+
+    El manifiesto se escribe al final, así que una carpeta a medio escribir
+    no se puede leer con lee_avistamientos_particiones. Si el fichero está
+    vacío (no tiene ni cabecera) se produce un ValueError.
+
+    :param fichero: ruta del fichero csv que contiene los datos en codificación utf-8
+    :param directorio: carpeta en la que se guardan las particiones. Se crea si no existe.
+    :param rapido: si es True, las fechas se convierten con parsea_fechahora
+         en lugar de con datetime.strptime
+    :param rechazos: si es None, una fila cuya fecha no se puede convertir
+         produce un ValueError. Si es una lista, la fila se guarda en ella y
+         se descarta. El resto de los campos no se comprueba: las filas con
+         otros errores se copian en la partición de su año.
+    :return: manifiesto con la información de las particiones
+    '''
+    os.makedirs(directorio, exist_ok=True)
+    salidas = {}
+    particiones: dict[int, dict[str, Any]] = {}
+    try:
+        with open(fichero, encoding="utf-8", newline="") as f:
+            lector = csv.reader(f)
+            try:
+                cabecera = next(lector)
+            except StopIteration:
+                raise ValueError(f"{fichero} está vacío") from None
+            for fila in lector:
+                try:
+                    fechahora = (parsea_fechahora(fila[0]) if rapido
+                                 else datetime.strptime(fila[0], "%m/%d/%Y %H:%M"))
+                except (ValueError, IndexError):
+                    motivo = f"fecha no válida: {fila[0]!r}" if fila else "fila vacía"
+                    if rechazos == None:
+                        raise ValueError(f"Línea {lector.line_num}: {motivo}")
+                    rechazos.append(Rechazo(lector.line_num, motivo, fila))
+                    continue
+                año = fechahora.year
+                dia = fechahora.toordinal()
+                particion = particiones.get(año)
+                if particion == None:
+                    ruta = ruta_particion(directorio, año)
+                    salida = open(ruta, "w", encoding="utf-8", newline="")
+                    escritor = csv.writer(salida, lineterminator="\n")
+                    salidas[año] = (salida, escritor)
+                    escritor.writerow(cabecera)
+                    particion = {"fichero": os.path.basename(ruta),
+                                 "avistamientos": 0, "dia_min": dia, "dia_max": dia}
+                    particiones[año] = particion
+                salidas[año][1].writerow(fila)
+                particion["avistamientos"] += 1
+                if dia < particion["dia_min"]:
+                    particion["dia_min"] = dia
+                elif dia > particion["dia_max"]:
+                    particion["dia_max"] = dia
+    finally:
+        for salida, _ in salidas.values():
+            salida.close()
+
+    for año, particion in particiones.items():
+        particion["bytes"] = os.path.getsize(ruta_particion(directorio, año))
+    manifiesto = {"version": VERSION_MANIFIESTO,
+                  "origen": os.path.abspath(fichero),
+                  "huella": huella_fichero(fichero),
+                  "particiones": {str(año): particiones[año] for año in sorted(particiones)}}
+    ruta = os.path.join(directorio, NOMBRE_MANIFIESTO)
+    with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, indent=2, ensure_ascii=False)
+    os.replace(ruta + ".tmp", ruta)
+    return manifiesto
+
+def lee_manifiesto(directorio:str)->dict[str, Any]:
+    '''
+    Lee el manifiesto de una carpeta creada con particiona.
+
+    :param directorio: carpeta de las particiones
+    :return: manifiesto con la información de las particiones
+    '''
+    with open(os.path.join(directorio, NOMBRE_MANIFIESTO), encoding="utf-8") as f:
+        manifiesto = json.load(f)
+    if manifiesto.get("version") != VERSION_MANIFIESTO:
+        raise ValueError(f"Versión de manifiesto no válida en {directorio}: {manifiesto.get('version')}")
+    return manifiesto
+
+def años_necesarios(manifiesto:dict[str, Any], fecha_inicial:date|None=None,
+                    fecha_final:date|None=None)->list[int]:
+    '''
+    Devuelve los años cuyas particiones tienen algún avistamiento entre dos
+    fechas, usando el primer y el último día de cada partición.
+
+    :param manifiesto: manifiesto de las particiones
+    :param fecha_inicial: primera fecha. Si es None, no hay límite inferior.
+    :param fecha_final: última fecha (incluida). Si es None, no hay límite superior.
+    :return: lista ordenada de años
+    '''
+    dia_desde = fecha_inicial.toordinal() if fecha_inicial != None else None
+    dia_hasta = fecha_final.toordinal() if fecha_final != None else None
+    res = []
+    for año, particion in manifiesto["particiones"].items():
+        if dia_desde != None and particion["dia_max"] < dia_desde:
+            continue
+        if dia_hasta != None and particion["dia_min"] > dia_hasta:
+            continue
+        res.append(int(año))
+    return sorted(res)
+
+def lee_avistamientos_particiones(directorio:str, fecha_inicial:date|None=None,
+                                  fecha_final:date|None=None, anyo:int|None=None,
+                                  **opciones)->list[Avistamiento]:
+    '''
+    Lee los avistamientos de las particiones que pueden contener avistamientos
+    entre dos fechas o de un año. Sólo se abren los ficheros de esos años.
+
+    Se devuelven todos los avistamientos de los años leídos, que pueden
+    incluir algunos fuera del intervalo: las consultas que filtran por fecha
+    o por año (avistamientos_fechas, comentario_mas_largo,
+    media_dias_entre_avistamientos...) dan el mismo resultado que con el
+    fichero completo. Los años se devuelven en orden creciente.
+
+    :param directorio: carpeta creada con particiona
+    :param fecha_inicial: primera fecha. Si es None, no hay límite inferior.
+    :param fecha_final: última fecha (incluida). Si es None, no hay límite superior.
+    :param anyo: si es distinto de None, se lee sólo la partición de ese año
+    :param opciones: opciones de lectura de cada partición (ver avistamientos.lee_avistamientos)
+    :return: lista de avistamientos de las particiones leídas
+    '''
+    manifiesto = lee_manifiesto(directorio)
+    if anyo != None:
+        años = [anyo] if str(anyo) in manifiesto["particiones"] else []
+    else:
+        años = años_necesarios(manifiesto, fecha_inicial, fecha_final)
+    res = []
+    for año in años:
+        res.extend(lee_avistamientos(ruta_particion(directorio, año), **opciones))
+    return res
+
+def resumen_dias_particiones(directorio:str)->dict[int, list[int]]:
+    '''
+    Devuelve el resumen de días por año del manifiesto, con el formato de
+    avistamientos.resumen_dias_por_año, sin leer ninguna partición. Sirve
+    para media_dias_resumen si ninguna fecha se ha rechazado al particionar.
+    '''
+    manifiesto = lee_manifiesto(directorio)
+    return {int(año): [particion["dia_min"], particion["dia_max"], particion["avistamientos"]]
+            for año, particion in manifiesto["particiones"].items()}
+
+def main(argumentos:list[str]|None=None)->int:
+    '''
+    Punto de entrada de la línea de órdenes: particiona un fichero csv y
+    muestra el número de avistamientos y el tamaño de cada partición.
+
+    :return: código de salida (1 si se rechaza alguna fila)
+    '''
+    analizador = argparse.ArgumentParser(description="Divide un fichero csv de avistamientos en un fichero por año.")
+    analizador.add_argument("fichero", help="fichero csv de avistamientos")
+    analizador.add_argument("directorio", help="carpeta en la que se guardan las particiones")
+    analizador.add_argument("--rapido", action="store_true",
+                            help="convierte las fechas con parsea_fechahora")
+    args = analizador.parse_args(argumentos)
+
+    rechazos = []
+    manifiesto = particiona(args.fichero, args.directorio, args.rapido, rechazos)
+    for año, particion in manifiesto["particiones"].items():
+        print(f"{año}: {particion['avistamientos']} avistamientos, {particion['bytes']} bytes")
+    for rechazo in rechazos:
+        print(f"Línea {rechazo.linea} descartada: {rechazo.motivo}", file=sys.stderr)
+    return 1 if rechazos else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
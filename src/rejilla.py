@@ -0,0 +1,288 @@
+'''
+Agregación de avistamientos en rejillas de celdas, para construir mapas de calor.
+
+La celda (fila, columna) de una rejilla con celdas de tam_celda grados cubre
+las latitudes [fila·tam_celda, (fila+1)·tam_celda) y las longitudes
+[columna·tam_celda, (columna+1)·tam_celda). Así, cada celda de una rejilla
+con celdas diez veces mayores contiene exactamente 10x10 celdas de la más
+fina, y las rejillas gruesas de una pirámide se obtienen sumando las finas,
+sin volver a recorrer los avistamientos.
+
+Cada rejilla guarda sólo las celdas que tienen avistamientos, en una tabla
+con una entrada por cada par (celda, forma). Las matrices completas de NumPy
+se construyen al pedir una tesela, que puede ser toda la zona con datos o
+sólo una parte (por ejemplo, la zona visible de un mapa).
+'''
+from typing import Iterable, NamedTuple
+
+import numpy as np
+
+from avistamientos import Avistamiento
+from avistamientos_columnar import AvistamientosColumnar, _codifica
+from coordenadas import Coordenadas
+
+## Definición de constantes
+# Tamaños de celda (en grados) de una pirámide de rejillas
+TAMAÑOS_PIRAMIDE = (0.01, 0.1, 1.0)
+# Número máximo de celdas de una tesela, para no crear matrices enormes por error
+MAX_CELDAS_TESELA = 50_000_000
+# Decimales a los que se redondea coordenada/tam_celda antes de calcular la
+# celda, para que, por ejemplo, 0.3 / 0.1 = 2.9999999999999996 caiga en la celda 3
+DECIMALES_CELDA = 9
+
+## Definición de tipos
+# Matrices de una zona rectangular de una rejilla. La posición [i, j] de cada
+# matriz corresponde a la celda (fila_min + i, columna_min + j).
+Tesela = NamedTuple('Tesela', [
+    ('tam_celda', float),
+    ('fila_min', int),
+    ('columna_min', int),
+    ('conteos', np.ndarray),
+    ('duraciones', np.ndarray),
+    ('formas', np.ndarray),
+    ('valores_forma', list[str])
+])
+
+def indices_celda(valores:np.ndarray, tam_celda:float)->np.ndarray:
+    '''
+    Devuelve el índice de celda (fila o columna) de cada latitud o longitud.
+    '''
+    return np.floor(np.round(valores / tam_celda, DECIMALES_CELDA)).astype(np.int64)
+
+def _agrupa(filas:np.ndarray, columnas:np.ndarray, formas:np.ndarray,
+            conteos:np.ndarray, duraciones:np.ndarray)->tuple[np.ndarray, ...]:
+    '''
+    Suma los conteos y las duraciones de las entradas con la misma celda y
+    forma, y devuelve la tabla resultante ordenada por fila, columna y forma.
+    '''
+    if len(filas) == 0:
+        return filas, columnas, formas, conteos, duraciones
+    orden = np.lexsort((formas, columnas, filas))
+    filas, columnas, formas = filas[orden], columnas[orden], formas[orden]
+    conteos, duraciones = conteos[orden], duraciones[orden]
+    nueva = np.ones(len(filas), dtype=bool)
+    nueva[1:] = ((filas[1:] != filas[:-1]) | (columnas[1:] != columnas[:-1])
+                 | (formas[1:] != formas[:-1]))
+    inicios = np.flatnonzero(nueva)
+    return (filas[inicios], columnas[inicios], formas[inicios],
+            np.add.reduceat(conteos, inicios), np.add.reduceat(duraciones, inicios))
+
+class Rejilla:
+    '''
+    Número de avistamientos, duración total y forma más frecuente de cada
+    celda de una rejilla.
+
+    Atributos:
+        tam_celda: tamaño de las celdas, en grados
+        valores_forma: nombre de cada código de forma
+        filas, columnas: índices de las celdas con avistamientos (int64)
+        conteos, duraciones: número de avistamientos y suma de sus duraciones
+             en cada una de esas celdas (int64)
+        formas: código de la forma más frecuente de cada celda (int32). Si hay
+             empate, la que antes aparece en los datos.
+    '''
+
+    def __init__(self, tam_celda:float, filas:np.ndarray, columnas:np.ndarray,
+                 formas:np.ndarray, conteos:np.ndarray, duraciones:np.ndarray,
+                 valores_forma:list[str]):
+        '''
+        Construye la rejilla a partir de una tabla con una entrada por
+        avistamiento o por par (celda, forma). Normalmente se usan
+        desde_columnar, desde_avistamientos o agrupa.
+
+        :param tam_celda: tamaño de las celdas, en grados
+        :param filas: fila de la celda de cada entrada
+        :param columnas: columna de la celda de cada entrada
+        :param formas: código de forma de cada entrada
+        :param conteos: número de avistamientos de cada entrada
+        :param duraciones: suma de las duraciones de cada entrada
+        :param valores_forma: nombre de cada código de forma
+        '''
+        self.tam_celda = tam_celda
+        self.valores_forma = valores_forma
+        # Tabla por (celda, forma), necesaria para agregar la forma más frecuente
+        self._tabla = _agrupa(np.asarray(filas, dtype=np.int64), np.asarray(columnas, dtype=np.int64),
+                              np.asarray(formas, dtype=np.int32), np.asarray(conteos, dtype=np.int64),
+                              np.asarray(duraciones, dtype=np.int64))
+        filas, columnas, formas, conteos, duraciones = self._tabla
+        if len(filas) == 0:
+            self.filas, self.columnas = filas, columnas
+            self.formas, self.conteos, self.duraciones = formas, conteos, duraciones
+            return
+        nueva = np.ones(len(filas), dtype=bool)
+        nueva[1:] = (filas[1:] != filas[:-1]) | (columnas[1:] != columnas[:-1])
+        inicios = np.flatnonzero(nueva)
+        self.filas = filas[inicios]
+        self.columnas = columnas[inicios]
+        self.conteos = np.add.reduceat(conteos, inicios)
+        self.duraciones = np.add.reduceat(duraciones, inicios)
+        # Dentro de cada celda, la entrada con más avistamientos y, si hay
+        # empate, la de menor código de forma
+        celda = np.cumsum(nueva) - 1
+        orden = np.lexsort((formas, -conteos, celda))
+        primeras = np.ones(len(orden), dtype=bool)
+        primeras[1:] = celda[orden][1:] != celda[orden][:-1]
+        self.formas = formas[orden[primeras]]
+
+    @classmethod
+    def desde_columnar(cls, columnar:AvistamientosColumnar, tam_celda:float=1.0)->"Rejilla":
+        '''
+        Construye la rejilla de un conjunto de avistamientos por columnas.
+
+        :param columnar: avistamientos almacenados por columnas
+        :param tam_celda: tamaño de las celdas, en grados
+        :return: rejilla con las celdas que tienen avistamientos
+        '''
+        return cls(tam_celda, indices_celda(columnar.latitudes, tam_celda),
+                   indices_celda(columnar.longitudes, tam_celda), columnar.formas,
+                   np.ones(len(columnar), dtype=np.int64), columnar.duraciones,
+                   columnar.valores_forma)
+
+    @classmethod
+    def desde_avistamientos(cls, avistamientos:Iterable[Avistamiento], tam_celda:float=1.0)->"Rejilla":
+        '''
+        Construye la rejilla de una lista de avistamientos.
+
+        :param avistamientos: iterable de tuplas con la información de los avistamientos
+        :param tam_celda: tamaño de las celdas, en grados
+        :return: rejilla con las celdas que tienen avistamientos
+        '''
+        avistamientos = list(avistamientos)
+        latitudes = np.array([av.ubicacion.latitud for av in avistamientos], dtype=np.float64)
+        longitudes = np.array([av.ubicacion.longitud for av in avistamientos], dtype=np.float64)
+        formas, valores_forma, _ = _codifica(av.forma for av in avistamientos)
+        return cls(tam_celda, indices_celda(latitudes, tam_celda), indices_celda(longitudes, tam_celda),
+                   formas, np.ones(len(avistamientos), dtype=np.int64),
+                   np.array([av.duracion for av in avistamientos], dtype=np.int64), valores_forma)
+
+    def __len__(self)->int:
+        '''
+        Número de celdas con avistamientos.
+        '''
+        return len(self.filas)
+
+    def agrupa(self, factor:int)->"Rejilla":
+        '''
+        Devuelve la rejilla con celdas factor veces mayores, sumando las
+        celdas de esta rejilla (sin recorrer los avistamientos).
+
+        :param factor: número de celdas de esta rejilla por lado de cada celda nueva
+        :return: rejilla con celdas de tam_celda·factor grados
+        '''
+        if factor <= 0:
+            raise ValueError(f"El factor debe ser positivo: {factor}")
+        filas, columnas, formas, conteos, duraciones = self._tabla
+        return Rejilla(self.tam_celda * factor, filas // factor, columnas // factor,
+                       formas, conteos, duraciones, self.valores_forma)
+
+    def celda(self, coordenadas:Coordenadas)->tuple[int, int]:
+        '''
+        Devuelve la fila y la columna de la celda que contiene unas coordenadas.
+        '''
+        return (int(indices_celda(np.float64(coordenadas.latitud), self.tam_celda)),
+                int(indices_celda(np.float64(coordenadas.longitud), self.tam_celda)))
+
+    def centro(self, fila:int, columna:int)->Coordenadas:
+        '''
+        Devuelve las coordenadas del centro de una celda.
+        '''
+        return Coordenadas((fila + 0.5) * self.tam_celda, (columna + 0.5) * self.tam_celda)
+
+    def celda_mas_avistamientos(self)->Coordenadas:
+        '''
+        Devuelve el centro de la celda con más avistamientos. Si hay empate,
+        el de la celda con menor fila y columna.
+        '''
+        if len(self) == 0:
+            raise ValueError("La rejilla no tiene avistamientos")
+        posicion = int(self.conteos.argmax())
+        return self.centro(int(self.filas[posicion]), int(self.columnas[posicion]))
+
+    def tesela(self, latitud_min:float|None=None, latitud_max:float|None=None,
+               longitud_min:float|None=None, longitud_max:float|None=None)->Tesela:
+        '''
+        Devuelve las matrices de las celdas que se solapan con una zona. Los
+        límites que sean None se toman de la zona que ocupan los avistamientos.
+
+        :param latitud_min: latitud mínima de la zona
+        :param latitud_max: latitud máxima de la zona
+        :param longitud_min: longitud mínima de la zona
+        :param longitud_max: longitud máxima de la zona
+        :return: tesela con la matriz de conteos, la de duraciones y la de
+             formas más frecuentes (-1 en las celdas sin avistamientos)
+        '''
+        def limite(valor:float|None, por_defecto:int)->int:
+            if valor == None:
+                return por_defecto
+            return int(indices_celda(np.float64(valor), self.tam_celda))
+        # Sin avistamientos, la zona por defecto está vacía
+        vacia = len(self) == 0
+        fila_min = limite(latitud_min, 0 if vacia else int(self.filas.min()))
+        fila_max = limite(latitud_max, -1 if vacia else int(self.filas.max()))
+        columna_min = limite(longitud_min, 0 if vacia else int(self.columnas.min()))
+        columna_max = limite(longitud_max, -1 if vacia else int(self.columnas.max()))
+        num_filas = max(fila_max - fila_min + 1, 0)
+        num_columnas = max(columna_max - columna_min + 1, 0)
+        if num_filas * num_columnas > MAX_CELDAS_TESELA:
+            raise ValueError(f"La tesela tendría {num_filas * num_columnas} celdas; "
+                             "reduzca la zona o aumente el tamaño de celda")
+        conteos = np.zeros((num_filas, num_columnas), dtype=np.int64)
+        duraciones = np.zeros((num_filas, num_columnas), dtype=np.int64)
+        formas = np.full((num_filas, num_columnas), -1, dtype=np.int32)
+        dentro = ((self.filas >= fila_min) & (self.filas <= fila_max)
+                  & (self.columnas >= columna_min) & (self.columnas <= columna_max))
+        i = self.filas[dentro] - fila_min
+        j = self.columnas[dentro] - columna_min
+        conteos[i, j] = self.conteos[dentro]
+        duraciones[i, j] = self.duraciones[dentro]
+        formas[i, j] = self.formas[dentro]
+        return Tesela(self.tam_celda, fila_min, columna_min, conteos, duraciones,
+                      formas, self.valores_forma)
+
+class PiramideRejillas:
+    '''
+    Rejillas del mismo conjunto de avistamientos con varios tamaños de celda.
+    Sólo la más fina se calcula a partir de los avistamientos; las demás se
+    obtienen agrupando sus celdas.
+    '''
+
+    def __init__(self, avistamientos:AvistamientosColumnar|Iterable[Avistamiento],
+                 tamaños:Iterable[float]=TAMAÑOS_PIRAMIDE):
+        '''
+        :param avistamientos: avistamientos por columnas, o iterable de tuplas
+             con la información de los avistamientos
+        :param tamaños: tamaños de celda, en grados. Cada uno debe ser múltiplo
+             entero del menor.
+        '''
+        tamaños = sorted(tamaños)
+        if not tamaños:
+            raise ValueError("Se necesita al menos un tamaño de celda")
+        if isinstance(avistamientos, AvistamientosColumnar):
+            base = Rejilla.desde_columnar(avistamientos, tamaños[0])
+        else:
+            base = Rejilla.desde_avistamientos(avistamientos, tamaños[0])
+        self.niveles = {tamaños[0]: base}
+        for tam in tamaños[1:]:
+            factor = round(tam / tamaños[0])
+            if abs(factor * tamaños[0] - tam) > 1e-9 * tam:
+                raise ValueError(f"El tamaño {tam} no es múltiplo de {tamaños[0]}")
+            rejilla = base.agrupa(factor)
+            # Se conserva el tamaño pedido, sin errores de redondeo del producto
+            rejilla.tam_celda = tam
+            self.niveles[tam] = rejilla
+
+    def nivel(self, tam_celda:float)->Rejilla:
+        '''
+        Devuelve la rejilla con el tamaño de celda dado.
+        '''
+        rejilla = self.niveles.get(tam_celda)
+        if rejilla == None:
+            raise KeyError(f"La pirámide no tiene rejilla con celdas de {tam_celda} grados")
+        return rejilla
+
+    def tesela(self, tam_celda:float, latitud_min:float|None=None, latitud_max:float|None=None,
+               longitud_min:float|None=None, longitud_max:float|None=None)->Tesela:
+        '''
+        Devuelve una tesela de la rejilla con el tamaño de celda dado (ver Rejilla.tesela).
+        '''
+        return self.nivel(tam_celda).tesela(latitud_min, latitud_max, longitud_min, longitud_max)
@@ -0,0 +1,200 @@
+'''
+Series temporales diarias de avistamientos, para gráficas de tendencias.
+
+Una serie diaria guarda, en dos arrays de NumPy indexados por día, el número
+de avistamientos y la suma de sus duraciones. La serie es densa: incluye
+todos los días entre el primero y el último con avistamientos, aunque no
+tengan ninguno. A partir de ella se calculan sin bucles de Python por
+avistamiento:
+
+- Sumas y medias móviles de los últimos días, con sumas acumuladas (cumsum).
+- Series por semana (de lunes a domingo), por mes o por año.
+- El número de avistamientos de una fecha, en O(1).
+'''
+from datetime import date
+from typing import Iterable, NamedTuple
+
+import numpy as np
+
+from avistamientos import Avistamiento
+from avistamientos_columnar import AvistamientosColumnar
+
+## Definición de constantes
+# Ordinal (date.toordinal) del 1/1/1970, origen de los datetime64 de NumPy
+ORDINAL_EPOCA = date(1970, 1, 1).toordinal()
+MINUTOS_DIA = 24 * 60
+# El 1/1/1970 fue jueves: sumando 3 días, las semanas empiezan en lunes
+DESPLAZAMIENTO_SEMANA = 3
+PERIODOS = ("día", "semana", "mes", "año")
+
+## Definición de tipos
+# Valores de una serie. La posición i de cada array corresponde al periodo
+# que empieza en fechas[i] (datetime64[D]).
+Serie = NamedTuple('Serie', [
+    ('fechas', np.ndarray),
+    ('conteos', np.ndarray),
+    ('duraciones', np.ndarray)
+])
+
+def suma_movil(valores:np.ndarray, ventana:int)->np.ndarray:
+    '''
+    Devuelve la suma de cada valor y los ventana-1 anteriores. En las primeras
+    posiciones se suman sólo los valores que hay.
+
+    :param valores: array de valores
+    :param ventana: número de valores que se suman en cada posición
+    :return: array del mismo tamaño que valores con las sumas móviles
+    '''
+    if ventana <= 0:
+        raise ValueError(f"La ventana debe ser positiva: {ventana}")
+    acumulados = np.cumsum(valores)
+    res = acumulados.copy()
+    res[ventana:] -= acumulados[:-ventana]
+    return res
+
+def media_movil(valores:np.ndarray, ventana:int)->np.ndarray:
+    '''
+    Devuelve la media de cada valor y los ventana-1 anteriores. En las primeras
+    posiciones se promedian sólo los valores que hay.
+
+    :param valores: array de valores
+    :param ventana: número de valores que se promedian en cada posición
+    :return: array de float64 del mismo tamaño que valores con las medias móviles
+    '''
+    num_valores = np.minimum(np.arange(1, len(valores) + 1), ventana)
+    return suma_movil(valores, ventana) / num_valores
+
+class SerieDiaria:
+    '''
+    Número de avistamientos y duración total de cada día.
+
+    Atributos:
+        dia_inicial: ordinal (date.toordinal) del primer día de la serie
+        conteos: número de avistamientos de cada día (int64)
+        duraciones: suma de las duraciones de los avistamientos de cada día (int64)
+    '''
+
+    def __init__(self, dias:np.ndarray, duraciones:np.ndarray):
+        '''
+        Construye la serie a partir del día y la duración de cada avistamiento.
+        Normalmente se usan desde_columnar o desde_avistamientos.
+
+        :param dias: ordinal del día de cada avistamiento
+        :param duraciones: duración en segundos de cada avistamiento
+        '''
+        dias = np.asarray(dias, dtype=np.int64)
+        if len(dias) == 0:
+            self.dia_inicial = ORDINAL_EPOCA
+            self.conteos = np.zeros(0, dtype=np.int64)
+            self.duraciones = np.zeros(0, dtype=np.int64)
+            return
+        self.dia_inicial = int(dias.min())
+        posiciones = dias - self.dia_inicial
+        self.conteos = np.bincount(posiciones)
+        # bincount suma los pesos en float64, que es exacto mientras la
+        # duración total de un día no pase de 2^53 segundos
+        self.duraciones = np.rint(np.bincount(posiciones, weights=duraciones,
+                                              minlength=len(self.conteos))).astype(np.int64)
+
+    @classmethod
+    def desde_columnar(cls, columnar:AvistamientosColumnar)->"SerieDiaria":
+        '''
+        Construye la serie de un conjunto de avistamientos por columnas.
+
+        :param columnar: avistamientos almacenados por columnas
+        :return: serie diaria de los avistamientos
+        '''
+        return cls(columnar.minutos // MINUTOS_DIA + ORDINAL_EPOCA, columnar.duraciones)
+
+    @classmethod
+    def desde_avistamientos(cls, avistamientos:Iterable[Avistamiento])->"SerieDiaria":
+        '''
+        Construye la serie de una lista de avistamientos.
+
+        :param avistamientos: iterable de tuplas con la información de los avistamientos
+        :return: serie diaria de los avistamientos
+        '''
+        avistamientos = list(avistamientos)
+        return cls(np.fromiter((av.fechahora.toordinal() for av in avistamientos), dtype=np.int64, count=len(avistamientos)),
+                   np.fromiter((av.duracion for av in avistamientos), dtype=np.int64,
+                               count=len(avistamientos)))
+
+    def __len__(self)->int:
+        '''
+        Número de días de la serie, desde el primero hasta el último con avistamientos.
+        '''
+        return len(self.conteos)
+
+    def fechas(self)->np.ndarray:
+        '''
+        Devuelve un array datetime64[D] con la fecha de cada día de la serie.
+        '''
+        return (np.arange(len(self), dtype=np.int64)
+                + (self.dia_inicial - ORDINAL_EPOCA)).astype("datetime64[D]")
+
+    def serie(self)->Serie:
+        '''
+        Devuelve las fechas, los conteos y las duraciones de cada día.
+        '''
+        return Serie(self.fechas(), self.conteos, self.duraciones)
+
+    def numero_avistamientos_fecha(self, fecha:date)->int:
+        '''
+        Devuelve el número de avistamientos de una fecha (equivale a
+        avistamientos.numero_avistamientos_fecha).
+        '''
+        posicion = fecha.toordinal() - self.dia_inicial
+        if posicion < 0 or posicion >= len(self):
+            return 0
+        return int(self.conteos[posicion])
+
+    def suma_movil(self, ventana:int)->Serie:
+        '''
+        Devuelve, para cada día, el número de avistamientos y la duración total
+        de ese día y los ventana-1 anteriores.
+
+        :param ventana: número de días de la ventana
+        :return: serie diaria con las sumas móviles
+        '''
+        return Serie(self.fechas(), suma_movil(self.conteos, ventana),
+                     suma_movil(self.duraciones, ventana))
+
+    def media_movil(self, ventana:int)->Serie:
+        '''
+        Devuelve, para cada día, la media diaria de avistamientos y de duración
+        total de ese día y los ventana-1 anteriores. En los primeros días de la
+        serie se promedian sólo los días que hay.
+
+        :param ventana: número de días de la ventana
+        :return: serie diaria con las medias móviles (float64)
+        '''
+        return Serie(self.fechas(), media_movil(self.conteos, ventana),
+                     media_movil(self.duraciones, ventana))
+
+    def remuestrea(self, periodo:str)->Serie:
+        '''
+        Suma los conteos y las duraciones de los días de cada periodo. La serie
+        resultante también es densa: incluye los periodos sin avistamientos.
+
+        :param periodo: "día", "semana" (de lunes a domingo), "mes" o "año"
+        :return: serie con la fecha del primer día de cada periodo
+        '''
+        if periodo not in PERIODOS:
+            raise ValueError(f"Periodo no válido: {periodo}. Debe ser uno de {PERIODOS}")
+        if periodo == "día" or len(self) == 0:
+            return self.serie()
+        fechas = self.fechas()
+        if periodo == "semana":
+            numeros = (fechas.astype(np.int64) + DESPLAZAMIENTO_SEMANA) // 7
+            inicios = ((np.arange(int(numeros[0]), int(numeros[-1]) + 1) * 7 - DESPLAZAMIENTO_SEMANA)
+                       .astype("datetime64[D]"))
+        else:
+            unidad = "datetime64[M]" if periodo == "mes" else "datetime64[Y]"
+            numeros = fechas.astype(unidad).astype(np.int64)
+            inicios = np.arange(int(numeros[0]), int(numeros[-1]) + 1).astype(unidad).astype("datetime64[D]")
+        # La serie diaria es densa, así que cada periodo es un tramo de días
+        # consecutivos y todos los periodos entre el primero y el último tienen días
+        cortes = np.flatnonzero(np.diff(numeros)) + 1
+        cortes = np.concatenate(([0], cortes))
+        return Serie(inicios, np.add.reduceat(self.conteos, cortes),
+                     np.add.reduceat(self.duraciones, cortes))